@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from pytz import timezone
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from pytz import timezone
 from app.config.database import get_db
+from app.config.ml_deployment import ml_config
 from app.config.settings import settings
 from app.models.db_models import (
     User, 
@@ -18,15 +20,21 @@ from app.schemas.admin_schemas import (
     UserCreate,
     UserResponse,
     UserDetailResponse,
+    UserImportResponse,
     UserUpdate
 )
+from app.services.user_import import user_importer
+from app.utils.accuracy_tracker import accuracy_tracker
 from app.utils.auth_utils import generate_random_password, hash_password
 from app.utils.dependencies import require_admin
+from app.utils.drift_monitor import drift_monitor
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/model-performance", response_model=ModelPerformanceResponse)
 async def get_model_performance(
+    drift_window_hours: float = Query(24, gt=0, le=ml_config.DRIFT_MAX_WINDOW_HOURS, description="Window for drift metrics"),
+    accuracy_window_months: int = Query(3, ge=1, le=24, description="Window for accuracy metrics"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
@@ -34,30 +42,22 @@ async def get_model_performance(
     Get model performance metrics
     
     Returns:
-    - accuracy: Current model accuracy score
+    - accuracy: R² of predicted vs approved amounts over the last accuracy_window_months
+    - accuracy_metrics: MAE, MAPE, R² and override rate per model version, crop and district
     - recent_predictions: List of recent predictions with actual outcomes
-    - drift_metrics: Data drift detection metrics
+    - drift_metrics: PSI/KS per feature and prediction drift over the last drift_window_hours
     """
     # Verify user is admin
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can access model performance data")
     
-    # TODO: Replace with actual model metrics from your monitoring system
-    # This is placeholder data
+    accuracy_metrics = accuracy_tracker.get_summary(db, accuracy_window_months)
+    
     return {
-        "accuracy": 0.87,
-        "recent_predictions": [
-            {"predicted": 150000, "actual": 142000, "date": "2023-05-01"},
-            {"predicted": 180000, "actual": 175000, "date": "2023-05-02"},
-            {"predicted": 210000, "actual": 225000, "date": "2023-05-03"}
-        ],
-        "drift_metrics": {
-            "feature_drift": {
-                "farm_size": 0.12,
-                "expected_yield": 0.08
-            },
-            "prediction_drift": 0.15
-        }
+        "accuracy": accuracy_metrics["overall"]["r2"] or 0.0,
+        "accuracy_metrics": accuracy_metrics,
+        "recent_predictions": accuracy_tracker.recent_pairs(db),
+        "drift_metrics": drift_monitor.compute_drift(drift_window_hours)
     }
 
 @router.post("/system-settings", response_model=dict)
@@ -187,6 +187,37 @@ async def create_user(
         "created_at": new_user.created_at
     }
 
+@router.post("/users/import", response_model=UserImportResponse)
+async def import_users(
+    file: UploadFile = File(..., description="CSV or XLSX file with one user per row"),
+    dry_run: bool = Query(False, description="Validate the file without creating any users"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Create users in bulk from a CSV or XLSX file, e.g. a cooperative's members
+
+    Columns (header row, any order):
+    - first_name, last_name (required)
+    - role (defaults to farmer)
+    - phone_number (required for farmers), email, password (generated if empty)
+    - district (ID, name or code; required for loan officers/supervisors)
+    - national_id, date_of_birth, address, farm_location_gps, farm_size_hectares (farmers only)
+
+    Rows with errors are skipped and reported; the other rows are imported.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can create users")
+
+    file_format = (file.filename or "").rsplit(".", 1)[-1].lower()
+    if file_format not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Only .csv and .xlsx files are supported")
+
+    try:
+        return await run_in_threadpool(user_importer.import_file, db, file.file, file_format, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/users", response_model=List[UserResponse])
 async def list_users(
     role: Optional[UserRole] = Query(None),
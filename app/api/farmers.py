@@ -15,6 +15,7 @@ from app.schemas.farmer_schema import ApplicationReviewDetail, LoanApplicationCr
 from app.utils.dependencies import require_farmer
 from app.utils.farmers_utils import ensure_farmer_profile, get_crop_type_by_name_or_code
 from app.services.ml_model import model_service
+from app.services.shadow_scoring import shadow_scorer
 
 
 logger = logging.getLogger(__name__)
@@ -64,13 +65,19 @@ def submit_loan_application(
         
         # Get real-time prediction
         try:
-            prediction_result = model_service.predict(prediction_input)
+            prediction_result = model_service.predict(prediction_input, routing_key=current_user.id)
             predicted_amount = prediction_result["predicted_amount_mwk"]
             confidence = prediction_result["prediction_confidence"]
+            lower_bound = prediction_result["prediction_lower_mwk"]
+            upper_bound = prediction_result["prediction_upper_mwk"]
+            model_version = prediction_result["model_version"]
         except Exception as e:
             logger.error(f"Prediction failed, using fallback: {str(e)}")
             predicted_amount = min(application_data.expected_yield_mk * 0.5, 300000)
             confidence = 0.5
+            lower_bound = upper_bound = None
+            model_version = "fallback"
+            prediction_result = None
         
         # Create and save loan application
         loan_application = LoanApplication(
@@ -82,7 +89,10 @@ def submit_loan_application(
             district_id=district_id,
             predicted_amount_mwk=predicted_amount,
             prediction_confidence=confidence,
+            prediction_lower_mwk=lower_bound,
+            prediction_upper_mwk=upper_bound,
             prediction_date=datetime.now(),
+            model_version=model_version,
             status=ApplicationStatus.SUBMITTED
         )
         
@@ -90,6 +100,10 @@ def submit_loan_application(
         db.commit()
         db.refresh(loan_application)
         
+        # Score the same input with the candidate model, if one is in shadow mode
+        if prediction_result is not None:
+            shadow_scorer.submit(loan_application.id, prediction_input, prediction_result)
+        
         # Save past yield data to YieldHistory if provided
         if application_data.past_yield_kgs is not None and application_data.past_yield_mk is not None:
             try:
@@ -118,6 +132,8 @@ def submit_loan_application(
             application_id=loan_application.id,
             predicted_amount_mwk=predicted_amount,
             prediction_confidence=confidence,
+            prediction_lower_mwk=lower_bound,
+            prediction_upper_mwk=upper_bound,
             status=loan_application.status.value,
             application_date=loan_application.application_date
         )
@@ -220,6 +236,8 @@ def get_application_details(
         district_name=application.district_rel.name,
         predicted_amount_mwk=float(application.predicted_amount_mwk) if application.predicted_amount_mwk else None,
         prediction_confidence=float(application.prediction_confidence) if application.prediction_confidence else None,
+        prediction_lower_mwk=float(application.prediction_lower_mwk) if application.prediction_lower_mwk is not None else None,
+        prediction_upper_mwk=float(application.prediction_upper_mwk) if application.prediction_upper_mwk is not None else None,
         prediction_date=application.prediction_date,
         approved_amount_mwk=float(application.approved_amount_mwk) if application.approved_amount_mwk else None,
         approval_date=application.approval_date,
@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc, func
@@ -7,9 +8,12 @@ from app.models.db_models import (
     User, LoanApplication, ApplicationReview, 
     CropType, District, YieldHistory, ApplicationStatus
 )
-from app.schemas.loan_officer_schema import ApplicationFullDetails, ApplicationListItem, ApplicationReviewHistory, FarmerProfileDetail, PredictionDetails, YieldHistoryItem
+from app.schemas.loan_officer_schema import ApplicationExplanationItem, ApplicationFullDetails, ApplicationListItem, ApplicationReviewHistory, FarmerProfileDetail, PredictionDetails, YieldHistoryItem
+from app.services.explanations import prediction_explainer
 from app.utils.dependencies import require_loan_officer
-from app.utils.loan_officer_utils import check_loan_officer_permissions, get_accessible_districts
+from app.utils.loan_officer_utils import check_loan_officer_permissions, filter_applications, get_accessible_districts
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/loan-officers", tags=["loan-officers"])
 
@@ -50,34 +54,8 @@ def get_applications(
         joinedload(LoanApplication.district_rel)
     )
     
-    # Apply district filter
-    if district_id:
-        if district_id not in accessible_districts:
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied to specified district"
-            )
-        query = query.filter(LoanApplication.district_id == district_id)
-    else:
-        query = query.filter(LoanApplication.district_id.in_(accessible_districts))
-    
-    # Apply status filter
-    if status:
-        if status.lower() == "pending":
-            # "Pending" means submitted and under review
-            query = query.filter(LoanApplication.status.in_([
-                ApplicationStatus.SUBMITTED, 
-                ApplicationStatus.UNDER_REVIEW
-            ]))
-        else:
-            try:
-                status_enum = ApplicationStatus(status.lower())
-                query = query.filter(LoanApplication.status == status_enum)
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid status: {status}"
-                )
+    # Apply district and status filters
+    query = filter_applications(query, accessible_districts, district_id, status)
     
     # Apply sorting
     if sort_by == "application_date":
@@ -115,6 +93,37 @@ def get_applications(
     
     return result
 
+@router.get("/applications/pending/explanations", response_model=List[ApplicationExplanationItem])
+def get_pending_explanations(
+    current_user: User = Depends(require_loan_officer),
+    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500, description="Number of pending applications to explain")
+):
+    """Explain the predictions of the pending review queue in one batch"""
+    accessible_districts = get_accessible_districts(current_user, db)
+    if not accessible_districts:
+        raise HTTPException(
+            status_code=403,
+            detail="No accessible districts found"
+        )
+    
+    applications = db.query(LoanApplication).options(
+        joinedload(LoanApplication.crop_type_rel)
+    ).filter(
+        LoanApplication.district_id.in_(accessible_districts),
+        LoanApplication.status.in_([ApplicationStatus.SUBMITTED, ApplicationStatus.UNDER_REVIEW])
+    ).order_by(LoanApplication.application_date).limit(limit).all()
+    
+    explanations = prediction_explainer.explain_applications(db, applications)
+    return [
+        ApplicationExplanationItem(
+            application_id=app.id,
+            predicted_amount_mwk=float(app.predicted_amount_mwk) if app.predicted_amount_mwk else None,
+            explanation=explanations.get(app.id)
+        )
+        for app in applications
+    ]
+
 @router.get("/applications/{application_id}", response_model=ApplicationFullDetails)
 def get_application_details(
     application_id: str,
@@ -196,9 +205,19 @@ def get_application_details(
     prediction_details = PredictionDetails(
         predicted_amount_mwk=float(application.predicted_amount_mwk) if application.predicted_amount_mwk else None,
         prediction_confidence=float(application.prediction_confidence) if application.prediction_confidence else None,
-        prediction_date=application.prediction_date
+        prediction_lower_mwk=float(application.prediction_lower_mwk) if application.prediction_lower_mwk is not None else None,
+        prediction_upper_mwk=float(application.prediction_upper_mwk) if application.prediction_upper_mwk is not None else None,
+        prediction_date=application.prediction_date,
+        model_version=application.model_version
     )
     
+    # Explain the prediction; a failure here should not block the review
+    prediction_explanation = None
+    try:
+        prediction_explanation = prediction_explainer.explain_application(db, application)
+    except Exception as e:
+        logger.error(f"Error explaining application {application.id}: {str(e)}")
+    
     # Get review history
     review_history = [
         ApplicationReviewHistory(
@@ -225,6 +244,7 @@ def get_application_details(
         expected_revenue_mwk=float(application.expected_revenue_mwk),
         district_name=application.district_rel.name,
         prediction_details=prediction_details,
+        prediction_explanation=prediction_explanation,
         farmer_profile=farmer_profile_detail,
         yield_history=yield_history,
         review_history=review_history,
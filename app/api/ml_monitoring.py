@@ -1,16 +1,26 @@
 from datetime import datetime
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse
 from app.config.database import get_db
 from app.config.ml_deployment import ml_config as config
+from app.config.settings import settings
 from app.models.db_models import User, UserRole
-from app.services.ml_model import ModelService
+from app.services.ml_model import model_service
 from app.utils.dependencies import get_current_user
 from app.utils.model_monitor import model_monitor
 from sqlalchemy.orm import Session
+from app.services.artifact_store import artifact_store
+from app.services.history_archive import history_archiver
 from app.services.model_deployment import deployment_manager
-
-model_service = ModelService()
+from app.services.portfolio_rescoring import portfolio_rescorer
+from app.services.prediction_backfill import prediction_backfill
+from app.services.retraining import retraining_job
+from app.services.shadow_scoring import shadow_scorer
+from app.utils.accuracy_tracker import accuracy_tracker
+from app.utils.profiler import collapsed, stack_sampler
 
 
 # Configure logging
@@ -60,11 +70,13 @@ async def get_metrics(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/deploy")
-async def deploy_model(
-    model_path: str,
+def deploy_model(
+    version: Optional[str] = None,
+    model_path: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Deploy new model version"""
+    """Deploy a model version by artifact hash, or import and deploy a model file
+    (load, validate against the golden set, then swap)"""
     try:
         # Check permissions
         if current_user.role != UserRole.ADMIN:
@@ -72,20 +84,23 @@ async def deploy_model(
                 status_code=403, 
                 detail="Admin access required"
             )
+        if (version is None) == (model_path is None):
+            raise HTTPException(status_code=400, detail="Provide exactly one of version or model_path")
         
-        success = deployment_manager.deploy_new_model(model_path)
+        report = deployment_manager.deploy_new_model(version=version, model_path=model_path)
         
-        if success:
+        if report["success"]:
             return {
                 "message": "Model deployed successfully",
-                "model_path": model_path,
+                "model_version": report["model_version"],
+                "stages": report["stages"],
                 "deployed_by": current_user.id,
                 "deployed_at": datetime.now()
             }
         else:
             raise HTTPException(
-                status_code=500, 
-                detail="Failed to deploy model"
+                status_code=422 if report.get("rejected") else 500, 
+                detail=jsonable_encoder({"message": "Failed to deploy model", **report})
             )
             
     except HTTPException:
@@ -95,10 +110,11 @@ async def deploy_model(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/rollback")
-async def rollback_model(
+def rollback_model(
+    version: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Rollback to previous model version"""
+    """Rollback to the previous model version, or to a specific artifact hash"""
     try:
         # Check permissions
         if current_user.role != UserRole.ADMIN:
@@ -107,18 +123,20 @@ async def rollback_model(
                 detail="Admin access required"
             )
         
-        success = deployment_manager.rollback_model()
+        result = deployment_manager.rollback_model(version)
         
-        if success:
+        if result["success"]:
             return {
                 "message": "Model rolled back successfully",
+                "model_version": result["model_version"],
+                "source": result["source"],
                 "rolled_back_by": current_user.id,
                 "rolled_back_at": datetime.now()
             }
         else:
             raise HTTPException(
                 status_code=500, 
-                detail="Failed to rollback model"
+                detail=f"Failed to rollback model: {result['error']}"
             )
             
     except HTTPException:
@@ -138,9 +156,345 @@ async def get_deployment_status():
             "deployment_status": "active" if model_info["model_loaded"] else "inactive",
             "model_info": model_info,
             "health_status": health_status["status"],
-            "monitoring_active": deployment_manager.is_running
+            "monitoring_active": deployment_manager.is_running,
+            "recent_deployments": list(deployment_manager.deployment_history)
         }
         
     except Exception as e:
         logger.error(f"Error getting deployment status: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/shadow/start")
+def start_shadow_scoring(
+    model_path: Optional[str] = None,
+    candidate_version: Optional[str] = None,
+    version: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Load a candidate model file or artifact version and score live inputs with it in the background"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        shadow_scorer.start(model_path, candidate_version, version)
+        return {
+            "message": "Shadow scoring started",
+            "status": shadow_scorer.get_status(),
+            "started_by": current_user.id
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting shadow scoring: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to start shadow scoring")
+
+@router.post("/shadow/stop")
+def stop_shadow_scoring(
+    current_user: User = Depends(get_current_user)
+):
+    """Stop shadow scoring"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    shadow_scorer.stop()
+    return {
+        "message": "Shadow scoring stopped",
+        "status": shadow_scorer.get_status()
+    }
+
+@router.get("/shadow/report")
+def get_shadow_report(
+    candidate_version: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Compare candidate vs live predictions, error against approved amounts and latency"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        return {
+            "status": shadow_scorer.get_status(),
+            "candidates": shadow_scorer.get_report(db, candidate_version)
+        }
+    except Exception as e:
+        logger.error(f"Error getting shadow report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/canary/start")
+def start_canary(
+    model_path: str,
+    weight_percent: float,
+    model_version: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Route a sticky percentage of farmers to a new model version"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        canary = model_service.start_canary(model_path, weight_percent, model_version)
+        return {
+            "message": "Canary started",
+            "canary": canary,
+            "started_by": current_user.id
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting canary: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to start canary")
+
+@router.post("/canary/stop")
+def stop_canary(
+    current_user: User = Depends(get_current_user)
+):
+    """Send all predictions back to the stable model"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    version = model_service.stop_canary(f"stopped by {current_user.id}")
+    return {
+        "message": "Canary stopped" if version else "No canary active",
+        "model_version": version
+    }
+
+@router.get("/canary")
+def get_canary_dashboard(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Compare latency, error rate and accuracy of the canary against the stable version"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        canary = model_service.get_canary_info()
+        versions = [model_service.model_version] + ([canary["model_version"]] if canary else [])
+        version_metrics = model_monitor.get_version_metrics()
+        accuracy = accuracy_tracker.get_summary(db, window_months=1)["by_model_version"]
+        
+        return {
+            "stable_version": model_service.model_version,
+            "canary": canary,
+            "versions": {
+                version: {
+                    "latency": version_metrics.get(version),
+                    "accuracy": accuracy.get(version)
+                }
+                for version in versions
+            },
+            "events": model_service.canary_events
+        }
+    except Exception as e:
+        logger.error(f"Error getting canary dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/artifacts")
+def list_artifacts(
+    current_user: User = Depends(get_current_user)
+):
+    """List stored model versions with their metadata and load-time stats"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "serving_version": model_service.model_version,
+        "artifacts": artifact_store.list_artifacts()
+    }
+
+@router.post("/artifacts/{version}/pin")
+def pin_artifact(
+    version: str,
+    pinned: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """Pin (or unpin) a model version so garbage collection keeps it"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        return artifact_store.pin(version) if pinned else artifact_store.unpin(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/artifacts/{version}/verify")
+def verify_artifact(
+    version: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Re-hash a stored artifact and check it still matches its address"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        return {"version": version, "intact": artifact_store.verify(version)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/artifacts/gc")
+def garbage_collect_artifacts(
+    keep: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Delete old unpinned model versions that are not serving or needed for rollback"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    protected = [
+        handle.artifact_hash
+        for handle in [model_service.handle, *model_service.previous_handles]
+        if handle is not None and handle.artifact_hash
+    ]
+    canary = model_service.canary
+    if canary is not None and canary.handle.artifact_hash:
+        protected.append(canary.handle.artifact_hash)
+    
+    deleted = artifact_store.gc(keep=keep, protected=protected)
+    return {"deleted": deleted, "remaining": len(artifact_store.list_artifacts())}
+
+@router.post("/retrain")
+def start_retraining(
+    force: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Start a retraining run now; force retrains even without enough new rows"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not retraining_job.start(force=force):
+        raise HTTPException(status_code=409, detail="A retraining run is already in progress")
+    return {"message": "Retraining started", "started_by": current_user.id}
+
+@router.get("/retrain")
+def get_retraining_status(
+    current_user: User = Depends(get_current_user)
+):
+    """Retraining schedule, the run in progress and past runs with their timings"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return retraining_job.get_status()
+
+@router.post("/backfill")
+def start_prediction_backfill(
+    include_stale: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Score pending applications missing predictions; include_stale also re-scores other model versions"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not prediction_backfill.start(include_stale=include_stale):
+        raise HTTPException(status_code=409, detail="A prediction backfill is already in progress")
+    return {"message": "Prediction backfill started", "started_by": current_user.id}
+
+@router.get("/backfill")
+def get_prediction_backfill_status(
+    current_user: User = Depends(get_current_user)
+):
+    """Queue depth by reason, the run in progress and the last run with its throughput"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return prediction_backfill.get_status()
+
+@router.post("/rescore")
+def start_portfolio_rescore(
+    resume: bool = True,
+    workers: Optional[int] = Query(None, ge=1, le=16),
+    current_user: User = Depends(get_current_user)
+):
+    """Re-score pending applications with the live model, resuming an interrupted run by default"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not portfolio_rescorer.start(resume=resume, workers=workers):
+        raise HTTPException(status_code=409, detail="A portfolio re-score is already in progress")
+    return {"message": "Portfolio re-score started", "started_by": current_user.id}
+
+@router.get("/rescore")
+def get_portfolio_rescore_status(
+    current_user: User = Depends(get_current_user)
+):
+    """Progress of the running or last portfolio re-score, with throughput and ETA"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return portfolio_rescorer.get_status()
+
+@router.post("/archive")
+def start_history_archive(
+    resume: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """Archive decided applications older than the retention window, resuming an interrupted run by default"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not history_archiver.start(resume=resume):
+        raise HTTPException(status_code=409, detail="A history archive run is already in progress")
+    return {"message": "History archive started", "started_by": current_user.id}
+
+@router.get("/archive")
+def get_history_archive_status(
+    current_user: User = Depends(get_current_user)
+):
+    """Progress of the running or last history archive run"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return history_archiver.get_status()
+
+@router.post("/profile", response_class=PlainTextResponse)
+def profile_worker(
+    seconds: float = Query(10, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(settings.PROFILER_INTERVAL_MS, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """Sample the stacks of this worker for `seconds` and return them in collapsed (flamegraph) format"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    profile = stack_sampler.profile(seconds, interval_ms)
+    if profile is None:
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
+    logger.info(f"Profile of {profile['seconds']}s taken by {current_user.id}: {profile['samples']} samples, "
+                f"{profile['overhead_percent']}% overhead")
+    return PlainTextResponse(collapsed(profile), headers={
+        "X-Profile-Samples": str(profile["samples"]),
+        "X-Profile-Overhead-Percent": str(profile["overhead_percent"]),
+    })
+
+@router.get("/profile/requests")
+def list_request_profiles(
+    current_user: User = Depends(get_current_user)
+):
+    """Recent profiles of requests sent with the profiling header, newest first"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {"enabled": settings.PROFILE_REQUESTS, "header": settings.PROFILE_REQUEST_HEADER,
+            "profiles": stack_sampler.list_request_profiles()}
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+def get_request_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """One request profile in collapsed (flamegraph) format"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    profile = stack_sampler.get_request_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Request profile not found")
+    return PlainTextResponse(collapsed(profile))
@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from typing import List
 from app.config.database import get_db
 from app.models.db_models import LoanApplication, User, UserRole
+from app.schemas.ml_schemas import WhatIfRequest, WhatIfResponse
+from app.services.what_if import what_if_simulator
 from app.utils.dependencies import get_current_user
 
 import logging
@@ -13,6 +15,21 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/predictions", tags=["predictions"])
 
+
+@router.post("/what-if", response_model=WhatIfResponse)
+def what_if(
+    request: WhatIfRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Predicted loan amounts for a base application while one or two features vary over a grid"""
+    try:
+        return what_if_simulator.simulate(
+            request.base.model_dump(),
+            [r.model_dump() for r in request.ranges]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # # @router.post("/predict", response_model=PredictionResponse)
 # # async def predict_loan_amount(
 # #     request: PredictionRequest,
@@ -1,5 +1,6 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, func
 from typing import List, Optional
@@ -11,6 +12,9 @@ from app.models.db_models import (
 )
 
 from app.schemas.supervisor_schemas import ApplicationApprovalRequest, ApplicationApprovalResponse, DashboardMetrics, LoanOfficerStats, LoanOfficerSummary
+from app.services.application_export import EXPORT_FORMATS, export_select, stream_export
+from app.services.history_archive import archived_totals
+from app.utils.accuracy_tracker import accuracy_tracker
 from app.utils.dependencies import require_supervisor
 from app.utils.supervisor_utils import check_supervisor_permissions, get_managed_loan_officers, get_supervisor_districts
 
@@ -80,11 +84,25 @@ def get_supervisor_dashboard(
         )
     ).with_entities(
         func.sum(LoanApplication.approved_amount_mwk),
-        func.avg(LoanApplication.approved_amount_mwk)
+        func.count(LoanApplication.approved_amount_mwk)
     ).first()
     
     total_amount_approved = float(approved_amount_result[0]) if approved_amount_result[0] else 0.0
-    average_approval_amount = float(approved_amount_result[1]) if approved_amount_result[1] else 0.0
+    approved_amount_count = approved_amount_result[1]
+    
+    # Add applications moved to the archive
+    archived = archived_totals(db, accessible_districts)
+    for district_totals in archived.values():
+        for status_name, totals in district_totals.items():
+            total_applications += totals["applications"]
+            if status_name == ApplicationStatus.APPROVED.value:
+                approved_applications += totals["applications"]
+                total_amount_approved += totals["sum_approved_mwk"]
+                approved_amount_count += totals["approved_count"]
+            elif status_name == ApplicationStatus.REJECTED.value:
+                rejected_applications += totals["applications"]
+    
+    average_approval_amount = total_amount_approved / approved_amount_count if approved_amount_count else 0.0
     
     # Calculate approval rate
     approval_rate = (approved_applications / total_applications * 100) if total_applications > 0 else 0.0
@@ -183,6 +201,10 @@ def get_supervisor_dashboard(
                 )
             ).count()
             
+            district_archived = archived.get(district_id, {})
+            district_apps += sum(totals["applications"] for totals in district_archived.values())
+            district_approved += district_archived.get(ApplicationStatus.APPROVED.value, {}).get("applications", 0)
+            
             district_summary[district.name] = {
                 "total_applications": district_apps,
                 "approved_applications": district_approved,
@@ -344,6 +366,9 @@ def approve_reject_application(
         if approval_request.override_prediction:
             application.override_reason = approval_request.override_reason
         
+        # Fold the predicted/approved pair into the model accuracy stats
+        accuracy_tracker.record_approval(db, application)
+        
         # Create approval review record
         review = ApplicationReview(
             application_id=application.id,
@@ -448,6 +473,38 @@ def get_pending_applications(
         for app in applications
     ]
 
+@router.get("/applications/export")
+def export_applications(
+    current_user: User = Depends(require_supervisor),
+    db: Session = Depends(get_db),
+    file_format: str = Query("csv", alias="format", pattern="^(csv|xlsx|parquet)$", description="csv, xlsx or parquet"),
+    status: Optional[str] = Query(None, description="Filter by status (pending, approved, rejected, etc.)"),
+    district_id: Optional[str] = Query(None, description="Filter by district ID")
+):
+    """Download the applications in accessible districts, streamed as they are read"""
+    
+    if not check_supervisor_permissions(current_user):
+        raise HTTPException(
+            status_code=403,
+            detail="Insufficient permissions. Supervisor role required."
+        )
+    
+    accessible_districts = get_supervisor_districts(current_user, db)
+    
+    if not accessible_districts:
+        raise HTTPException(
+            status_code=403,
+            detail="No accessible districts found"
+        )
+    
+    query = export_select(accessible_districts, district_id, status)
+    filename = f"loan-applications-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{file_format}"
+    return StreamingResponse(
+        stream_export(query, file_format),
+        media_type=EXPORT_FORMATS[file_format]["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.post("/applications/{application_id}/assign")
 def assign_application_to_officer(
     application_id: str,
@@ -7,19 +7,90 @@ class ModelDeploymentConfig(BaseSettings):
     """Configuration for model deployment"""
     
     # Model settings
-    MODEL_PATH: str = "models/loan_predictor1.pkl"
-    MODEL_BACKUP_PATH: str = "models/backup/"
+    MODEL_PATH: str = "app/ml_model/loan_predictor1.pkl"  # imported into the store on first start
+    MODEL_STORE_PATH: str = "app/ml_model/store/"
+    MODEL_STORE_KEEP: int = 5  # unpinned artifacts kept by garbage collection
+    MODEL_STORE_HISTORY_SIZE: int = 10  # replaced versions remembered for rollback
     MODEL_VERSION: str = "1.0.0"
     
+    # Training data settings
+    FEATURE_STORE_PATH: str = "app/ml_model/features/"
+    FEATURE_EXTRACT_CHUNK_SIZE: int = 10000
+    FEATURE_EXTRACT_SETTLE_SECONDS: int = 300  # skip approvals newer than this
+    
+    # Scheduled retraining settings
+    RETRAIN_ENABLED: bool = True
+    RETRAIN_TIME: str = "03:00"
+    RETRAIN_MIN_NEW_ROWS: int = 50
+    RETRAIN_MIN_TOTAL_ROWS: int = 200
+    RETRAIN_HOLDOUT_FRACTION: float = 0.2  # most recent approvals
+    RETRAIN_MIN_HOLDOUT_ROWS: int = 20  # approvals after the live model's training cutoff
+    RETRAIN_MIN_IMPROVEMENT: float = 0.02  # relative holdout MAE improvement over live
+    RETRAIN_FULL_SEARCH: bool = False  # otherwise retrain the live configuration
+    RETRAIN_N_JOBS: int = 1
+    RETRAIN_NICENESS: int = 10
+    RETRAIN_TIMEOUT_SECONDS: int = 3600
+    RETRAIN_HISTORY_SIZE: int = 50
+    RETRAIN_HISTORY_PATH: str = "app/ml_model/retrain_history.jsonl"
+    
+    # Deployment validation settings
+    GOLDEN_INPUTS_PATH: str = "app/ml_model/golden_inputs.json"
+    MODEL_LATENCY_BUDGET_MS: float = 50.0  # p95 single-row latency
+    GOLDEN_MAX_PREDICTION_MWK: float = 10000000.0
+    GOLDEN_MAX_MEDIAN_DEVIATION: float = 0.5  # relative to the live model
+    
+    # Prediction interval settings
+    PREDICTION_INTERVAL_COVERAGE: float = 0.8  # share of held-out amounts inside the interval
+    
     # Performance settings
     MAX_BATCH_SIZE: int = 100
     PREDICTION_TIMEOUT: int = 30  # seconds
-    MODEL_CACHE_SIZE: int = 1  # Number of models to keep in memory
+    MODEL_CACHE_SIZE: int = 3  # Previous versions kept in memory for rollback
+    
+    # Prediction backfill settings
+    BACKFILL_INTERVAL_MINUTES: int = 10
+    BACKFILL_CHUNK_SIZE: int = 1000  # applications claimed and written per transaction
+    BACKFILL_MAX_ATTEMPTS: int = 3
+    
+    # Portfolio re-scoring settings
+    RESCORE_AFTER_DEPLOY: bool = True  # re-score pending applications when a new model goes live
+    RESCORE_CHUNK_SIZE: int = 5000
+    RESCORE_WORKERS: int = 1  # processes scoring chunks; 1 scores in the calling thread
+    
+    # Prediction explanation settings
+    EXPLANATION_CACHE_SIZE: int = 5000  # explained applications kept in memory
+    
+    # What-if simulation settings
+    WHAT_IF_MAX_POINTS: int = 10000
+    WHAT_IF_CACHE_SIZE: int = 256  # response surfaces kept in memory
+    
+    # Shadow scoring settings
+    SHADOW_QUEUE_SIZE: int = 1000
+    SHADOW_BATCH_SIZE: int = 32
+    
+    # Canary routing settings
+    CANARY_STATS_WINDOW: int = 1000  # recent predictions kept per model version
+    CANARY_MIN_SAMPLES: int = 50
+    CANARY_HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0  # latency/error checks on the request path
+    CANARY_MAX_P99_LATENCY_MS: float = 500.0
+    CANARY_MAX_LATENCY_RATIO: float = 2.0  # canary p99 relative to stable p99
+    CANARY_MAX_ERROR_RATE: float = 0.05
+    CANARY_MAX_MAPE_INCREASE: float = 0.05  # vs stable, on approved applications
+    CANARY_MIN_APPROVED_SAMPLES: int = 30
     
     # Monitoring settings
     ENABLE_MONITORING: bool = True
     METRICS_ENDPOINT: str = "/metrics"
     HEALTH_CHECK_INTERVAL: int = 300  # seconds
+    MODEL_METRICS_CACHE_TTL: int = 30  # seconds
+    MODEL_METRICS_HISTOGRAM_BUCKETS: int = 10
+    
+    # Drift detection settings
+    DRIFT_REFERENCE_BINS: int = 10
+    DRIFT_SLOT_MINUTES: int = 60
+    DRIFT_MAX_WINDOW_HOURS: int = 168  # 7 days
+    DRIFT_PSI_THRESHOLD: float = 0.2
+    DRIFT_MIN_SAMPLES: int = 30
     
     # Logging settings
     LOG_LEVEL: str = "INFO"
@@ -27,6 +98,12 @@ class ModelDeploymentConfig(BaseSettings):
     
     # Database settings
     PREDICTION_HISTORY_RETENTION_DAYS: int = 365
+    ARCHIVE_PATH: str = "archive/"  # Parquet files of archived applications, reviews and shadow scores
+    ARCHIVE_BATCH_SIZE: int = 2000  # applications moved per transaction
+    ARCHIVE_BATCH_PAUSE_SECONDS: float = 0.2  # between transactions, to spread WAL and I/O
+    ARCHIVE_LOCK_TIMEOUT: str = "5s"  # give up on a batch rather than queue behind live traffic
+    ARCHIVE_TIME: str = "02:00"
+    PARTITION_MONTHS_AHEAD: int = 3  # monthly partitions created ahead of time
         
 ml_config = ModelDeploymentConfig()
 
@@ -1,17 +1,84 @@
+import logging
+
+import numpy as np
+import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 
+logger = logging.getLogger(__name__)
+
+
+def normalize_category(value) -> str:
+    """Categories match case- and whitespace-insensitively ('Maize ' == 'maize')"""
+    return str(value).strip().lower()
+
 
 class FrequencyEncoder(BaseEstimator, TransformerMixin):
+    """Replace a categorical column with how often each category appeared in training.
+
+    Categories unseen during fit encode as 0. Lookups go through a sorted
+    category index: each distinct input value is normalized and searched once,
+    then the result is broadcast back to the rows.
+    """
+
     def __init__(self, column):
         self.column = column
         self.freq_map = {}
 
     def fit(self, X, y=None):
-        freq = X[self.column].value_counts()
+        freq = X[self.column].map(normalize_category).value_counts()
         self.freq_map = freq.to_dict()
+        self._build_index()
         return self
 
+    def _build_index(self):
+        """Sorted categories_ and matching frequencies_, with a trailing 0 for unseen values.
+
+        Artifacts pickled before normalization can hold keys that normalize to
+        the same category (e.g. 'groundnuts' and 'groundnuts '); the key that is
+        already normalized wins so existing models keep their encodings.
+        """
+        index = {}
+        for key, count in self.freq_map.items():
+            normalized = normalize_category(key)
+            if key == normalized or normalized not in index:
+                index[normalized] = count
+        categories = sorted(index)
+        self.categories_ = np.asarray(categories, dtype=object)
+        self.frequencies_ = np.asarray([index[c] for c in categories] + [0], dtype=np.float64)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("_warned_unseen", None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if "categories_" not in self.__dict__:
+            self._build_index()
+
+    def _codes(self, values):
+        """Position of each value in categories_, or len(categories_) if unseen"""
+        uniques_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        normalized = np.asarray([normalize_category(u) for u in uniques], dtype=object)
+        if len(self.categories_) == 0:
+            return np.zeros(len(uniques_codes), dtype=np.intp), normalized
+        positions = np.searchsorted(self.categories_, normalized)
+        clipped = np.minimum(positions, len(self.categories_) - 1)
+        found = self.categories_[clipped] == normalized
+        unique_codes = np.where(found, positions, len(self.categories_))
+        return unique_codes[uniques_codes], normalized[~found]
+
     def transform(self, X):
-        X = X.copy()
-        X[self.column] = X[self.column].map(self.freq_map).fillna(0)
-        return X[[self.column]]
\ No newline at end of file
+        codes, unseen = self._codes(X[self.column])
+        if len(unseen):
+            # Warn once per category; transform runs on every prediction
+            warned = self.__dict__.setdefault("_warned_unseen", set())
+            new = set(unseen) - warned
+            if new:
+                warned.update(new)
+                logger.warning(f"Unseen {self.column} categories encoded as 0: {sorted(new)}")
+        return self.frequencies_[codes].reshape(-1, 1)
+
+    def unseen_categories(self, X):
+        """Normalized values of X that were not seen during fit"""
+        return sorted(self._codes(X[self.column])[1])
@@ -1,4 +1,6 @@
 from fastapi.middleware.cors import CORSMiddleware
+from app.config.settings import settings
+from app.utils.profiler import RequestProfilingMiddleware
 
 origins = [
     "http://localhost",
@@ -22,3 +24,8 @@ def add_cors_middleware(app):
         allow_methods=["*"],  
         allow_headers=["*"], 
     )
+
+def add_profiling_middleware(app):
+    # Only installed when enabled, so requests pay nothing for it otherwise
+    if settings.PROFILE_REQUESTS:
+        app.add_middleware(RequestProfilingMiddleware)
@@ -0,0 +1,190 @@
+"""Extract training data from the production database into a Parquet dataset.
+
+Approved applications are joined with the farmer's most recent earlier yield
+for the same crop and streamed from a server-side cursor in chunks, so memory
+use is bounded by the chunk size rather than the table size. Each run appends
+one Parquet file (one row group per chunk) holding only rows approved after
+the watermark left by the previous run.
+
+    python -m app.model_development.feature_extraction [--output DIR] [--full]
+
+The dataset directory can be passed straight to train.py --data.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config.database import engine
+from app.config.ml_deployment import ml_config as config
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_FILE = "_watermark.json"
+
+FEATURE_SCHEMA = pa.schema([
+    ("application_id", pa.string()),
+    ("approval_date", pa.timestamp("us")),
+    ("loan_farm_size", pa.float64()),
+    ("loan_crop", pa.string()),
+    ("past_yield_kgs", pa.float64()),
+    ("past_yield_mk", pa.float64()),
+    ("expected_yield_kgs", pa.float64()),
+    ("expected_yield_mk", pa.float64()),
+    ("loan_amount", pa.float64()),
+])
+
+# Features are built the way the farmers API builds them at prediction time:
+# lower-cased crop name, and 0 when the farmer has no earlier yield record.
+# (approval_date, id) orders rows so the watermark is a strict cursor; only
+# approvals older than the settle lag are read, so an approval still being
+# committed with an earlier timestamp is not skipped.
+EXTRACT_QUERY = text("""
+    SELECT
+        la.id::text AS application_id,
+        la.approval_date,
+        la.farm_size_hectares::float8 AS loan_farm_size,
+        lower(ct.name) AS loan_crop,
+        COALESCE(py.yield_amount_kg, 0)::float8 AS past_yield_kgs,
+        COALESCE(py.revenue_mwk, 0)::float8 AS past_yield_mk,
+        la.expected_yield_kg::float8 AS expected_yield_kgs,
+        la.expected_revenue_mwk::float8 AS expected_yield_mk,
+        la.approved_amount_mwk::float8 AS loan_amount
+    FROM loan_applications la
+    JOIN crop_types ct ON ct.id = la.crop_type_id
+    LEFT JOIN farmer_profiles fp ON fp.user_id = la.farmer_id
+    LEFT JOIN LATERAL (
+        SELECT yh.yield_amount_kg, yh.revenue_mwk
+        FROM yield_history yh
+        WHERE yh.farmer_id = fp.id
+          AND yh.crop_type_id = la.crop_type_id
+          AND yh.year < EXTRACT(YEAR FROM la.application_date)
+        ORDER BY yh.year DESC
+        LIMIT 1
+    ) py ON TRUE
+    WHERE la.approved_amount_mwk > 0
+      AND la.approval_date < CAST(:settled_before AS TIMESTAMP)
+      AND la.farm_size_hectares IS NOT NULL
+      AND la.expected_yield_kg IS NOT NULL
+      AND la.expected_revenue_mwk IS NOT NULL
+      AND (
+          CAST(:after_date AS TIMESTAMP) IS NULL
+          OR (la.approval_date, la.id) > (CAST(:after_date AS TIMESTAMP), CAST(:after_id AS UUID))
+      )
+    ORDER BY la.approval_date, la.id
+""")
+
+
+def read_watermark(output_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_watermark(output_dir: str, watermark: Dict[str, Any]):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def extract_features(
+    output_dir: str = None,
+    full: bool = False,
+    chunk_size: int = None,
+    settle_seconds: int = None,
+    bind: Engine = engine
+) -> Dict[str, Any]:
+    """Append newly approved applications to the Parquet dataset at output_dir.
+
+    The Parquet file is written under a temporary name and the watermark is
+    only advanced after it is renamed into place, so an interrupted run leaves
+    the dataset unchanged and is simply repeated next time.
+    """
+    output_dir = output_dir or config.FEATURE_STORE_PATH
+    chunk_size = chunk_size or config.FEATURE_EXTRACT_CHUNK_SIZE
+    settle_seconds = config.FEATURE_EXTRACT_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+    if full and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    watermark = read_watermark(output_dir) or {"approval_date": None, "application_id": None, "rows": 0}
+    started = time.perf_counter()
+    part_name = f"part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}.parquet"
+    tmp_path = os.path.join(output_dir, f".{part_name}.tmp")
+
+    rows = 0
+    last_row = None
+    writer = None
+    try:
+        with bind.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                EXTRACT_QUERY,
+                {
+                    "after_date": watermark["approval_date"],
+                    "after_id": watermark["application_id"],
+                    "settled_before": datetime.now() - timedelta(seconds=settle_seconds)
+                }
+            )
+            for chunk in result.mappings().partitions(chunk_size):
+                table = pa.Table.from_pylist([dict(row) for row in chunk], schema=FEATURE_SCHEMA)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, FEATURE_SCHEMA)
+                writer.write_table(table)
+                rows += len(chunk)
+                last_row = chunk[-1]
+    except Exception:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+        raise
+    if writer is not None:
+        writer.close()
+
+    if rows == 0:
+        logger.info("Feature extraction: no new approved applications")
+        return {"rows_appended": 0, "total_rows": watermark["rows"], "output_dir": output_dir, "watermark": watermark}
+
+    os.replace(tmp_path, os.path.join(output_dir, part_name))
+    watermark = {
+        "approval_date": last_row["approval_date"].isoformat(),
+        "application_id": last_row["application_id"],
+        "rows": watermark["rows"] + rows,
+        "updated_at": datetime.now().isoformat()
+    }
+    _write_watermark(output_dir, watermark)
+
+    duration = time.perf_counter() - started
+    logger.info(f"Feature extraction: appended {rows} rows to {output_dir} in {duration:.1f}s")
+    return {
+        "rows_appended": rows,
+        "total_rows": watermark["rows"],
+        "output_dir": output_dir,
+        "part": part_name,
+        "duration_seconds": round(duration, 2),
+        "watermark": watermark
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract model training data from the database to Parquet")
+    parser.add_argument("--output", default=config.FEATURE_STORE_PATH)
+    parser.add_argument("--full", action="store_true", help="Discard the dataset and extract everything again")
+    parser.add_argument("--chunk-size", type=int, default=config.FEATURE_EXTRACT_CHUNK_SIZE)
+    parser.add_argument("--settle-seconds", type=int, default=config.FEATURE_EXTRACT_SETTLE_SECONDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(extract_features(args.output, args.full, args.chunk_size, args.settle_seconds), indent=2))
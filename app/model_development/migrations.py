@@ -0,0 +1,39 @@
+# migrations.py
+from sqlalchemy import text
+from app.models.db_models import Base
+from app.config.database import engine
+from app.model_development.partitioning import PARTITIONED_TABLES, convert_to_partitioned, ensure_partitions
+
+# Idempotent schema changes for columns added to existing tables.
+# New tables are created by Base.metadata.create_all.
+MIGRATIONS = [
+    "ALTER TABLE loan_applications ADD COLUMN IF NOT EXISTS model_version VARCHAR(64)",
+    "ALTER TABLE loan_applications ADD COLUMN IF NOT EXISTS prediction_lower_mwk NUMERIC(12, 2)",
+    "ALTER TABLE loan_applications ADD COLUMN IF NOT EXISTS prediction_upper_mwk NUMERIC(12, 2)",
+    "CREATE INDEX IF NOT EXISTS ix_loan_applications_approval_date ON loan_applications (approval_date)",
+    # Cursor order for incremental feature extraction
+    "CREATE INDEX IF NOT EXISTS ix_loan_applications_approval_date_id ON loan_applications (approval_date, id)",
+    # Keyset order for re-scoring pending applications
+    "CREATE INDEX IF NOT EXISTS ix_loan_applications_pending_id ON loan_applications (id) "
+    "WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')",
+    # Pending queue in date order, read partition by partition until the LIMIT
+    "CREATE INDEX IF NOT EXISTS ix_loan_applications_pending_date ON loan_applications (application_date) "
+    "WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')",
+    "ALTER TABLE prediction_jobs ADD COLUMN IF NOT EXISTS application_date TIMESTAMP",
+]
+
+
+def run_migrations():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Tables created before partitioning are rebuilt once
+        for table, column in PARTITIONED_TABLES.items():
+            convert_to_partitioned(conn, table, column)
+        for statement in MIGRATIONS:
+            conn.execute(text(statement))
+    ensure_partitions()
+    print("Migrations applied successfully!")
+
+
+if __name__ == "__main__":
+    run_migrations()
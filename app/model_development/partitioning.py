@@ -0,0 +1,354 @@
+# partitioning.py
+"""Monthly range partitions for loan_applications and application_reviews.
+
+Both tables are partitioned by month of their date column, with a DEFAULT
+partition that catches anything outside the monthly ranges. Queries that
+bound the date (monthly trends, date ranges) only touch the matching
+partitions, and queries ordered by the date read partitions in order and stop
+at their LIMIT. A lookup by id alone probes every partition, so the batch
+paths that know their applications' dates bound them with
+batch_scoring.DATE_BOUNDS. ensure_partitions() keeps PARTITION_MONTHS_AHEAD
+months of empty partitions in place; it runs from the scheduler and the
+migrations.
+
+    python -m app.model_development.partitioning maintain
+    python -m app.model_development.partitioning benchmark [rows]
+"""
+import json
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config.database import engine
+from app.config.ml_deployment import ml_config as config
+from app.models.db_models import Base
+
+# Partitioned table -> partition key
+PARTITIONED_TABLES = {
+    "loan_applications": "application_date",
+    "application_reviews": "review_date",
+}
+
+
+def _month(moment) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}).scalar()
+    return kind == "p"
+
+
+def create_partition(conn: Connection, table: str, column: str, month: date) -> bool:
+    """Create the month's partition; returns False if it already exists.
+
+    Rows of that month already in the default partition are moved into it.
+    """
+    name = partition_name(table, month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+
+    bounds = {"start": month, "end": _add_months(month, 1)}
+    create = text(
+        f"CREATE TABLE {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    )
+    default = f"{table}_default"
+    stranded = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= :start AND {column} < :end)"), bounds
+    ).scalar()
+    if not stranded:
+        conn.execute(create)
+        return True
+
+    # A partition cannot be added while the default partition holds rows in its range
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    conn.execute(create)
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {default} WHERE {column} >= :start AND {column} < :end RETURNING *
+        )
+        INSERT INTO {table} SELECT * FROM moved
+    """), bounds)
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    return True
+
+
+def create_partitions(conn: Connection, first: date, last: date) -> List[str]:
+    """Create any missing monthly partitions of the partitioned tables from first to last month"""
+    created = []
+    for table, column in PARTITIONED_TABLES.items():
+        if not is_partitioned(conn, table):
+            continue
+        month = _month(first)
+        while month <= _month(last):
+            if create_partition(conn, table, column, month):
+                created.append(partition_name(table, month))
+            month = _add_months(month, 1)
+    return created
+
+
+def ensure_partitions(bind: Engine = engine, months_ahead: int = None, since: Optional[date] = None) -> List[str]:
+    """Create missing monthly partitions from `since` (default: this month) to months_ahead from now"""
+    months_ahead = config.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    with bind.begin() as conn:
+        return create_partitions(conn, since or datetime.now(), _add_months(_month(datetime.now()), months_ahead))
+
+
+def convert_to_partitioned(conn: Connection, table: str, column: str) -> bool:
+    """Rebuild a plain table as a partitioned one; returns False if it already is.
+
+    The rows are copied in the migration's transaction, so the table is
+    unavailable for the duration of the copy.
+    """
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}).scalar()
+    if kind != "r":
+        return False
+    legacy = f"{table}_unpartitioned"
+
+    # Foreign keys to the table cannot be kept: they need a unique constraint on id alone
+    references = conn.execute(text("""
+        SELECT conrelid::regclass::text AS child, conname
+        FROM pg_constraint
+        WHERE confrelid = CAST(:table AS regclass) AND contype = 'f'
+    """), {"table": table}).all()
+    for child, constraint in references:
+        conn.execute(text(f'ALTER TABLE {child} DROP CONSTRAINT "{constraint}"'))
+
+    # Free the constraint and index names for the new table
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    for (constraint,) in conn.execute(text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:legacy AS regclass)"), {"legacy": legacy}).all():
+        conn.execute(text(f'ALTER TABLE {legacy} DROP CONSTRAINT "{constraint}"'))
+    for (index,) in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :legacy"), {"legacy": legacy}).all():
+        conn.execute(text(f'DROP INDEX "{index}"'))
+
+    new_table = Base.metadata.tables[table]
+    new_table.create(conn, checkfirst=True)
+
+    first = conn.execute(text(f"SELECT min({column}) FROM {legacy}")).scalar()
+    month = _month(first or datetime.now())
+    last = _add_months(_month(datetime.now()), config.PARTITION_MONTHS_AHEAD)
+    while month <= last:
+        create_partition(conn, table, column, month)
+        month = _add_months(month, 1)
+
+    legacy_columns = set(conn.execute(
+        text("SELECT column_name FROM information_schema.columns WHERE table_name = :legacy"), {"legacy": legacy}
+    ).scalars())
+    columns = [c.name for c in new_table.columns if c.name in legacy_columns]
+    values = [f"COALESCE({name}, now())" if name == column else name for name in columns]
+    conn.execute(text(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {legacy}"))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    return True
+
+
+BENCHMARK_SCHEMA = "partition_benchmark"
+
+BENCHMARK_COLUMNS = """
+    id uuid NOT NULL,
+    application_date timestamp NOT NULL,
+    status text NOT NULL,
+    district_id integer NOT NULL,
+    predicted_amount_mwk numeric(12, 2)
+"""
+
+# Five years of applications; only the last two months still have pending ones
+BENCHMARK_ROWS_QUERY = """
+    SELECT
+        gen_random_uuid(),
+        date_trunc('month', now()) + interval '3 months' - (i::float8 / :rows) * interval '5 years' - interval '1 second',
+        CASE
+            WHEN i::float8 / :rows < 1.0 / 30 THEN (ARRAY['SUBMITTED', 'UNDER_REVIEW'])[1 + i % 2]
+            ELSE (ARRAY['APPROVED', 'REJECTED', 'DISBURSED'])[1 + i % 3]
+        END,
+        i % 28,
+        round((50000 + random() * 500000)::numeric, 2)
+    FROM generate_series(1, :rows) AS i
+"""
+
+BENCHMARK_QUERIES = {
+    # Supervisor dashboard: applications and approvals over the last six months,
+    # with the bounds bound as parameters the way the ORM sends them
+    "monthly_trend": """
+        SELECT date_trunc('month', application_date) AS month,
+               count(*) AS applications,
+               count(*) FILTER (WHERE status = 'APPROVED') AS approvals
+        FROM {table}
+        WHERE application_date >= :start AND application_date < :end
+        GROUP BY 1
+    """,
+    # Supervisor pending queue: oldest pending applications first
+    "pending_queue": """
+        SELECT id, application_date, district_id, predicted_amount_mwk
+        FROM {table}
+        WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')
+        ORDER BY application_date
+        LIMIT 20
+    """,
+    # Pending count per district, as on the dashboard
+    "pending_by_district": """
+        SELECT district_id, count(*)
+        FROM {table}
+        WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')
+        GROUP BY 1
+    """,
+    # One application by id, as on approval and the officer detail page; the
+    # partitioned table cannot prune without the date
+    "id_lookup": """
+        SELECT id, application_date, status, predicted_amount_mwk
+        FROM {table}
+        WHERE id = :id
+    """,
+    # The same lookup when the caller also knows the application date
+    "id_lookup_with_date": """
+        SELECT id, application_date, status, predicted_amount_mwk
+        FROM {table}
+        WHERE id = :id AND application_date = :application_date
+    """,
+    # A chunk of pending ids, as the backfill loads its features
+    "id_batch": """
+        SELECT id, application_date, status, predicted_amount_mwk
+        FROM {table}
+        WHERE id = ANY(:ids)
+    """,
+    # The same chunk bounded by its dates, as the re-score and the archiver do
+    "id_batch_with_dates": """
+        SELECT id, application_date, status, predicted_amount_mwk
+        FROM {table}
+        WHERE id = ANY(:ids) AND application_date >= :first_date AND application_date <= :last_date
+    """,
+}
+
+
+# Table layouts compared: the schema before partitioning (pending applications
+# indexed by id only), the same plain table with this migration's indexes, and
+# the partitioned table
+BENCHMARK_VARIANTS = {
+    "unpartitioned": {
+        "create": "CREATE TABLE {table} ({columns}, PRIMARY KEY (id))",
+        "indexes": ["CREATE INDEX ON {table} (id) WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')"],
+    },
+    "indexed": {
+        "create": "CREATE TABLE {table} ({columns}, PRIMARY KEY (id))",
+        "indexes": [
+            "CREATE INDEX ON {table} (application_date)",
+            "CREATE INDEX ON {table} (application_date) WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')",
+        ],
+    },
+    "partitioned": {
+        "create": "CREATE TABLE {table} ({columns}, PRIMARY KEY (id, application_date)) PARTITION BY RANGE (application_date)",
+        "indexes": [
+            "CREATE INDEX ON {table} (application_date)",
+            "CREATE INDEX ON {table} (application_date) WHERE status IN ('SUBMITTED', 'UNDER_REVIEW')",
+        ],
+    },
+}
+
+
+def benchmark(rows: int = 10000000, repeats: int = 5, bind: Engine = engine) -> Dict[str, Any]:
+    """Time dashboard, pending-queue and id lookups on each of BENCHMARK_VARIANTS, holding the same rows.
+
+    The tables are built in a scratch schema and dropped afterwards. Reports
+    the median of `repeats` warm runs per query, and the speedup of the
+    partitioned table over the others.
+    """
+    tables = {variant: f"{BENCHMARK_SCHEMA}.{variant}" for variant in BENCHMARK_VARIANTS}
+    partitioned = tables["partitioned"]
+    results: Dict[str, Any] = {"rows": rows}
+    try:
+        with bind.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {BENCHMARK_SCHEMA}"))
+            for variant, table in tables.items():
+                conn.execute(text(BENCHMARK_VARIANTS[variant]["create"].format(table=table, columns=BENCHMARK_COLUMNS)))
+            conn.execute(text(f"CREATE TABLE {partitioned}_default PARTITION OF {partitioned} DEFAULT"))
+            month = _add_months(_month(datetime.now()), -60)
+            while month <= _add_months(_month(datetime.now()), 3):
+                conn.execute(text(
+                    f"CREATE TABLE {BENCHMARK_SCHEMA}.{partition_name('partitioned', month)} PARTITION OF {partitioned} "
+                    f"FOR VALUES FROM ('{month}') TO ('{_add_months(month, 1)}')"
+                ))
+                month = _add_months(month, 1)
+
+            started = time.perf_counter()
+            conn.execute(text(f"INSERT INTO {tables['unpartitioned']} {BENCHMARK_ROWS_QUERY}"), {"rows": rows})
+            for variant, table in tables.items():
+                if variant != "unpartitioned":
+                    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {tables['unpartitioned']}"))
+                for index in BENCHMARK_VARIANTS[variant]["indexes"]:
+                    conn.execute(text(index.format(table=table)))
+            results["load_seconds"] = round(time.perf_counter() - started, 1)
+
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in tables.values():
+                conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+        this_month = _month(datetime.now())
+        params = {"start": _add_months(this_month, -5), "end": _add_months(this_month, 1)}
+        with bind.connect() as conn:
+            row = conn.execute(text(f"SELECT id, application_date FROM {tables['unpartitioned']} TABLESAMPLE SYSTEM (1) LIMIT 1")).one()
+            chunk = conn.execute(text(
+                f"SELECT id, application_date FROM {tables['unpartitioned']} "
+                f"WHERE status IN ('SUBMITTED', 'UNDER_REVIEW') ORDER BY id LIMIT 100"
+            )).all()
+            params.update(
+                id=row.id, application_date=row.application_date, ids=[r.id for r in chunk],
+                first_date=min(r.application_date for r in chunk), last_date=max(r.application_date for r in chunk)
+            )
+            for name, query in BENCHMARK_QUERIES.items():
+                results[name] = {}
+                for variant, table in tables.items():
+                    sql = text(query.format(table=table))
+                    conn.execute(sql, params).all()
+                    timings = []
+                    for _ in range(repeats):
+                        started = time.perf_counter()
+                        conn.execute(sql, params).all()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    results[name][f"{variant}_ms"] = round(float(np.median(timings)), 2)
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query.format(table=partitioned)}"), params).scalar()
+                results[name]["partitions_scanned"] = _count_scans(plan[0]["Plan"], BENCHMARK_SCHEMA)
+                for variant in ("unpartitioned", "indexed"):
+                    results[name][f"speedup_vs_{variant}"] = round(
+                        results[name][f"{variant}_ms"] / results[name]["partitioned_ms"], 1
+                    )
+    finally:
+        with bind.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE"))
+    return results
+
+
+def _count_scans(plan: Dict[str, Any], schema: str) -> int:
+    """Relations scanned anywhere in an EXPLAIN plan"""
+    relations = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if node.get("Relation Name") and node.get("Schema", schema) == schema:
+            relations.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return len(relations)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "maintain"
+    if command == "maintain":
+        print(json.dumps({"created": ensure_partitions()}, indent=2))
+    elif command == "benchmark":
+        print(json.dumps(benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10000000), indent=2))
+    else:
+        sys.exit(f"Unknown command {command}; use maintain or benchmark")
@@ -0,0 +1,167 @@
+"""Retrain the loan amount model and compare it with the live model.
+
+Run by the scheduled retraining job in a separate, lower-priority process so
+training does not compete with the API for CPU. The newest approvals are held
+out, never including rows from before the live model's training cutoff, so
+the live model is not scored on data it was trained on. The candidate is
+trained on the rest, and both models are scored on the holdout through the
+same clipped predictions the API serves. The candidate is registered in the
+artifact store and the comparison written as JSON for the job to decide on
+promotion.
+
+    python -m app.model_development.retrain --data DIR --live-model PATH --result FILE
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from app.config.ml_deployment import ml_config as config
+from app.model_development import train
+from app.services.artifact_store import artifact_store
+from app.services.compact_model import CompactModel, is_compact_model
+
+# The configuration train.py used before the model search existed
+DEFAULT_CANDIDATE = {
+    'name': 'gbr(learning_rate=0.1, max_depth=5, n_estimators=200)',
+    'family': 'gbr',
+    'params': {'learning_rate': 0.1, 'max_depth': 5, 'n_estimators': 200},
+}
+
+
+def live_metadata(live_version):
+    if not live_version:
+        return {}
+    try:
+        return artifact_store.get_metadata(live_version)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def live_candidate(live_version):
+    """The search candidate the live model was trained with, if the store recorded it"""
+    evaluation = live_metadata(live_version).get('evaluation') or {}
+    for candidate in evaluation.get('candidates', []):
+        if candidate['name'] == evaluation.get('chosen'):
+            return {k: candidate[k] for k in ('name', 'family', 'params')}
+    return DEFAULT_CANDIDATE
+
+
+def time_split(data, holdout_fraction, cutoff=None):
+    """Hold out the most recently approved rows, which best resemble what the model will see next.
+
+    With a cutoff, only rows approved after it are held out, even if that is
+    less than holdout_fraction.
+    """
+    if 'approval_date' in data.columns:
+        data = data.sort_values('approval_date', kind='stable')
+    split = int(len(data) * (1 - holdout_fraction))
+    if cutoff is not None:
+        split = max(split, int((data['approval_date'] <= pd.Timestamp(cutoff)).sum()))
+    return data.iloc[:split], data.iloc[split:]
+
+
+def score(model, X_holdout, y_holdout):
+    predictions = train.served_predictions(model, X_holdout)
+    return {
+        'mae': float(mean_absolute_error(y_holdout, predictions)),
+        'r2': float(r2_score(y_holdout, predictions)),
+    }
+
+
+def evaluate_live(path, X_holdout, y_holdout):
+    model = CompactModel(path) if is_compact_model(path) else joblib.load(path)
+    p50_latency_ms, p95_latency_ms = train.measure_latency(model, X_holdout)
+    return {
+        **score(model, X_holdout, y_holdout),
+        'p50_latency_ms': p50_latency_ms,
+        'p95_latency_ms': p95_latency_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain on extracted data and compare with the live model")
+    parser.add_argument('--data', default=config.FEATURE_STORE_PATH)
+    parser.add_argument('--live-model', required=True, help="Path of the artifact currently serving")
+    parser.add_argument('--live-version', help="Artifact hash of the live model, to reuse its configuration")
+    parser.add_argument('--result', required=True, help="Where to write the comparison JSON")
+    parser.add_argument('--output', default=os.path.join(config.MODEL_STORE_PATH, 'retrained.pkl'))
+    parser.add_argument('--search', action='store_true', help="Run the full model search instead")
+    parser.add_argument('--cv-folds', type=int, default=3)
+    parser.add_argument('--n-jobs', type=int, default=config.RETRAIN_N_JOBS)
+    args = parser.parse_args()
+
+    timings = {}
+    start_time = time.perf_counter()
+    data = train.load_data(args.data)
+    cutoff = live_metadata(args.live_version).get('training_cutoff')
+    train_data, holdout = time_split(data, config.RETRAIN_HOLDOUT_FRACTION, cutoff)
+    features = train.num_features + train.cat_features
+    X_train, y_train = train_data[features], train_data[train.target]
+    X_holdout, y_holdout = holdout[features], holdout[train.target]
+    timings['load_seconds'] = round(time.perf_counter() - start_time, 2)
+
+    rows = {'train': int(len(X_train)), 'holdout': int(len(X_holdout))}
+    if len(X_holdout) < config.RETRAIN_MIN_HOLDOUT_ROWS:
+        with open(args.result, 'w') as f:
+            json.dump({
+                'skipped': f"{len(X_holdout)} approvals after the live model's training cutoff {cutoff}, "
+                           f"need {config.RETRAIN_MIN_HOLDOUT_ROWS}",
+                'rows': rows,
+                'timings': timings,
+            }, f, indent=2)
+        return
+
+    start_time = time.perf_counter()
+    candidates = None if args.search else [live_candidate(args.live_version)]
+    results, fitted = train.search(
+        X_train, y_train, X_holdout, y_holdout, args.cv_folds, args.n_jobs, candidates=candidates
+    )
+    chosen = train.choose(results, config.MODEL_LATENCY_BUDGET_MS)
+    pipeline = fitted[results.index(chosen)]
+    pipeline, intervals = train.fit_intervals(pipeline, X_train, y_train, X_holdout, y_holdout)
+    timings['train_seconds'] = round(time.perf_counter() - start_time, 2)
+
+    start_time = time.perf_counter()
+    live = evaluate_live(args.live_model, X_holdout, y_holdout)
+    timings['evaluate_live_seconds'] = round(time.perf_counter() - start_time, 2)
+
+    report = {
+        'chosen': chosen['name'],
+        'latency_budget_ms': config.MODEL_LATENCY_BUDGET_MS,
+        'cv_folds': args.cv_folds,
+        'holdout': 'latest approvals' + (f' after {cutoff}' if cutoff else ''),
+        'candidates': results,
+        'intervals': intervals,
+    }
+    artifact = train.save_and_register(pipeline, args.output, data, X_train, len(X_holdout), chosen, report)
+    os.remove(args.output)
+    os.remove(train.reference_profile_path(args.output))
+
+    result = {
+        'artifact_hash': artifact['hash'],
+        'model_version': artifact['model_version'],
+        'rows': rows,
+        'live_training_cutoff': cutoff,
+        'candidate': {
+            'name': chosen['name'],
+            **score(pipeline, X_holdout, y_holdout),
+            'cv_mae': chosen['cv_mae'],
+            'p50_latency_ms': chosen['p50_latency_ms'],
+            'p95_latency_ms': chosen['p95_latency_ms'],
+            'interval_p95_latency_ms': intervals['p95_latency_ms'],
+            'interval_coverage': intervals['test_coverage'],
+        },
+        'live': live,
+        'timings': timings,
+    }
+    with open(args.result, 'w') as f:
+        json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
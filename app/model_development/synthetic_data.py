@@ -0,0 +1,456 @@
+"""Deterministic synthetic dataset for load tests and benchmarks.
+
+Generates users (farmers, loan officers, supervisors and an admin), farmer
+profiles, yield histories, loan applications and reviews across the 28
+districts and 8 crops, at any scale from thousands to millions of
+applications. The same seed, scale and as_of date always produce the same
+rows and ids. Rows are generated with numpy in chunks and loaded with COPY,
+so memory stays flat and a million applications load in minutes.
+
+Applications are spread over the `years` before as_of in date order, the
+way they arrive: recent ones are still pending, older ones are decided. All
+generated accounts share SYNTHETIC_PASSWORD and use SYNTHETIC_EMAIL_DOMAIN,
+which is how purge() finds them again:
+
+    farmer{n}@, officer{n}@, supervisor{n}@ (n from 0) and admin@
+
+    python -m app.model_development.synthetic_data generate [applications] [seed]
+    python -m app.model_development.synthetic_data purge
+"""
+import csv
+import hashlib
+import io
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.config.database import engine
+from app.model_development.data_ingestion import districts_data, regions_data
+from app.model_development.partitioning import create_partitions
+from app.utils.auth_utils import hash_password
+
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.example.com"
+SYNTHETIC_PASSWORD = "Synthetic#2024"
+SYNTHETIC_MODEL_VERSION = "synthetic"
+
+# Crop types as seeded by seed.py: name -> (code, yield kg/ha, price MWK/kg, share of applications)
+CROP_PROFILES = {
+    "Maize": ("MAZ", 2000, 400, 0.35),
+    "Soya": ("SOY", 1200, 900, 0.18),
+    "Groundnuts": ("GRN", 1000, 1100, 0.14),
+    "Tobacco": ("TOB", 1500, 2500, 0.10),
+    "Beans": ("BNS", 800, 1200, 0.09),
+    "Sweet Potato": ("SWP", 10000, 250, 0.06),
+    "Irish": ("IRS", 15000, 350, 0.05),
+    "Onion": ("ONN", 12000, 600, 0.03),
+}
+
+FIRST_NAMES = [
+    "Chikondi", "Thokozani", "Mphatso", "Kondwani", "Tiyamike", "Chisomo", "Limbani", "Madalitso",
+    "Yamikani", "Dalitso", "Takondwa", "Tadala", "Blessings", "Grace", "Memory", "Patrick",
+]
+LAST_NAMES = [
+    "Banda", "Phiri", "Mwale", "Chirwa", "Nyirenda", "Tembo", "Kumwenda", "Gondwe",
+    "Mbewe", "Zulu", "Kachingwe", "Chisale", "Msiska", "Mhango", "Lungu", "Nkhoma",
+]
+
+APPLICATIONS_PER_FARMER = 3
+APPLICATIONS_PER_OFFICER = 5000
+YIELD_YEARS = 3
+PENDING_DAYS = 60
+CHUNK_SIZE = 100000
+
+# Status mix of applications younger and older than PENDING_DAYS
+RECENT_STATUSES = (["DRAFT", "SUBMITTED", "UNDER_REVIEW", "APPROVED", "REJECTED"], [0.05, 0.45, 0.30, 0.10, 0.10])
+DECIDED_STATUSES = (["APPROVED", "DISBURSED", "REJECTED"], [0.45, 0.30, 0.25])
+
+DISTRICT_QUERY = text("""
+    INSERT INTO districts (id, name, code, region) VALUES (gen_random_uuid(), :name, :code, :region)
+    ON CONFLICT DO NOTHING
+""")
+
+CROP_TYPE_QUERY = text("""
+    INSERT INTO crop_types (id, name, code, description) VALUES (gen_random_uuid(), :name, :code, :description)
+    ON CONFLICT DO NOTHING
+""")
+
+COLUMNS = {
+    "users": [
+        "id", "email", "phone_number", "hashed_password", "first_name", "last_name", "role", "gender",
+        "is_active", "is_superuser", "disability_status", "created_at", "district_id"
+    ],
+    "farmer_profiles": [
+        "id", "user_id", "date_of_birth", "national_id", "address", "farm_location_gps", "farm_size_hectares",
+        "is_new_applicant"
+    ],
+    "supervisor_loan_officer": ["supervisor_id", "loan_officer_id", "assigned_date", "is_active"],
+    "yield_history": ["id", "farmer_id", "year", "crop_type_id", "yield_amount_kg", "revenue_mwk"],
+    "loan_applications": [
+        "id", "farmer_id", "application_date", "status", "crop_type_id", "farm_size_hectares", "expected_yield_kg",
+        "expected_revenue_mwk", "district_id", "predicted_amount_mwk", "prediction_confidence", "prediction_lower_mwk",
+        "prediction_upper_mwk", "prediction_date", "model_version", "approved_amount_mwk", "approval_date",
+        "approved_by", "override_reason"
+    ],
+    "application_reviews": ["id", "application_id", "reviewer_id", "review_date", "comments", "action"],
+}
+
+PURGE_QUERIES = [
+    text("CREATE TEMP TABLE synthetic_users ON COMMIT DROP AS SELECT id FROM users WHERE email LIKE :pattern"),
+    text("""
+        CREATE TEMP TABLE synthetic_applications ON COMMIT DROP AS
+        SELECT id FROM loan_applications WHERE farmer_id IN (SELECT id FROM synthetic_users)
+    """),
+    text("DELETE FROM application_reviews WHERE application_id IN (SELECT id FROM synthetic_applications)"),
+    text("DELETE FROM shadow_predictions WHERE application_id IN (SELECT id FROM synthetic_applications)"),
+    text("DELETE FROM prediction_jobs WHERE application_id IN (SELECT id FROM synthetic_applications)"),
+    text("DELETE FROM loan_applications WHERE farmer_id IN (SELECT id FROM synthetic_users)"),
+    text("""
+        DELETE FROM yield_history
+        WHERE farmer_id IN (SELECT id FROM farmer_profiles WHERE user_id IN (SELECT id FROM synthetic_users))
+    """),
+    text("DELETE FROM farmer_profiles WHERE user_id IN (SELECT id FROM synthetic_users)"),
+    text("""
+        DELETE FROM supervisor_loan_officer
+        WHERE supervisor_id IN (SELECT id FROM synthetic_users) OR loan_officer_id IN (SELECT id FROM synthetic_users)
+    """),
+    text("DELETE FROM users WHERE id IN (SELECT id FROM synthetic_users)"),
+]
+
+
+def synthetic_email(kind: str, n: Optional[int] = None) -> str:
+    """Login of the n-th generated farmer, officer or supervisor, or of the admin"""
+    return f"{kind}{'' if n is None else n}@{SYNTHETIC_EMAIL_DOMAIN}"
+
+
+def _uuids(seed: int, kind: str, numbers: Iterable[int]) -> List[str]:
+    """Stable ids: a prefix per (seed, kind) followed by the row number"""
+    digest = hashlib.md5(f"{seed}:{kind}".encode()).hexdigest()
+    prefix = f"{digest[:8]}-{digest[8:12]}-4{digest[13:16]}"
+    return [f"{prefix}-{n >> 48:04x}-{n & 0xFFFFFFFFFFFF:012x}" for n in numbers]
+
+
+def _copy(conn: Connection, table: str, frame: pd.DataFrame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False, quoting=csv.QUOTE_MINIMAL, date_format="%Y-%m-%d %H:%M:%S")
+    buffer.seek(0)
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _chunks(total: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, total, CHUNK_SIZE):
+        yield start, min(CHUNK_SIZE, total - start)
+
+
+def _reference_ids(conn: Connection) -> Dict[str, Any]:
+    """Insert any missing districts and crop types, and return their ids in a fixed order"""
+    for district in districts_data:
+        conn.execute(DISTRICT_QUERY, {
+            "name": district["name"], "code": district["code"],
+            "region": regions_data.get(district["region"], {}).get("name", "Unknown")
+        })
+    for name, (code, *_) in CROP_PROFILES.items():
+        conn.execute(CROP_TYPE_QUERY, {"name": name, "code": code, "description": f"{name} crop"})
+
+    districts = dict(conn.execute(text("SELECT name, id::text FROM districts")).all())
+    crops = dict(conn.execute(text("SELECT name, id::text FROM crop_types")).all())
+    return {
+        "districts": [districts[d["name"]] for d in districts_data],
+        "district_names": [d["name"] for d in districts_data],
+        "crops": [crops[name] for name in CROP_PROFILES],
+    }
+
+
+class SyntheticDataGenerator:
+    """Generate and load one dataset; see the module docstring"""
+
+    def __init__(self, applications: int, seed: int = 42, years: int = 3, as_of: Optional[date] = None):
+        self.applications = applications
+        self.seed = seed
+        self.years = years
+        self.as_of = datetime.combine(as_of or date.today(), datetime.min.time())
+        self.start = self.as_of - timedelta(days=365 * years)
+
+        self.farmers = max(1, applications // APPLICATIONS_PER_FARMER)
+        self.officers_per_district = max(1, -(-applications // (len(districts_data) * APPLICATIONS_PER_OFFICER)))
+        self.officers = self.officers_per_district * len(districts_data)
+
+        self.crop_yields = np.array([profile[1] for profile in CROP_PROFILES.values()], dtype=float)
+        self.crop_prices = np.array([profile[2] for profile in CROP_PROFILES.values()], dtype=float)
+        self.crop_shares = np.array([profile[3] for profile in CROP_PROFILES.values()])
+
+        # Per-farmer attributes that applications and yield histories refer back to
+        rng = self._rng("farmer_attributes")
+        self.farmer_districts = rng.integers(0, len(districts_data), self.farmers).astype(np.int16)
+        self.farmer_farm_sizes = np.round(rng.lognormal(np.log(1.2), 0.5, self.farmers).clip(0.2, 20), 2)
+
+    def _rng(self, kind: str) -> np.random.Generator:
+        return np.random.default_rng([self.seed, int(hashlib.md5(kind.encode()).hexdigest()[:8], 16)])
+
+    def _ids(self, kind: str, start: int, count: int) -> List[str]:
+        return _uuids(self.seed, kind, range(start, start + count))
+
+    def load(self, conn: Connection) -> Dict[str, Any]:
+        """Insert the dataset in conn's transaction; returns row counts and load times per table"""
+        if conn.execute(text("SELECT EXISTS (SELECT 1 FROM users WHERE email = :email)"), {"email": synthetic_email("admin")}).scalar():
+            raise ValueError("A synthetic dataset is already loaded; purge it first")
+
+        self.reference = _reference_ids(conn)
+        create_partitions(conn, self.start, self.as_of)
+        self.password_hash = hash_password(SYNTHETIC_PASSWORD)
+
+        tables: Dict[str, Dict[str, Any]] = {}
+        started = last = time.perf_counter()
+        for table, frame in self._frames():
+            _copy(conn, table, frame)
+            now = time.perf_counter()
+            entry = tables.setdefault(table, {"rows": 0, "seconds": 0.0})
+            entry["rows"] += len(frame)
+            entry["seconds"] += now - last
+            last = now
+        for entry in tables.values():
+            entry["seconds"] = round(entry["seconds"], 2)
+        return {
+            "applications": self.applications,
+            "seed": self.seed,
+            "as_of": self.as_of.date().isoformat(),
+            "seconds": round(time.perf_counter() - started, 2),
+            "tables": tables,
+        }
+
+    def _frames(self) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """(table, rows) in load order, with generation time counted against the table"""
+        for table, frames in (
+            ("users", self._staff()),
+            ("supervisor_loan_officer", self._assignments()),
+            ("users", self._farmer_users()),
+            ("farmer_profiles", self._farmer_profiles()),
+            ("yield_history", self._yield_history()),
+        ):
+            for frame in frames:
+                yield table, frame
+        yield from self._applications()
+
+    def _staff(self) -> Iterator[pd.DataFrame]:
+        """Loan officers, one supervisor per district and the admin"""
+        districts = self.reference["districts"]
+        officer_districts = np.repeat(np.arange(len(districts)), self.officers_per_district)
+        count = self.officers + len(districts) + 1
+        rng = self._rng("staff")
+        yield pd.DataFrame({
+            "id": self._ids("officer", 0, self.officers) + self._ids("supervisor", 0, len(districts)) + self._ids("admin", 0, 1),
+            "email": (
+                [synthetic_email("officer", n) for n in range(self.officers)]
+                + [synthetic_email("supervisor", n) for n in range(len(districts))]
+                + [synthetic_email("admin")]
+            ),
+            "phone_number": [f"09{n:08d}" for n in range(count)],
+            "hashed_password": self.password_hash,
+            "first_name": rng.choice(FIRST_NAMES, count),
+            "last_name": rng.choice(LAST_NAMES, count),
+            "role": ["LOAN_OFFICER"] * self.officers + ["SUPERVISOR"] * len(districts) + ["ADMIN"],
+            "gender": rng.choice(["male", "female"], count),
+            "is_active": True,
+            "is_superuser": False,
+            "disability_status": False,
+            "created_at": self.start - timedelta(days=30),
+            "district_id": [districts[d] for d in officer_districts] + districts + [None],
+        }, columns=COLUMNS["users"])
+
+    def _assignments(self) -> Iterator[pd.DataFrame]:
+        """Each district's supervisor manages the district's officers"""
+        supervisors = self._ids("supervisor", 0, len(self.reference["districts"]))
+        yield pd.DataFrame({
+            "supervisor_id": [supervisors[n // self.officers_per_district] for n in range(self.officers)],
+            "loan_officer_id": self._ids("officer", 0, self.officers),
+            "assigned_date": self.start - timedelta(days=30),
+            "is_active": True,
+        }, columns=COLUMNS["supervisor_loan_officer"])
+
+    def _farmer_users(self) -> Iterator[pd.DataFrame]:
+        districts = np.array(self.reference["districts"])
+        rng = self._rng("farmer_users")
+        for start, count in _chunks(self.farmers):
+            numbers = range(start, start + count)
+            yield pd.DataFrame({
+                "id": self._ids("farmer", start, count),
+                "email": [synthetic_email("farmer", n) for n in numbers],
+                "phone_number": [f"08{n:08d}" for n in numbers],
+                "hashed_password": self.password_hash,
+                "first_name": rng.choice(FIRST_NAMES, count),
+                "last_name": rng.choice(LAST_NAMES, count),
+                "role": "FARMER",
+                "gender": rng.choice(["male", "female"], count),
+                "is_active": True,
+                "is_superuser": False,
+                "disability_status": rng.random(count) < 0.05,
+                "created_at": self.start - timedelta(days=30),
+                "district_id": districts[self.farmer_districts[start:start + count]],
+            }, columns=COLUMNS["users"])
+
+    def _farmer_profiles(self) -> Iterator[pd.DataFrame]:
+        names = np.array(self.reference["district_names"])
+        rng = self._rng("farmer_profiles")
+        for start, count in _chunks(self.farmers):
+            birth_days = rng.integers(18 * 365, 70 * 365, count)
+            latitudes, longitudes = rng.uniform(-17.1, -9.4, count), rng.uniform(32.7, 35.9, count)
+            yield pd.DataFrame({
+                "id": self._ids("farmer_profile", start, count),
+                "user_id": self._ids("farmer", start, count),
+                "date_of_birth": [self.as_of - timedelta(days=int(days)) for days in birth_days],
+                "national_id": [f"SYN{n:09d}" for n in range(start, start + count)],
+                "address": names[self.farmer_districts[start:start + count]],
+                "farm_location_gps": [f"{lat:.5f},{lon:.5f}" for lat, lon in zip(latitudes, longitudes)],
+                "farm_size_hectares": self.farmer_farm_sizes[start:start + count],
+                "is_new_applicant": False,
+            }, columns=COLUMNS["farmer_profiles"])
+
+    def _yield_history(self) -> Iterator[pd.DataFrame]:
+        """One to YIELD_YEARS past harvests per farmer, each of one crop"""
+        crops = np.array(self.reference["crops"])
+        rng = self._rng("yield_history")
+        first_id = 0
+        for start, count in _chunks(self.farmers):
+            years = rng.integers(1, YIELD_YEARS + 1, count)
+            farmers = np.repeat(np.arange(start, start + count), years)
+            offsets = np.arange(len(farmers)) - np.repeat(np.cumsum(years) - years, years)
+            crop = rng.choice(len(crops), len(farmers), p=self.crop_shares)
+            yield_kg = self.farmer_farm_sizes[farmers] * self.crop_yields[crop] * rng.lognormal(0, 0.3, len(farmers))
+            profiles = self._ids("farmer_profile", start, count)
+            yield pd.DataFrame({
+                "id": self._ids("yield_history", first_id, len(farmers)),
+                "farmer_id": [profiles[n - start] for n in farmers],
+                "year": self.as_of.year - 1 - offsets,
+                "crop_type_id": crops[crop],
+                "yield_amount_kg": np.round(yield_kg, 2),
+                "revenue_mwk": np.round(yield_kg * self.crop_prices[crop] * rng.lognormal(0, 0.1, len(farmers)), 2),
+            }, columns=COLUMNS["yield_history"])
+            first_id += len(farmers)
+
+    def _applications(self) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Applications in date order, with the loan officer and supervisor reviews they went through"""
+        districts = np.array(self.reference["districts"])
+        crops = np.array(self.reference["crops"])
+        supervisors = np.array(self._ids("supervisor", 0, len(districts)), dtype=object)
+        officers = np.array(self._ids("officer", 0, self.officers), dtype=object)
+        span = (self.as_of - self.start).total_seconds()
+        rng = self._rng("applications")
+        first_review = 0
+
+        for start, count in _chunks(self.applications):
+            ids = np.array(self._ids("application", start, count), dtype=object)
+            farmers = rng.integers(0, self.farmers, count)
+            district = self.farmer_districts[farmers]
+            offsets = (np.arange(start, start + count) + rng.random(count)) / self.applications * span
+            dates = np.datetime64(self.start) + (offsets * 1e6).astype("timedelta64[us]")
+            age_days = (np.datetime64(self.as_of) - dates) / np.timedelta64(1, "D")
+
+            recent = age_days < PENDING_DAYS
+            status = np.where(
+                recent,
+                rng.choice(RECENT_STATUSES[0], count, p=RECENT_STATUSES[1]),
+                rng.choice(DECIDED_STATUSES[0], count, p=DECIDED_STATUSES[1]),
+            )
+            crop = rng.choice(len(crops), count, p=self.crop_shares)
+            farm_size = np.round(self.farmer_farm_sizes[farmers] * rng.uniform(0.5, 1.0, count), 2).clip(0.1)
+            yield_kg = farm_size * self.crop_yields[crop] * rng.lognormal(0, 0.25, count)
+            revenue = yield_kg * self.crop_prices[crop] * rng.lognormal(0, 0.1, count)
+
+            scored = status != "DRAFT"
+            predicted = np.where(scored, np.round(revenue * 0.4 * rng.lognormal(0, 0.15, count), 2), np.nan)
+            decided = np.isin(status, ["APPROVED", "DISBURSED", "REJECTED"])
+            approved = np.isin(status, ["APPROVED", "DISBURSED"])
+            overridden = approved & (rng.random(count) < 0.1)
+            approved_amount = np.where(
+                approved, np.round(predicted * np.where(overridden, rng.uniform(0.6, 1.3, count), 1.0), 2), np.nan
+            )
+            review_delay = rng.integers(1, 8 * 86400, count).astype("timedelta64[s]")
+            decision_delay = review_delay + rng.integers(1, 21 * 86400, count).astype("timedelta64[s]")
+            approval_dates = np.minimum(dates + decision_delay, np.datetime64(self.as_of))
+
+            applications = pd.DataFrame({
+                "id": ids,
+                "farmer_id": _uuids(self.seed, "farmer", farmers.tolist()),
+                "application_date": dates,
+                "status": status,
+                "crop_type_id": crops[crop],
+                "farm_size_hectares": farm_size,
+                "expected_yield_kg": np.round(yield_kg, 2),
+                "expected_revenue_mwk": np.round(revenue, 2),
+                "district_id": districts[district],
+                "predicted_amount_mwk": predicted,
+                "prediction_confidence": np.where(scored, np.round(rng.uniform(0.6, 0.95, count), 2), np.nan),
+                "prediction_lower_mwk": np.round(predicted * 0.8, 2),
+                "prediction_upper_mwk": np.round(predicted * 1.2, 2),
+                "prediction_date": pd.Series(dates + np.timedelta64(2, "s")).where(scored),
+                "model_version": np.where(scored, SYNTHETIC_MODEL_VERSION, None),
+                "approved_amount_mwk": approved_amount,
+                "approval_date": pd.Series(approval_dates).where(decided),
+                "approved_by": np.where(decided, supervisors[district], None),
+                "override_reason": np.where(overridden, "Adjusted after field visit", None),
+            }, columns=COLUMNS["loan_applications"])
+
+            # A loan officer reviews everything past submission; the supervisor's decision is a review too
+            reviewed = np.isin(status, ["UNDER_REVIEW", "APPROVED", "DISBURSED", "REJECTED"])
+            officer = officers[district * self.officers_per_district + rng.integers(0, self.officers_per_district, count)]
+            officer_action = np.where(
+                status == "REJECTED", "REJECT",
+                np.where(status == "UNDER_REVIEW", rng.choice(["RECOMMEND_APPROVAL", "REQUEST_CHANGES"], count), "RECOMMEND_APPROVAL")
+            )
+            review_parts = [
+                (reviewed, officer, np.minimum(dates + review_delay, np.datetime64(self.as_of)), officer_action,
+                 "Field assessment completed"),
+                (decided, supervisors[district], approval_dates, np.where(approved, "RECOMMEND_APPROVAL", "REJECT"),
+                 "Decision recorded"),
+            ]
+            reviews = pd.concat([
+                pd.DataFrame({
+                    "application_id": ids[mask],
+                    "reviewer_id": reviewer[mask],
+                    "review_date": review_date[mask],
+                    "comments": comment,
+                    "action": action[mask],
+                })
+                for mask, reviewer, review_date, action, comment in review_parts
+            ], ignore_index=True)
+            reviews.insert(0, "id", self._ids("application_review", first_review, len(reviews)))
+            first_review += len(reviews)
+            yield "loan_applications", applications
+            yield "application_reviews", reviews
+
+
+def generate(conn: Connection, applications: int, seed: int = 42, years: int = 3, as_of: Optional[date] = None) -> Dict[str, Any]:
+    """Load a synthetic dataset in conn's transaction; roll it back to discard it"""
+    return SyntheticDataGenerator(applications, seed, years, as_of).load(conn)
+
+
+def purge(conn: Connection) -> int:
+    """Delete every generated account and everything that belongs to it; returns the users removed"""
+    for query in PURGE_QUERIES[:-1]:
+        conn.execute(query, {"pattern": f"%@{SYNTHETIC_EMAIL_DOMAIN}"})
+    return conn.execute(PURGE_QUERIES[-1]).rowcount
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "generate"
+    if command == "generate":
+        applications = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+        with engine.begin() as conn:
+            summary = generate(conn, applications, seed)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in COLUMNS:
+                conn.execute(text(f"ANALYZE {table}"))
+        print(json.dumps(summary, indent=2))
+    elif command == "purge":
+        with engine.begin() as conn:
+            print(json.dumps({"users_removed": purge(conn)}, indent=2))
+    else:
+        sys.exit(f"Unknown command {command}; use generate or purge")
@@ -1,39 +1,301 @@
+"""Train the loan amount model.
+
+Runs a cross-validated search over GradientBoostingRegressor and
+HistGradientBoostingRegressor configurations in parallel, measures inference
+latency for each candidate, and stores the most accurate candidate within the
+latency budget in the artifact store together with the evaluation report.
+The stored model also carries conformalized prediction intervals.
+
+    python -m app.model_development.train --data Data_cumo_trial1.xlsx --n-jobs -1
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold, ParameterGrid, train_test_split
 import joblib
+from joblib import Parallel, delayed
+from app.config.ml_deployment import ml_config as config
 from app.encoders.frequency_encoder import FrequencyEncoder
+from app.services.artifact_store import artifact_store
+from app.services.prediction_intervals import add_intervals, predict_with_interval
+from app.utils.drift_monitor import build_reference_profile, reference_profile_path, save_reference_profile
 
-# Load data
-data = pd.read_excel("Data_cumo_trial1.xlsx")
+MODEL_PATH = 'app/ml_model/loan_predictor1.pkl'
+DATA_PATH = 'Data_cumo_trial1.xlsx'
 
 # Columns
 num_features = ['loan_farm_size', 'past_yield_kgs', 'past_yield_mk', 'expected_yield_kgs', 'expected_yield_mk']
 cat_features = ['loan_crop']
+target = 'loan_amount'
+
+# Search space per model family
+SEARCH_SPACE = {
+    'gbr': (GradientBoostingRegressor, {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [3, 5],
+        'learning_rate': [0.05, 0.1],
+    }),
+    'hist_gbr': (HistGradientBoostingRegressor, {
+        'max_iter': [100, 300],
+        'max_leaf_nodes': [15, 31],
+        'learning_rate': [0.05, 0.1],
+    }),
+}
+
+
+def load_data(path):
+    """Training data from Excel, CSV or Parquet"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in ('.xlsx', '.xls'):
+        return pd.read_excel(path)
+    if suffix == '.parquet' or os.path.isdir(path):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def build_pipeline(estimator):
+    preprocessor = ColumnTransformer(transformers=[
+        ('num', StandardScaler(), num_features),
+        ('freq', FrequencyEncoder('loan_crop'), ['loan_crop'])
+    ])
+    return Pipeline(steps=[
+        ('preprocessing', preprocessor),
+        ('model', estimator)
+    ])
+
+
+def candidate_configs():
+    candidates = []
+    for family, (estimator_class, grid) in SEARCH_SPACE.items():
+        for params in ParameterGrid(grid):
+            name = family + '(' + ', '.join(f'{k}={v}' for k, v in sorted(params.items())) + ')'
+            candidates.append({'name': name, 'family': family, 'params': params})
+    return candidates
+
+
+def make_estimator(candidate, random_state):
+    estimator_class = SEARCH_SPACE[candidate['family']][0]
+    return estimator_class(random_state=random_state, **candidate['params'])
+
+
+def _fit_fold(candidate, X, y, train_index, val_index, random_state):
+    pipeline = build_pipeline(make_estimator(candidate, random_state))
+    pipeline.fit(X.iloc[train_index], y.iloc[train_index])
+    predictions = served_predictions(pipeline, X.iloc[val_index])
+    return mean_absolute_error(y.iloc[val_index], predictions), r2_score(y.iloc[val_index], predictions)
+
+
+def _fit_full(candidate, X, y, random_state):
+    pipeline = build_pipeline(make_estimator(candidate, random_state))
+    pipeline.fit(X, y)
+    return pipeline
+
+
+def served_predictions(model, X):
+    """Predictions as the API serves them, clipped at zero"""
+    return np.maximum(model.predict(X), 0)
+
+
+def training_cutoff(data, X_train):
+    """Latest approval among the training rows, or None if the data has no approval dates"""
+    if 'approval_date' not in data.columns:
+        return None
+    cutoff = data.loc[X_train.index, 'approval_date'].max()
+    return None if pd.isna(cutoff) else pd.Timestamp(cutoff).isoformat()
+
+
+def measure_latency(pipeline, X, repeats=200, predict=None):
+    """Single-row latency percentiles in ms, cycling through rows of X"""
+    predict = predict or pipeline.predict
+    predict(X.iloc[[0]])
+    latencies = []
+    for i in range(repeats):
+        row = X.iloc[[i % len(X)]]
+        start_time = time.perf_counter()
+        predict(row)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def pareto_frontier(results):
+    """Names of candidates no other candidate beats on both CV MAE and p95 latency"""
+    frontier = set()
+    for result in results:
+        dominated = any(
+            other['cv_mae'] <= result['cv_mae']
+            and other['p95_latency_ms'] <= result['p95_latency_ms']
+            and (other['cv_mae'] < result['cv_mae'] or other['p95_latency_ms'] < result['p95_latency_ms'])
+            for other in results
+        )
+        if not dominated:
+            frontier.add(result['name'])
+    return frontier
+
+
+def search(X_train, y_train, X_test, y_test, cv_folds=5, n_jobs=-1, random_state=42, candidates=None):
+    """Cross-validate every candidate in parallel, then time each refitted candidate"""
+    candidates = candidates or candidate_configs()
+    folds = list(KFold(n_splits=cv_folds, shuffle=True, random_state=random_state).split(X_train))
+
+    # One job per (candidate, fold) so all cores stay busy
+    fold_scores = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(candidate, X_train, y_train, train_index, val_index, random_state)
+        for candidate in candidates
+        for train_index, val_index in folds
+    )
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_full)(candidate, X_train, y_train, random_state) for candidate in candidates
+    )
+
+    results = []
+    for i, (candidate, pipeline) in enumerate(zip(candidates, fitted)):
+        scores = np.asarray(fold_scores[i * cv_folds:(i + 1) * cv_folds])
+        test_predictions = served_predictions(pipeline, X_test)
+        # Latency is measured sequentially so candidates do not compete for cores
+        p50_latency_ms, p95_latency_ms = measure_latency(pipeline, X_test)
+        results.append({
+            **candidate,
+            'cv_mae': float(scores[:, 0].mean()),
+            'cv_mae_std': float(scores[:, 0].std()),
+            'cv_r2': float(scores[:, 1].mean()),
+            'test_mae': float(mean_absolute_error(y_test, test_predictions)),
+            'test_r2': float(r2_score(y_test, test_predictions)),
+            'p50_latency_ms': p50_latency_ms,
+            'p95_latency_ms': p95_latency_ms,
+        })
+
+    frontier = pareto_frontier(results)
+    for result in results:
+        result['on_frontier'] = result['name'] in frontier
+    return results, fitted
+
+
+def choose(results, latency_budget_ms):
+    """Lowest CV MAE among candidates within the latency budget"""
+    within_budget = [r for r in results if r['p95_latency_ms'] <= latency_budget_ms]
+    if not within_budget:
+        raise SystemExit(f"No candidate meets the {latency_budget_ms}ms p95 latency budget")
+    return min(within_budget, key=lambda r: r['cv_mae'])
+
+
+def fit_intervals(pipeline, X_train, y_train, X_test, y_test, coverage=None):
+    """Add prediction intervals to the chosen pipeline and measure their coverage and cost"""
+    pipeline = add_intervals(pipeline, X_train, y_train, coverage)
+    _, lower, upper = predict_with_interval(pipeline, X_test)
+    p50_latency_ms, p95_latency_ms = measure_latency(
+        pipeline, X_test, predict=lambda X: predict_with_interval(pipeline, X)
+    )
+    evaluation = {
+        'coverage_target': pipeline[-1].coverage,
+        'test_coverage': float(np.mean((y_test >= lower) & (y_test <= upper))),
+        'test_median_width': float(np.median(upper - lower)),
+        'p50_latency_ms': p50_latency_ms,
+        'p95_latency_ms': p95_latency_ms,
+    }
+    return pipeline, evaluation
+
+
+def print_intervals(evaluation, chosen):
+    print(
+        f"Intervals: {evaluation['test_coverage']:.1%} test coverage "
+        f"(target {evaluation['coverage_target']:.0%}), median width {evaluation['test_median_width']:,.0f} MWK, "
+        f"p95 {chosen['p95_latency_ms']:.2f}ms -> {evaluation['p95_latency_ms']:.2f}ms with intervals"
+    )
+
+
+def print_report(results, chosen):
+    print(f"{'candidate':<70} {'cv_mae':>12} {'cv_r2':>7} {'test_mae':>12} {'p95_ms':>8}  frontier")
+    for r in sorted(results, key=lambda r: r['cv_mae']):
+        marker = ' *' if r is chosen else ''
+        print(
+            f"{r['name']:<70} {r['cv_mae']:>12,.0f} {r['cv_r2']:>7.3f} "
+            f"{r['test_mae']:>12,.0f} {r['p95_latency_ms']:>8.2f}  {'yes' if r['on_frontier'] else ''}{marker}"
+        )
+
+
+def save_and_register(pipeline, output, data, X_train, test_samples, chosen, report):
+    """Save the pipeline and its drift reference, then register both in the artifact store"""
+    # Save the full pipeline
+    joblib.dump(pipeline, output)
+    print(f"✅ Pipeline saved as '{output}'")
+
+    # Save the training distribution used as the drift reference
+    profile = build_reference_profile(X_train, pipeline.predict(X_train), num_features, cat_features)
+    save_reference_profile(profile, reference_profile_path(output))
+    print(f"✅ Drift reference profile saved as '{reference_profile_path(output)}'")
+
+    # Register the artifact in the content-addressed store; deploy it by hash
+    artifact = artifact_store.put_file(output, {
+        "training_data_hash": hashlib.sha256(pd.util.hash_pandas_object(data, index=False).values.tobytes()).hexdigest(),
+        "features": num_features + cat_features,
+        # Rows approved after this were not trained on; retraining holds them out
+        "training_cutoff": training_cutoff(data, X_train),
+        "metrics": {
+            "r2": chosen['test_r2'],
+            "mae": chosen['test_mae'],
+            "cv_mae": chosen['cv_mae'],
+            "p95_latency_ms": chosen['p95_latency_ms'],
+            "interval_coverage": report.get('intervals', {}).get('test_coverage'),
+            "interval_p95_latency_ms": report.get('intervals', {}).get('p95_latency_ms'),
+            "train_samples": int(len(X_train)),
+            "test_samples": int(test_samples)
+        },
+        "evaluation": report
+    })
+    print(f"✅ Stored as model version {artifact['model_version']} ({artifact['hash']})")
+    return artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search, evaluate and store the loan amount model")
+    parser.add_argument('--data', default=DATA_PATH, help="Excel, CSV or Parquet training data (a file or dataset directory)")
+    parser.add_argument('--output', default=MODEL_PATH)
+    parser.add_argument('--cv-folds', type=int, default=5)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Parallel jobs (-1 uses all cores)")
+    parser.add_argument('--latency-budget-ms', type=float, default=config.MODEL_LATENCY_BUDGET_MS)
+    parser.add_argument('--coverage', type=float, default=config.PREDICTION_INTERVAL_COVERAGE,
+                        help="Target coverage of the prediction intervals")
+    parser.add_argument('--report', help="Also write the evaluation report to this JSON file")
+    args = parser.parse_args()
+
+    # Load data
+    data = load_data(args.data)
+    X = data[num_features + cat_features]
+    y = data[target]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    start_time = time.perf_counter()
+    results, fitted = search(X_train, y_train, X_test, y_test, args.cv_folds, args.n_jobs)
+    chosen = choose(results, args.latency_budget_ms)
+    pipeline = fitted[results.index(chosen)]
+    print_report(results, chosen)
+    print(f"Searched {len(results)} candidates in {time.perf_counter() - start_time:.1f}s")
+
+    pipeline, intervals = fit_intervals(pipeline, X_train, y_train, X_test, y_test, args.coverage)
+    print_intervals(intervals, chosen)
+
+    report = {
+        'chosen': chosen['name'],
+        'latency_budget_ms': args.latency_budget_ms,
+        'cv_folds': args.cv_folds,
+        'candidates': results,
+        'intervals': intervals,
+    }
+    artifact = save_and_register(pipeline, args.output, data, X_train, len(X_test), chosen, report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({**report, 'artifact_hash': artifact['hash']}, f, indent=2)
+
 
-# Preprocessors
-preprocessor = ColumnTransformer(transformers=[
-    ('num', StandardScaler(), num_features),
-    ('freq', FrequencyEncoder('loan_crop'), ['loan_crop'])
-])
-
-# Pipeline
-pipeline = Pipeline(steps=[
-    ('preprocessing', preprocessor),
-    ('model', GradientBoostingRegressor(n_estimators=200, learning_rate=0.1, max_depth=5, random_state=42))
-])
-
-# Prepare data
-X = data.drop(['loan_amount'], axis=1)
-y = data['loan_amount']
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Fit pipeline
-pipeline.fit(X_train, y_train)
-
-# Save the full pipeline
-joblib.dump(pipeline, 'app/ml_model/loan_predictor1.pkl')
-print("✅ Pipeline saved as 'app/ml_model/loan_predictor1.pkl'")
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from enum import Enum
 import uuid
 from sqlalchemy import (
     UUID, Column, ForeignKey, Integer, String, Boolean, 
-    DateTime, Enum as SQLEnum, Text, Numeric, func
+    DDL, Date, DateTime, Enum as SQLEnum, Float, Text, Numeric, UniqueConstraint, event, func
 )
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.declarative import declarative_base
@@ -152,11 +152,14 @@ class YieldHistory(Base):
     crop_type_rel = relationship("CropType", back_populates="yield_history")
 
 class LoanApplication(Base):
+    """Partitioned by month of application_date; see app/model_development/partitioning.py"""
     __tablename__ = "loan_applications"
+    __table_args__ = {"postgresql_partition_by": "RANGE (application_date)"}
     
     id = Column(UUID, primary_key=True, default=uuid.uuid4, index=True)
     farmer_id = Column(UUID, ForeignKey("users.id"))
-    application_date = Column(DateTime, default=func.now())
+    # Part of the table's primary key, as Postgres requires of the partition key
+    application_date = Column(DateTime, primary_key=True, default=func.now(), index=True)
     status = Column(SQLEnum(ApplicationStatus), default=ApplicationStatus.DRAFT)
     crop_type_id = Column(UUID, ForeignKey("crop_types.id"))
     farm_size_hectares = Column(Numeric(10, 2))
@@ -167,11 +170,14 @@ class LoanApplication(Base):
     # Model prediction
     predicted_amount_mwk = Column(Numeric(12, 2))
     prediction_confidence = Column(Numeric(5, 2))
+    prediction_lower_mwk = Column(Numeric(12, 2))
+    prediction_upper_mwk = Column(Numeric(12, 2))
     prediction_date = Column(DateTime)
+    model_version = Column(String(64))
     
     # Final decision
     approved_amount_mwk = Column(Numeric(12, 2))
-    approval_date = Column(DateTime)
+    approval_date = Column(DateTime, index=True)
     approved_by = Column(UUID, ForeignKey("users.id"))
     override_reason = Column(Text)
     
@@ -179,22 +185,111 @@ class LoanApplication(Base):
     farmer = relationship("User", foreign_keys=[farmer_id], back_populates="loan_applications")
     crop_type_rel = relationship("CropType", back_populates="applications")
     district_rel = relationship("District", back_populates="applications")
-    reviews = relationship("ApplicationReview", back_populates="application")
+    reviews = relationship(
+        "ApplicationReview",
+        primaryjoin="LoanApplication.id == foreign(ApplicationReview.application_id)",
+        back_populates="application"
+    )
     approver = relationship("User", foreign_keys=[approved_by])
+    
+    # Rows are identified by id alone
+    __mapper_args__ = {"primary_key": [id]}
 
 class ApplicationReview(Base):
+    """Partitioned by month of review_date"""
     __tablename__ = "application_reviews"
+    __table_args__ = {"postgresql_partition_by": "RANGE (review_date)"}
     
     id = Column(UUID, primary_key=True, default=uuid.uuid4, index=True)
-    application_id = Column(UUID, ForeignKey("loan_applications.id"))
+    # No foreign key: a partitioned loan_applications has no unique constraint on id alone
+    application_id = Column(UUID, index=True)
     reviewer_id = Column(UUID, ForeignKey("users.id"))
-    review_date = Column(DateTime, default=func.now())
+    review_date = Column(DateTime, primary_key=True, default=func.now())
     comments = Column(Text)
     action = Column(SQLEnum(ReviewAction))
     
     # Relationships
-    application = relationship("LoanApplication", back_populates="reviews")
+    application = relationship(
+        "LoanApplication",
+        primaryjoin="foreign(ApplicationReview.application_id) == LoanApplication.id",
+        back_populates="reviews"
+    )
     reviewer = relationship("User", back_populates="reviews")
+    
+    __mapper_args__ = {"primary_key": [id]}
+
+# Catch-all partitions, so rows can be written before their month's partition exists
+for _table in (LoanApplication.__table__, ApplicationReview.__table__):
+    event.listen(_table, "after_create", DDL(f"CREATE TABLE IF NOT EXISTS {_table.name}_default PARTITION OF {_table.name} DEFAULT"))
+
+## Model Evaluation Tables
+class ModelAccuracyStat(Base):
+    """Running error sums of predicted vs approved amounts, one row per version/crop/district/month"""
+    __tablename__ = "model_accuracy_stats"
+    __table_args__ = (
+        UniqueConstraint("model_version", "crop_type_id", "district_id", "period_start"),
+    )
+    
+    id = Column(UUID, primary_key=True, default=uuid.uuid4, index=True)
+    model_version = Column(String(64), nullable=False)
+    crop_type_id = Column(UUID, ForeignKey("crop_types.id"), nullable=False)
+    district_id = Column(UUID, ForeignKey("districts.id"), nullable=False)
+    period_start = Column(Date, nullable=False)
+    
+    # Sufficient statistics for MAE, MAPE, R² and override rate
+    sample_count = Column(Integer, nullable=False, default=0)
+    override_count = Column(Integer, nullable=False, default=0)
+    sum_abs_error = Column(Float, nullable=False, default=0.0)
+    sum_abs_pct_error = Column(Float, nullable=False, default=0.0)
+    sum_sq_error = Column(Float, nullable=False, default=0.0)
+    sum_actual = Column(Float, nullable=False, default=0.0)
+    sum_actual_sq = Column(Float, nullable=False, default=0.0)
+    last_updated = Column(DateTime, default=func.now())
+
+class ArchivedApplicationStat(Base):
+    """Counts and amounts of archived applications, one row per application month/district/crop/status"""
+    __tablename__ = "archived_application_stats"
+    __table_args__ = (
+        UniqueConstraint("period_start", "district_id", "crop_type_id", "status", postgresql_nulls_not_distinct=True),
+    )
+    
+    id = Column(UUID, primary_key=True, default=uuid.uuid4, index=True)
+    period_start = Column(Date, nullable=False)
+    district_id = Column(UUID, ForeignKey("districts.id"))
+    crop_type_id = Column(UUID, ForeignKey("crop_types.id"))
+    status = Column(String(20), nullable=False)
+    application_count = Column(Integer, nullable=False, default=0)
+    review_count = Column(Integer, nullable=False, default=0)
+    predicted_count = Column(Integer, nullable=False, default=0)
+    sum_predicted_mwk = Column(Float, nullable=False, default=0.0)
+    approved_count = Column(Integer, nullable=False, default=0)
+    sum_approved_mwk = Column(Float, nullable=False, default=0.0)
+    last_updated = Column(DateTime, default=func.now())
+
+class ShadowPrediction(Base):
+    """Candidate model score recorded alongside the live prediction for the same input"""
+    __tablename__ = "shadow_predictions"
+    
+    id = Column(UUID, primary_key=True, default=uuid.uuid4, index=True)
+    application_id = Column(UUID, index=True)
+    live_version = Column(String(64))
+    candidate_version = Column(String(64), nullable=False, index=True)
+    live_amount_mwk = Column(Numeric(12, 2))
+    shadow_amount_mwk = Column(Numeric(12, 2))
+    live_latency_ms = Column(Float)
+    shadow_latency_ms = Column(Float)
+    created_at = Column(DateTime, default=func.now())
+
+class PredictionJob(Base):
+    """Queued request to (re)score an application; claimed by backfill workers with SKIP LOCKED"""
+    __tablename__ = "prediction_jobs"
+    
+    application_id = Column(UUID, primary_key=True)
+    application_date = Column(DateTime)  # partition key of the application, to bound lookups
+    reason = Column(String(20), nullable=False)  # missing or stale
+    enqueued_at = Column(DateTime, nullable=False, default=func.now(), index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
 
 ## System Management Tables
 class SystemSetting(Base):
@@ -5,6 +5,7 @@ from enum import Enum
 
 class ModelPerformanceResponse(BaseModel):
     accuracy: float
+    accuracy_metrics: Dict[str, Any]
     recent_predictions: List[Dict[str, Any]]
     drift_metrics: Dict[str, Any]
 
@@ -47,6 +48,21 @@ class UserDetailResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
+class UserImportError(BaseModel):
+    row: int
+    field: Optional[str] = None
+    message: str
+
+class UserImportResponse(BaseModel):
+    total_rows: int
+    imported: int
+    farmer_profiles: int
+    rejected: int
+    dry_run: bool
+    valid_rows: Optional[int] = None
+    errors: List[UserImportError]
+    timings: Dict[str, float]
+
 class UserUpdate(BaseModel):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
@@ -18,6 +18,8 @@ class LoanApplicationResponse(BaseModel):
     application_id: UUID
     predicted_amount_mwk: Optional[float]
     prediction_confidence: Optional[float]
+    prediction_lower_mwk: Optional[float] = None
+    prediction_upper_mwk: Optional[float] = None
     status: str
     application_date: datetime
     
@@ -47,6 +49,8 @@ class LoanApplicationDetail(BaseModel):
     district_name: str
     predicted_amount_mwk: Optional[float]
     prediction_confidence: Optional[float]
+    prediction_lower_mwk: Optional[float] = None
+    prediction_upper_mwk: Optional[float] = None
     prediction_date: Optional[datetime]
     approved_amount_mwk: Optional[float]
     approval_date: Optional[datetime]
@@ -1,6 +1,6 @@
 # Pydantic models for response
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -40,9 +40,28 @@ class YieldHistoryItem(BaseModel):
 class PredictionDetails(BaseModel):
     predicted_amount_mwk: Optional[float]
     prediction_confidence: Optional[float]
+    prediction_lower_mwk: Optional[float] = None
+    prediction_upper_mwk: Optional[float] = None
     prediction_date: Optional[datetime]
     model_version: Optional[str] = "v1.0" 
 
+class FeatureContribution(BaseModel):
+    feature: str
+    value: Union[float, str]
+    contribution_mwk: float
+
+class PredictionExplanation(BaseModel):
+    model_version: Optional[str]
+    matches_prediction_model: bool
+    base_value_mwk: float
+    predicted_amount_mwk: float
+    contributions: List[FeatureContribution]
+
+class ApplicationExplanationItem(BaseModel):
+    application_id: UUID
+    predicted_amount_mwk: Optional[float]
+    explanation: Optional[PredictionExplanation]
+
 class ApplicationReviewHistory(BaseModel):
     reviewer_name: str
     review_date: datetime
@@ -64,6 +83,7 @@ class ApplicationFullDetails(BaseModel):
     
     # Prediction details
     prediction_details: PredictionDetails
+    prediction_explanation: Optional[PredictionExplanation] = None
     
     # Farmer profile
     farmer_profile: FarmerProfileDetail
@@ -1,3 +1,5 @@
+from typing import Any, List, Literal, Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -8,4 +10,36 @@ class LoanPredictionInput(BaseModel):
     past_yield_kgs: float = Field(..., description="Historical yield in kg")
     past_yield_mk: float = Field(..., description="Historical revenue in MWK")
     expected_yield_kgs: float = Field(..., gt=0, description="Expected yield in kg")
-    expected_yield_mk: float = Field(..., gt=0, description="Expected revenue in MWK")
\ No newline at end of file
+    expected_yield_mk: float = Field(..., gt=0, description="Expected revenue in MWK")
+
+WHAT_IF_FEATURES = Literal['loan_farm_size', 'past_yield_kgs', 'past_yield_mk', 'expected_yield_kgs', 'expected_yield_mk']
+
+
+class WhatIfRange(BaseModel):
+    """Evenly spaced values of one numeric feature, endpoints included"""
+    feature: WHAT_IF_FEATURES
+    start: float = Field(..., ge=0)
+    stop: float = Field(..., ge=0)
+    steps: int = Field(..., ge=2, le=1000)
+
+
+class WhatIfRequest(BaseModel):
+    base: LoanPredictionInput
+    ranges: List[WhatIfRange] = Field(..., min_length=1, max_length=2)
+
+
+class WhatIfAxis(BaseModel):
+    feature: str
+    values: List[float]
+
+
+class WhatIfResponse(BaseModel):
+    """Predicted amounts over the grid, indexed [first axis][second axis]"""
+    model_version: Optional[str]
+    axes: List[WhatIfAxis]
+    predicted_amount_mwk: List[Any]
+    prediction_lower_mwk: Optional[List[Any]] = None
+    prediction_upper_mwk: Optional[List[Any]] = None
+    grid_points: int
+    cached: bool
+    latency_ms: float
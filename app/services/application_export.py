@@ -0,0 +1,247 @@
+"""Streaming export of loan applications as CSV, XLSX or Parquet.
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE
+and each batch is encoded and handed to the response before the next one is
+fetched, so memory stays flat however many applications are exported. CSV
+and Parquet (one row group per batch) are sent as they are written. XLSX
+rows go through openpyxl's write-only mode, which spools sheet XML to a
+temporary file; the finished workbook is streamed from there.
+
+Benchmark against the configured database (seeded rows are rolled back):
+
+    python -m app.services.application_export benchmark [rows] [formats]
+"""
+import csv
+import io
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from sqlalchemy import Float, String, cast, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Select
+
+from app.config.database import engine
+from app.config.settings import settings
+from app.models.db_models import CropType, District, LoanApplication, User
+from app.utils.loan_officer_utils import filter_applications
+
+# (name, column, Parquet type)
+EXPORT_COLUMNS = [
+    ("application_id", cast(LoanApplication.id, String), pa.string()),
+    ("application_date", LoanApplication.application_date, pa.timestamp("us")),
+    ("status", func.lower(cast(LoanApplication.status, String)), pa.string()),
+    ("farmer_id", cast(LoanApplication.farmer_id, String), pa.string()),
+    ("farmer_name", func.concat_ws(" ", User.first_name, User.last_name), pa.string()),
+    ("district_name", District.name, pa.string()),
+    ("crop_type", CropType.name, pa.string()),
+    ("farm_size_hectares", cast(LoanApplication.farm_size_hectares, Float), pa.float64()),
+    ("expected_yield_kg", cast(LoanApplication.expected_yield_kg, Float), pa.float64()),
+    ("expected_revenue_mwk", cast(LoanApplication.expected_revenue_mwk, Float), pa.float64()),
+    ("predicted_amount_mwk", cast(LoanApplication.predicted_amount_mwk, Float), pa.float64()),
+    ("prediction_lower_mwk", cast(LoanApplication.prediction_lower_mwk, Float), pa.float64()),
+    ("prediction_upper_mwk", cast(LoanApplication.prediction_upper_mwk, Float), pa.float64()),
+    ("prediction_confidence", cast(LoanApplication.prediction_confidence, Float), pa.float64()),
+    ("model_version", LoanApplication.model_version, pa.string()),
+    ("approved_amount_mwk", cast(LoanApplication.approved_amount_mwk, Float), pa.float64()),
+    ("approval_date", LoanApplication.approval_date, pa.timestamp("us")),
+]
+
+COLUMN_NAMES = [name for name, _, _ in EXPORT_COLUMNS]
+PARQUET_SCHEMA = pa.schema([(name, arrow_type) for name, _, arrow_type in EXPORT_COLUMNS])
+
+# Data rows per sheet; the header takes the last of Excel's 1,048,576 rows
+XLSX_MAX_ROWS = 1048575
+XLSX_READ_SIZE = 1 << 20
+
+
+def export_select(accessible_districts: List[str], district_id: Optional[str] = None, status: Optional[str] = None) -> Select:
+    """Applications to export, filtered the same way as the application listing"""
+    query = (
+        select(*[column.label(name) for name, column, _ in EXPORT_COLUMNS])
+        .select_from(LoanApplication)
+        .outerjoin(User, User.id == LoanApplication.farmer_id)
+        .outerjoin(District, District.id == LoanApplication.district_id)
+        .outerjoin(CropType, CropType.id == LoanApplication.crop_type_id)
+    )
+    query = filter_applications(query, accessible_districts, district_id, status)
+    return query.order_by(LoanApplication.application_date.desc(), LoanApplication.id)
+
+
+def _csv_chunks(batches: Iterable[Sequence]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMN_NAMES)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _xlsx_chunks(batches: Iterable[Sequence]) -> Iterator[bytes]:
+    workbook = Workbook(write_only=True)
+    sheet, sheet_rows = None, XLSX_MAX_ROWS
+    for batch in batches:
+        for row in batch:
+            if sheet_rows == XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Applications {len(workbook.worksheets) + 1}")
+                sheet.append(COLUMN_NAMES)
+                sheet_rows = 0
+            sheet.append(list(row))
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("Applications 1").append(COLUMN_NAMES)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(XLSX_READ_SIZE):
+            yield chunk
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until it is drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_chunks(batches: Iterable[Sequence]) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, PARQUET_SCHEMA)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, PARQUET_SCHEMA)],
+                schema=PARQUET_SCHEMA
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORT_FORMATS: Dict[str, Dict[str, Any]] = {
+    "csv": {"media_type": "text/csv", "writer": _csv_chunks},
+    "xlsx": {
+        "media_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "writer": _xlsx_chunks
+    },
+    "parquet": {"media_type": "application/vnd.apache.parquet", "writer": _parquet_chunks},
+}
+
+
+def export_chunks(conn: Connection, query: Select, file_format: str, batch_size: int = None) -> Iterator[bytes]:
+    """The encoded file, batch by batch, read on conn through a server-side cursor"""
+    writer: Callable[[Iterable[Sequence]], Iterator[bytes]] = EXPORT_FORMATS[file_format]["writer"]
+    result = conn.execution_options(yield_per=batch_size or settings.EXPORT_BATCH_SIZE).execute(query)
+    for chunk in writer(result.partitions()):
+        if chunk:
+            yield chunk
+
+
+def stream_export(query: Select, file_format: str, bind: Engine = engine) -> Iterator[bytes]:
+    """export_chunks on a connection of its own, held for as long as the response streams"""
+    with bind.connect() as conn:
+        yield from export_chunks(conn, query, file_format)
+
+
+SEED_QUERY = text("""
+    INSERT INTO loan_applications (
+        id, farmer_id, application_date, status, crop_type_id, farm_size_hectares, expected_yield_kg,
+        expected_revenue_mwk, district_id, predicted_amount_mwk, prediction_confidence, model_version
+    )
+    SELECT
+        gen_random_uuid(),
+        (CAST(:farmer_ids AS uuid[]))[1 + i % cardinality(CAST(:farmer_ids AS uuid[]))],
+        now() - (i % 1000) * interval '1 hour',
+        (ARRAY['SUBMITTED', 'UNDER_REVIEW', 'APPROVED', 'REJECTED'])[1 + i % 4]::applicationstatus,
+        (CAST(:crop_ids AS uuid[]))[1 + i % cardinality(CAST(:crop_ids AS uuid[]))],
+        round((0.5 + random() * 5)::numeric, 2),
+        round((500 + random() * 5000)::numeric, 2),
+        round((100000 + random() * 900000)::numeric, 2),
+        (CAST(:district_ids AS uuid[]))[1 + i % cardinality(CAST(:district_ids AS uuid[]))],
+        round((50000 + random() * 500000)::numeric, 2),
+        0.8,
+        'benchmark'
+    FROM generate_series(1, :rows) AS i
+""")
+
+
+def benchmark(rows: int = 1000000, formats: Sequence[str] = ("csv", "parquet", "xlsx"), bind: Engine = engine) -> Dict[str, Any]:
+    """Seed `rows` applications in a transaction, export them in each format, then roll back.
+
+    Reports throughput, output size and the peak RSS growth while exporting,
+    sampled after every chunk.
+    """
+    import psutil
+
+    process = psutil.Process()
+    results: Dict[str, Any] = {"rows": rows, "batch_size": settings.EXPORT_BATCH_SIZE}
+    with bind.connect() as conn:
+        transaction = conn.begin()
+        try:
+            ids = {
+                key: [str(i) for i in conn.execute(text(f"SELECT id FROM {table}")).scalars()]
+                for key, table in (("district_ids", "districts"), ("crop_ids", "crop_types"))
+            }
+            ids["farmer_ids"] = [str(i) for i in conn.execute(text("SELECT id FROM users WHERE role = 'FARMER'")).scalars()]
+            started = time.perf_counter()
+            conn.execute(SEED_QUERY.bindparams(**ids, rows=rows))
+            results["seed_seconds"] = round(time.perf_counter() - started, 2)
+            query = export_select(ids["district_ids"]).where(LoanApplication.model_version == "benchmark")
+
+            for file_format in formats:
+                baseline = peak = process.memory_info().rss
+                size = 0
+                started = time.perf_counter()
+                for chunk in export_chunks(conn, query, file_format):
+                    size += len(chunk)
+                    peak = max(peak, process.memory_info().rss)
+                elapsed = time.perf_counter() - started
+                results[file_format] = {
+                    "seconds": round(elapsed, 2),
+                    "rows_per_second": round(rows / elapsed),
+                    "size_mb": round(size / 2 ** 20, 1),
+                    "peak_rss_growth_mb": round((peak - baseline) / 2 ** 20, 1)
+                }
+        finally:
+            transaction.rollback()
+    results["finished_at"] = datetime.now().isoformat()
+    return results
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "benchmark"
+    if command != "benchmark":
+        sys.exit(f"Unknown command {command}; use benchmark")
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    formats = sys.argv[3].split(",") if len(sys.argv) > 3 else ("csv", "parquet", "xlsx")
+    print(json.dumps(benchmark(rows, formats), indent=2))
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import joblib
+import sklearn
+
+from app.config.ml_deployment import ml_config as config
+from app.services.compact_model import CompactModel, is_compact_model
+from app.utils.drift_monitor import reference_profile_path
+
+logger = logging.getLogger(__name__)
+
+# Length of the hash prefix used as the human-facing model version
+SHORT_HASH_LENGTH = 12
+MIN_REF_LENGTH = 6
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def short_hash(artifact_hash: str) -> str:
+    return artifact_hash[:SHORT_HASH_LENGTH]
+
+
+def _write_json_atomic(path: str, payload: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class ArtifactStore:
+    """Local content-addressed store for model artifacts.
+
+    Layout under the store root:
+        objects/<sha256>.joblib           the artifact bytes
+        objects/<sha256>.json             metadata (training data hash, features, metrics, ...)
+        objects/<sha256>.reference.json   drift reference profile, when one was provided
+        refs.json                         the serving version and deployment history
+    """
+
+    def __init__(self, root: str = config.MODEL_STORE_PATH):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.refs_path = os.path.join(root, "refs.json")
+        self.load_stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_dirs(self):
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def artifact_path(self, artifact_hash: str) -> str:
+        return os.path.join(self.objects_dir, f"{artifact_hash}.joblib")
+
+    def _metadata_path(self, artifact_hash: str) -> str:
+        return os.path.join(self.objects_dir, f"{artifact_hash}.json")
+
+    def _hashes(self) -> List[str]:
+        if not os.path.isdir(self.objects_dir):
+            return []
+        return [
+            name[:-len(".joblib")]
+            for name in os.listdir(self.objects_dir)
+            if name.endswith(".joblib")
+        ]
+
+    def resolve(self, ref: str) -> str:
+        """Full hash for a hash or unique hash prefix"""
+        ref = (ref or "").strip().lower()
+        if len(ref) < MIN_REF_LENGTH:
+            raise ValueError(f"Artifact reference must be at least {MIN_REF_LENGTH} characters")
+        matches = [h for h in self._hashes() if h.startswith(ref)]
+        if not matches:
+            raise FileNotFoundError(f"No model artifact matches {ref}")
+        if len(matches) > 1:
+            raise ValueError(f"Artifact reference {ref} is ambiguous")
+        return matches[0]
+
+    def put_file(self, path: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Import an artifact file. Importing the same bytes twice is a no-op."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file not found: {path}")
+        self._ensure_dirs()
+
+        artifact_hash = file_sha256(path)
+        target = self.artifact_path(artifact_hash)
+        if not os.path.exists(target):
+            fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+
+        source_reference = reference_profile_path(path)
+        if os.path.exists(source_reference) and not os.path.exists(reference_profile_path(target)):
+            shutil.copyfile(source_reference, reference_profile_path(target))
+
+        existing = self._read_metadata(artifact_hash) or {}
+        stored = {
+            "hash": artifact_hash,
+            "model_version": short_hash(artifact_hash),
+            "created_at": datetime.now().isoformat(),
+            "source_path": path,
+            "size_bytes": os.path.getsize(target),
+            "sklearn_version": sklearn.__version__,
+            "training_data_hash": None,
+            "features": None,
+            "metrics": {},
+            "pinned": False,
+            **existing,
+            **(metadata or {})
+        }
+        _write_json_atomic(self._metadata_path(artifact_hash), stored)
+        logger.info(f"Stored model artifact {short_hash(artifact_hash)} from {path}")
+        return stored
+
+    def put_model(self, model: Any, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Serialise a fitted model into the store.
+
+        Artifacts are written uncompressed so their arrays can be memory-mapped on load.
+        """
+        self._ensure_dirs()
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(model, tmp_path)
+            return self.put_file(tmp_path, {"source_path": None, **(metadata or {})})
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _read_metadata(self, artifact_hash: str) -> Optional[Dict[str, Any]]:
+        path = self._metadata_path(artifact_hash)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def get_metadata(self, ref: str) -> Dict[str, Any]:
+        artifact_hash = self.resolve(ref)
+        return self._read_metadata(artifact_hash) or {"hash": artifact_hash}
+
+    def verify(self, ref: str) -> bool:
+        """Check the artifact bytes still hash to their address"""
+        artifact_hash = self.resolve(ref)
+        return file_sha256(self.artifact_path(artifact_hash)) == artifact_hash
+
+    def load(self, ref: str, verify: bool = True) -> Tuple[Any, Dict[str, Any]]:
+        """Load an artifact, memory-mapping its arrays.
+
+        Compact tree files are mapped zero-copy; for pickles joblib maps the
+        numpy arrays where it can.
+        """
+        artifact_hash = self.resolve(ref)
+        path = self.artifact_path(artifact_hash)
+
+        start_time = time.perf_counter()
+        if verify and file_sha256(path) != artifact_hash:
+            raise ValueError(f"Model artifact {short_hash(artifact_hash)} failed its integrity check")
+        verify_ms = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        if is_compact_model(path):
+            model = CompactModel(path)
+        else:
+            # joblib falls back to a normal load for compressed artifacts
+            model = joblib.load(path, mmap_mode="r")
+        load_ms = (time.perf_counter() - start_time) * 1000
+
+        stats = self.load_stats.setdefault(artifact_hash, {"loads": 0})
+        stats.update({
+            "loads": stats["loads"] + 1,
+            "last_verify_ms": round(verify_ms, 2),
+            "last_load_ms": round(load_ms, 2),
+            "last_loaded_at": datetime.now().isoformat()
+        })
+        return model, self.get_metadata(artifact_hash)
+
+    def _set_pinned(self, ref: str, pinned: bool) -> Dict[str, Any]:
+        metadata = self.get_metadata(ref)
+        metadata["pinned"] = pinned
+        _write_json_atomic(self._metadata_path(metadata["hash"]), metadata)
+        return metadata
+
+    def pin(self, ref: str) -> Dict[str, Any]:
+        """Protect an artifact from garbage collection"""
+        return self._set_pinned(ref, True)
+
+    def unpin(self, ref: str) -> Dict[str, Any]:
+        return self._set_pinned(ref, False)
+
+    def _read_refs(self) -> Dict[str, Any]:
+        if not os.path.exists(self.refs_path):
+            return {"current": None, "history": []}
+        with open(self.refs_path) as f:
+            return json.load(f)
+
+    def get_current(self) -> Optional[str]:
+        """Hash of the version that was serving when the refs were last written"""
+        current = self._read_refs()["current"]
+        if current and os.path.exists(self.artifact_path(current)):
+            return current
+        return None
+
+    def set_current(self, artifact_hash: str, rollback: bool = False):
+        """Record artifact_hash as the serving version.
+
+        A deployment pushes the replaced version onto the history; a rollback
+        takes the restored version off it instead.
+        """
+        self._ensure_dirs()
+        with self._lock:
+            refs = self._read_refs()
+            if refs["current"] == artifact_hash:
+                return
+            if rollback:
+                if artifact_hash in refs["history"]:
+                    refs["history"].reverse()
+                    refs["history"].remove(artifact_hash)
+                    refs["history"].reverse()
+            elif refs["current"]:
+                refs["history"].append(refs["current"])
+                del refs["history"][:-config.MODEL_STORE_HISTORY_SIZE]
+            refs["current"] = artifact_hash
+            _write_json_atomic(self.refs_path, refs)
+
+    def previous(self) -> Optional[str]:
+        """The most recently replaced version that is still in the store"""
+        for artifact_hash in reversed(self._read_refs()["history"]):
+            if os.path.exists(self.artifact_path(artifact_hash)):
+                return artifact_hash
+        return None
+
+    def list_artifacts(self) -> List[Dict[str, Any]]:
+        """All stored artifacts, newest first"""
+        current = self.get_current()
+        artifacts = []
+        for artifact_hash in self._hashes():
+            metadata = self._read_metadata(artifact_hash) or {"hash": artifact_hash}
+            artifacts.append({
+                **metadata,
+                "current": artifact_hash == current,
+                "load_stats": self.load_stats.get(artifact_hash)
+            })
+        return sorted(artifacts, key=lambda a: a.get("created_at") or "", reverse=True)
+
+    def gc(self, keep: int = None, protected: Iterable[str] = ()) -> List[str]:
+        """Delete all but the `keep` newest artifacts.
+
+        Pinned artifacts, the serving version, the deployment history and any
+        hash in `protected` are never deleted.
+        """
+        keep = config.MODEL_STORE_KEEP if keep is None else keep
+        refs = self._read_refs()
+        protected = set(protected) | set(refs["history"]) | ({refs["current"]} if refs["current"] else set())
+
+        removable = [
+            a["hash"] for a in self.list_artifacts()
+            if not a.get("pinned") and a["hash"] not in protected
+        ]
+        deleted = []
+        for artifact_hash in removable[keep:]:
+            path = self.artifact_path(artifact_hash)
+            for leftover in (path, self._metadata_path(artifact_hash), reference_profile_path(path)):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            self.load_stats.pop(artifact_hash, None)
+            deleted.append(artifact_hash)
+
+        if deleted:
+            logger.info(f"Garbage collected {len(deleted)} model artifacts")
+        return deleted
+
+
+# Initialize artifact store
+artifact_store = ArtifactStore()
@@ -0,0 +1,145 @@
+"""Score stored loan applications in bulk and write the predictions back.
+
+Features are rebuilt in SQL the way the farmers API builds them at submission
+time, a whole chunk is scored in one model call, and the results are written
+with a single UPDATE joined against unnest()ed arrays, one statement per chunk
+regardless of its size.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.services.ml_model import FEATURE_COLUMNS, ModelHandle, heuristic_confidence
+from app.services.prediction_intervals import interval_confidence, predict_with_interval
+
+# Past yield is the farmer's latest yield for the same crop from before the
+# application year, or 0 when there is none
+FEATURES_SELECT = """
+    SELECT
+        la.id::text AS application_id,
+        la.farm_size_hectares::float8 AS loan_farm_size,
+        lower(ct.name) AS loan_crop,
+        COALESCE(py.yield_amount_kg, 0)::float8 AS past_yield_kgs,
+        COALESCE(py.revenue_mwk, 0)::float8 AS past_yield_mk,
+        la.expected_yield_kg::float8 AS expected_yield_kgs,
+        la.expected_revenue_mwk::float8 AS expected_yield_mk
+    FROM loan_applications la
+    JOIN crop_types ct ON ct.id = la.crop_type_id
+    LEFT JOIN farmer_profiles fp ON fp.user_id = la.farmer_id
+    LEFT JOIN LATERAL (
+        SELECT yh.yield_amount_kg, yh.revenue_mwk
+        FROM yield_history yh
+        WHERE yh.farmer_id = fp.id
+          AND yh.crop_type_id = la.crop_type_id
+          AND yh.year < EXTRACT(YEAR FROM la.application_date)
+        ORDER BY yh.year DESC
+        LIMIT 1
+    ) py ON TRUE
+"""
+
+# Applications missing any model input cannot be scored
+COMPLETE_INPUTS = """
+    la.farm_size_hectares IS NOT NULL
+    AND la.expected_yield_kg IS NOT NULL
+    AND la.expected_revenue_mwk IS NOT NULL
+"""
+
+# loan_applications is partitioned by month of application_date, so a lookup
+# by id alone probes every partition. Callers that know the dates of a batch
+# bound them here to probe only the matching partitions; NULL leaves it open.
+DATE_BOUNDS = """
+    AND (CAST(:first_date AS timestamp) IS NULL OR la.application_date >= CAST(:first_date AS timestamp))
+    AND (CAST(:last_date AS timestamp) IS NULL OR la.application_date <= CAST(:last_date AS timestamp))
+"""
+
+FEATURES_QUERY = text(FEATURES_SELECT + "WHERE la.id = ANY(CAST(:ids AS uuid[])) AND" + COMPLETE_INPUTS + DATE_BOUNDS)
+
+WRITE_QUERY = text("""
+    UPDATE loan_applications la
+    SET predicted_amount_mwk = v.amount,
+        prediction_confidence = v.confidence,
+        prediction_lower_mwk = v.lower_bound,
+        prediction_upper_mwk = v.upper_bound,
+        prediction_date = now(),
+        model_version = :model_version
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:amounts AS numeric[]),
+        CAST(:confidences AS numeric[]),
+        CAST(:lower_bounds AS numeric[]),
+        CAST(:upper_bounds AS numeric[])
+    ) AS v(id, amount, confidence, lower_bound, upper_bound)
+    WHERE la.id = v.id
+        -- An application decided since its features were read keeps the prediction it was decided on
+        AND la.status IN ('SUBMITTED', 'UNDER_REVIEW')
+""" + DATE_BOUNDS)
+
+
+def date_bounds(dates: Optional[Iterable] = None) -> Dict[str, Any]:
+    """DATE_BOUNDS parameters covering the given application dates; open if any is unknown"""
+    dates = list(dates) if dates is not None else []
+    if not dates or any(d is None for d in dates):
+        return {"first_date": None, "last_date": None}
+    return {"first_date": min(dates), "last_date": max(dates)}
+
+
+def features_frame(rows) -> pd.DataFrame:
+    """Rows selected with FEATURES_SELECT as a DataFrame indexed by application id"""
+    return pd.DataFrame(rows, columns=["application_id"] + FEATURE_COLUMNS).set_index("application_id")
+
+
+def load_features(conn: Connection, application_ids: List[str], dates: Optional[Iterable] = None) -> pd.DataFrame:
+    """Model inputs for the applications, indexed by application id; incomplete applications are left out.
+
+    dates, the applications' application_date values if known, limit the partitions read.
+    """
+    return features_frame(conn.execute(
+        FEATURES_QUERY, {"ids": [str(i) for i in application_ids], **date_bounds(dates)}
+    ).mappings().all())
+
+
+def score_features(handle: ModelHandle, features: pd.DataFrame) -> pd.DataFrame:
+    """Predicted amount, confidence and interval for every row, from one model call"""
+    point, lower, upper = predict_with_interval(handle.model, features[FEATURE_COLUMNS])
+    amounts = np.maximum(point, 0)
+    if lower is not None:
+        lower, upper = np.maximum(lower, 0), np.maximum(upper, 0)
+        confidence = interval_confidence(amounts, lower, upper)
+    else:
+        confidence = heuristic_confidence(features["past_yield_kgs"], features["past_yield_mk"], amounts)
+    return pd.DataFrame({
+        "predicted_amount_mwk": np.round(amounts, 2),
+        "prediction_confidence": np.round(confidence, 2),
+        "prediction_lower_mwk": np.round(lower, 2) if lower is not None else None,
+        "prediction_upper_mwk": np.round(upper, 2) if upper is not None else None,
+    }, index=features.index)
+
+
+def write_predictions(
+    conn: Connection, scored: pd.DataFrame, model_version: str, dates: Optional[Iterable] = None
+) -> int:
+    """Write scored rows back in one UPDATE; returns the number of applications updated.
+
+    Only applications still pending are written, so the count is lower than
+    len(scored) when some were decided after their features were loaded.
+    dates, the applications' application_date values if known, limit the partitions read.
+    """
+    if scored.empty:
+        return 0
+
+    def column(name):
+        return [None if pd.isna(v) else float(v) for v in scored[name]]
+
+    result = conn.execute(WRITE_QUERY, {
+        "ids": list(scored.index),
+        "amounts": column("predicted_amount_mwk"),
+        "confidences": column("prediction_confidence"),
+        "lower_bounds": column("prediction_lower_mwk"),
+        "upper_bounds": column("prediction_upper_mwk"),
+        "model_version": model_version,
+        **date_bounds(dates),
+    })
+    return result.rowcount
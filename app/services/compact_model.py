@@ -0,0 +1,392 @@
+"""Flat, memory-mappable format for the loan prediction pipeline.
+
+The pickled sklearn pipeline is exported to a single file holding the tree
+ensemble as contiguous node arrays, with the scaler parameters and crop
+frequency map in a JSON header:
+
+    magic (8 bytes) | header length (uint32 LE) | JSON header | padding | arrays
+
+Every array starts on a 64-byte boundary so the loader can memory-map the file
+and hand out zero-copy NumPy views; processes loading the same file share its
+pages through the OS page cache.
+
+    python -m app.services.compact_model export [model_path] [output_path]
+    python -m app.services.compact_model benchmark [model_path] [output_path]
+"""
+import json
+import logging
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.config.ml_deployment import ml_config as config
+from app.encoders.frequency_encoder import normalize_category
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LPTREE01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+COMPACT_SUFFIX = ".lptree"
+
+
+def compact_model_path(model_path: str) -> str:
+    root, _ = os.path.splitext(model_path)
+    return f"{root}{COMPACT_SUFFIX}"
+
+
+def is_compact_model(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+def _flatten_trees(ensembles: List[Tuple[Any, float]]) -> Dict[str, np.ndarray]:
+    """Concatenate the trees of (estimators, learning_rate) ensembles into shared node arrays.
+
+    children[node] holds the (left, right) node ids, so one gather with
+    2 * node + went_right picks the next node. Leaves point to themselves, so
+    traversal can run a fixed number of steps for every tree. Leaf values are
+    pre-scaled by the learning rate. Index arrays are stored as int64 so NumPy
+    can index with the mapped views directly.
+    """
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator, learning_rate in ((e, lr) for estimators, lr in ensembles for e in estimators):
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left < 0
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.column_stack([
+            np.where(is_leaf, node_ids, tree.children_left),
+            np.where(is_leaf, node_ids, tree.children_right)
+        ]) + offset)
+        values.append(tree.value[:, 0, 0] * learning_rate)
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features).astype(np.int64),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children).astype(np.int64),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int64)
+    }
+
+
+def _compile(pipeline) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Header fields and node arrays for a fitted loan prediction pipeline"""
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    from app.services.prediction_intervals import IntervalRegressor
+
+    preprocessing = pipeline.named_steps["preprocessing"]
+    model = pipeline.named_steps["model"]
+    interval_model = None
+    if isinstance(model, IntervalRegressor):
+        interval_model, model = model, model.estimator_
+    scaler = preprocessing.named_transformers_.get("num")
+    encoder = preprocessing.named_transformers_.get("freq")
+    if not isinstance(model, GradientBoostingRegressor) or model.loss != "squared_error":
+        raise ValueError("Only squared-error GradientBoostingRegressor models can be exported")
+    if not isinstance(scaler, StandardScaler) or encoder is None:
+        raise ValueError("Expected a 'num' StandardScaler and 'freq' FrequencyEncoder preprocessing step")
+
+    # Interval models' trees follow the point model's, so one traversal covers all three
+    ensembles = [model]
+    if interval_model is not None:
+        ensembles += [interval_model.lower_, interval_model.upper_]
+    columns = {name: cols for name, _, cols in preprocessing.transformers_}
+    arrays = _flatten_trees([(ensemble.estimators_[:, 0], ensemble.learning_rate) for ensemble in ensembles])
+    header = {
+        "format_version": FORMAT_VERSION,
+        "num_features": list(columns["num"]),
+        "cat_feature": encoder.column,
+        "scaler_mean": scaler.mean_.tolist() if scaler.with_mean else None,
+        "scaler_scale": scaler.scale_.tolist() if scaler.with_std else None,
+        "freq_map": {str(k): float(v) for k, v in zip(encoder.categories_, encoder.frequencies_)},
+        "init": float(model.init_.constant_.ravel()[0]),
+        "n_trees": int(model.estimators_.shape[0]),
+        "max_depth": int(max(e.tree_.max_depth for e in model.estimators_[:, 0])),
+        "arrays": {}
+    }
+    if interval_model is not None:
+        header["intervals"] = {
+            "coverage": float(interval_model.coverage),
+            "margin": interval_model.margin_,
+            "lower_init": float(interval_model.lower_.init_.constant_.ravel()[0]),
+            "upper_init": float(interval_model.upper_.init_.constant_.ravel()[0]),
+            "n_trees": [int(interval_model.lower_.estimators_.shape[0]), int(interval_model.upper_.estimators_.shape[0])],
+            "max_depth": int(max(e.tree_.max_depth for ensemble in ensembles for e in ensemble.estimators_[:, 0]))
+        }
+    return header, arrays
+
+
+def export_compact_model(pipeline, output_path: str) -> Dict[str, Any]:
+    """Write a fitted loan prediction pipeline in the compact format"""
+    header, arrays = _compile(pipeline)
+
+    # Header size depends on the offsets it records, so lay out arrays relative
+    # to the end of a padded header and fix up once the header length is known
+    relative = 0
+    for name, array in arrays.items():
+        relative += _padding(relative)
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": relative}
+        relative += array.nbytes
+
+    prefix = len(MAGIC) + 4
+    header_bytes = json.dumps(header).encode()
+    data_start = prefix + len(header_bytes) + _padding(prefix + len(header_bytes)) + ALIGNMENT
+    for spec in header["arrays"].values():
+        spec["offset"] += data_start
+    header_bytes = json.dumps(header).encode()
+    if prefix + len(header_bytes) > data_start:
+        raise RuntimeError("Compact model header outgrew its reserved space")
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (header["arrays"][name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, output_path)
+
+    logger.info(f"Exported {header['n_trees']} trees ({len(arrays['feature'])} nodes) to {output_path}")
+    return {"path": output_path, "size_bytes": os.path.getsize(output_path), "nodes": len(arrays["feature"])}
+
+
+class CompactModel:
+    """Predicts from a memory-mapped compact model file.
+
+    Drop-in for the sklearn pipeline's predict(): takes a DataFrame with the
+    model's input columns and returns the predicted amounts.
+    """
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "CompactModel":
+        """Compile a fitted pipeline in memory, without writing a file"""
+        model = cls.__new__(cls)
+        model.path = None
+        model._bind(*_compile(pipeline))
+        return model
+
+    def __init__(self, path: str):
+        self.path = path
+        # Plain ndarray view of the mapping; np.memmap subclass overhead on every
+        # fancy-indexing result is significant in the traversal loop
+        self._buffer = np.memmap(path, dtype=np.uint8, mode="r").view(np.ndarray)
+        if bytes(self._buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a compact model file")
+        (header_length,) = struct.unpack("<I", bytes(self._buffer[len(MAGIC):len(MAGIC) + 4]))
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._buffer[header_start:header_start + header_length]))
+        if self.header["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format {self.header['format_version']}")
+
+        arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            end = spec["offset"] + count * dtype.itemsize
+            arrays[name] = self._buffer[spec["offset"]:end].view(dtype).reshape(spec["shape"])
+        self._bind(self.header, arrays)
+
+    def _bind(self, header: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.header = header
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"].reshape(-1)
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+
+        self.num_features: List[str] = header["num_features"]
+        self.cat_feature: str = header["cat_feature"]
+        self.freq_map: Dict[str, float] = header["freq_map"]
+        self.scaler_mean = np.asarray(header["scaler_mean"] or 0.0, dtype=np.float64)
+        self.scaler_scale = np.asarray(header["scaler_scale"] or 1.0, dtype=np.float64)
+        self.init = header["init"]
+        self.max_depth = header["max_depth"]
+        self.point_roots = self.roots[:header["n_trees"]]
+        self.intervals = header.get("intervals")
+
+    @property
+    def has_intervals(self) -> bool:
+        return self.intervals is not None
+
+    def transform(self, X: pd.DataFrame) -> np.ndarray:
+        """Scaled numeric features followed by the crop frequency, as the pipeline produces"""
+        numeric = (X[self.num_features].to_numpy(dtype=np.float64) - self.scaler_mean) / self.scaler_scale
+        codes, uniques = pd.factorize(X[self.cat_feature], use_na_sentinel=False)
+        frequency = np.asarray(
+            [self.freq_map.get(normalize_category(u), 0.0) for u in uniques], dtype=np.float64
+        ).reshape(-1)[codes]
+        features = np.column_stack([numeric, frequency])
+        if not np.all(np.isfinite(features)):
+            raise ValueError("Input contains NaN or infinity")
+        # sklearn trees compare float32 inputs against float64 thresholds
+        return features.astype(np.float32).astype(np.float64)
+
+    def _leaf_values(self, features: np.ndarray, roots: np.ndarray, depth: int) -> np.ndarray:
+        """Leaf value reached in each (row, tree) for the trees starting at roots"""
+        n_rows, n_columns = features.shape
+        flat_features = features.reshape(-1)
+        row_offsets = (np.arange(n_rows) * n_columns)[:, None]
+
+        # One (row, tree) node per cell, advanced one level per step for all trees at once
+        nodes = np.broadcast_to(roots, (n_rows, len(roots)))
+        for _ in range(depth):
+            went_right = flat_features[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + went_right]
+        return self.value[nodes]
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.init + self._leaf_values(self.transform(X), self.point_roots, self.max_depth).sum(axis=1)
+
+    def predict_interval(self, X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(point, lower, upper) from a single traversal of all three ensembles"""
+        if not self.has_intervals:
+            raise ValueError("This model was exported without prediction intervals")
+        intervals = self.intervals
+        leaves = self._leaf_values(self.transform(X), self.roots, intervals["max_depth"])
+        n_point = len(self.point_roots)
+        n_lower = intervals["n_trees"][0]
+        point = self.init + leaves[:, :n_point].sum(axis=1)
+        lower = intervals["lower_init"] + leaves[:, n_point:n_point + n_lower].sum(axis=1) - intervals["margin"]
+        upper = intervals["upper_init"] + leaves[:, n_point + n_lower:].sum(axis=1) + intervals["margin"]
+        return point, np.minimum(lower, point), np.maximum(upper, point)
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Input features in transformed column order; each maps to exactly one column"""
+        return self.num_features + [self.cat_feature]
+
+    def explain(self, X: pd.DataFrame) -> Tuple[float, np.ndarray]:
+        """Saabas path attributions: (base value, contributions of shape (rows, features)).
+
+        Every split a row passes through credits the change in node value to
+        the split feature, so base value + contributions sums to the
+        prediction. Runs the same level-by-level traversal as predict().
+        """
+        features = self.transform(X)
+        n_rows, n_columns = features.shape
+        flat_features = features.reshape(-1)
+        row_offsets = (np.arange(n_rows) * n_columns)[:, None]
+        contributions = np.zeros(n_rows * n_columns)
+
+        nodes = np.broadcast_to(self.point_roots, (n_rows, len(self.point_roots)))
+        for _ in range(self.max_depth):
+            cells = row_offsets + self.feature[nodes]
+            went_right = flat_features[cells] > self.threshold[nodes]
+            children = self.children[2 * nodes + went_right]
+            # Leaves loop to themselves, so finished trees add zero
+            contributions += np.bincount(
+                cells.reshape(-1),
+                weights=(self.value[children] - self.value[nodes]).reshape(-1),
+                minlength=n_rows * n_columns
+            )
+            nodes = children
+        base_value = self.init + float(self.value[self.point_roots].sum())
+        return base_value, contributions.reshape(n_rows, n_columns)
+
+
+def _measure_load(kind: str, path: str, golden_path: str, repeats: int) -> Dict[str, float]:
+    """Load one artifact in a fresh process and time it; run via multiprocessing"""
+    import joblib
+    import psutil
+
+    from app.services.prediction_intervals import predict_with_interval
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start_time = time.perf_counter()
+    model = CompactModel(path) if kind == "compact" else joblib.load(path)
+    load_ms = (time.perf_counter() - start_time) * 1000
+    rss_after_load = process.memory_info().rss
+
+    with open(golden_path) as f:
+        golden = pd.DataFrame(json.load(f))
+    row = golden.iloc[[0]]
+    model.predict(row)  # first call pays any lazy page faults
+
+    latencies = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        model.predict(row)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    # The serving path: point prediction plus interval, when the model has one
+    interval_latencies = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        predict_with_interval(model, row)
+        interval_latencies.append((time.perf_counter() - start_time) * 1000)
+
+    batch = pd.concat([golden] * 100, ignore_index=True)
+    start_time = time.perf_counter()
+    model.predict(batch)
+    batch_ms = (time.perf_counter() - start_time) * 1000
+
+    return {
+        "load_ms": round(load_ms, 2),
+        "rss_delta_mb": round((rss_after_load - rss_before) / 2 ** 20, 2),
+        "file_size_mb": round(os.path.getsize(path) / 2 ** 20, 3),
+        "single_row_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "single_row_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "with_interval_p50_ms": round(float(np.percentile(interval_latencies, 50)), 3),
+        "with_interval_p99_ms": round(float(np.percentile(interval_latencies, 99)), 3),
+        "batch_rows": len(batch),
+        "batch_ms": round(batch_ms, 2)
+    }
+
+
+def benchmark(model_path: str, compact_path: str, repeats: int = 500) -> Dict[str, Any]:
+    """Compare load time, RSS and latency of the joblib and compact artifacts.
+
+    Each artifact is loaded in its own fresh process so RSS and load time are
+    not skewed by imports or caches from the other.
+    """
+    import multiprocessing
+
+    import joblib
+
+    pipeline = joblib.load(model_path)
+    with open(config.GOLDEN_INPUTS_PATH) as f:
+        golden = pd.DataFrame(json.load(f))
+    max_abs_diff = float(np.max(np.abs(pipeline.predict(golden) - CompactModel(compact_path).predict(golden))))
+
+    context = multiprocessing.get_context("spawn")
+    results = {"max_abs_prediction_diff": max_abs_diff}
+    for kind, path in (("joblib", model_path), ("compact", compact_path)):
+        with context.Pool(1) as pool:
+            results[kind] = pool.apply(_measure_load, (kind, path, config.GOLDEN_INPUTS_PATH, repeats))
+    return results
+
+
+if __name__ == "__main__":
+    import joblib
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    source = sys.argv[2] if len(sys.argv) > 2 else config.MODEL_PATH
+    target = sys.argv[3] if len(sys.argv) > 3 else compact_model_path(source)
+
+    if command == "export":
+        print(json.dumps(export_compact_model(joblib.load(source), target), indent=2))
+    elif command == "benchmark":
+        if not os.path.exists(target):
+            export_compact_model(joblib.load(source), target)
+        print(json.dumps(benchmark(source, target), indent=2))
+    else:
+        sys.exit(f"Unknown command {command}; use export or benchmark")
@@ -0,0 +1,162 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.config.ml_deployment import ml_config as config
+from app.models.db_models import FarmerProfile, LoanApplication, YieldHistory
+from app.services.compact_model import CompactModel
+from app.services.ml_model import FEATURE_COLUMNS, ModelHandle, model_service
+
+logger = logging.getLogger(__name__)
+
+
+def application_features(db: Session, applications: List[LoanApplication]) -> pd.DataFrame:
+    """Rebuild the model inputs of applications the way the farmers API built them.
+
+    Past yield is the farmer's latest yield for the same crop from before the
+    application year, or 0 when there is none.
+    """
+    farmer_ids = {a.farmer_id for a in applications}
+    profiles = dict(
+        db.query(FarmerProfile.user_id, FarmerProfile.id).filter(FarmerProfile.user_id.in_(farmer_ids)).all()
+    ) if farmer_ids else {}
+    history = {}
+    if profiles:
+        records = db.query(YieldHistory).filter(
+            YieldHistory.farmer_id.in_(profiles.values())
+        ).order_by(YieldHistory.year.desc()).all()
+        for record in records:
+            history.setdefault((record.farmer_id, record.crop_type_id), []).append(record)
+
+    rows = []
+    for application in applications:
+        year = application.application_date.year if application.application_date else None
+        past = next(
+            (
+                record for record in history.get((profiles.get(application.farmer_id), application.crop_type_id), [])
+                if year is None or record.year < year
+            ),
+            None
+        )
+        rows.append({
+            'loan_farm_size': float(application.farm_size_hectares or 0),
+            'loan_crop': application.crop_type_rel.name.lower(),
+            'past_yield_kgs': float(past.yield_amount_kg or 0) if past else 0.0,
+            'past_yield_mk': float(past.revenue_mwk or 0) if past else 0.0,
+            'expected_yield_kgs': float(application.expected_yield_kg or 0),
+            'expected_yield_mk': float(application.expected_revenue_mwk or 0)
+        })
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+class PredictionExplainer:
+    """Per-feature breakdowns of predicted amounts, cached per application and model version"""
+
+    def __init__(self):
+        self._compiled: Dict[str, CompactModel] = {}
+        self._cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _handle_for(self, model_version: Optional[str]) -> Optional[ModelHandle]:
+        """The loaded handle that made the prediction, falling back to the live model"""
+        canary = model_service.canary
+        handles = [model_service.handle, *model_service.previous_handles, canary.handle if canary else None]
+        for handle in handles:
+            if handle is not None and handle.model_version == model_version:
+                return handle
+        return model_service.handle
+
+    def _compiled_model(self, handle: ModelHandle) -> Optional[CompactModel]:
+        if isinstance(handle.model, CompactModel):
+            return handle.model
+        compiled = self._compiled.get(handle.model_version)
+        if compiled is None:
+            try:
+                compiled = CompactModel.from_pipeline(handle.model)
+            except (ValueError, KeyError, AttributeError) as e:
+                logger.info(f"Model {handle.model_version} cannot be explained: {str(e)}")
+                return None
+            with self._lock:
+                self._compiled[handle.model_version] = compiled
+                # Enough for the live model, the rollback cache and a canary
+                while len(self._compiled) > config.MODEL_CACHE_SIZE + 2:
+                    del self._compiled[next(iter(self._compiled))]
+        return compiled
+
+    def _cached(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            explanation = self._cache.get(key)
+            if explanation is not None:
+                self._cache.move_to_end(key)
+            return explanation
+
+    def _store(self, key: tuple, explanation: Dict[str, Any]):
+        with self._lock:
+            self._cache[key] = explanation
+            while len(self._cache) > config.EXPLANATION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def explain_applications(
+        self, db: Session, applications: List[LoanApplication]
+    ) -> Dict[Any, Optional[Dict[str, Any]]]:
+        """Explanations keyed by application id; uncached ones are computed in one batch per model"""
+        results: Dict[Any, Optional[Dict[str, Any]]] = {}
+        pending: Dict[str, List[LoanApplication]] = {}
+        handles: Dict[str, ModelHandle] = {}
+
+        for application in applications:
+            handle = self._handle_for(application.model_version)
+            # Without a crop there are no model inputs to explain
+            if handle is None or application.crop_type_rel is None:
+                results[application.id] = None
+                continue
+            explanation = self._cached((application.id, handle.model_version))
+            if explanation is not None:
+                results[application.id] = explanation
+            else:
+                pending.setdefault(handle.model_version, []).append(application)
+                handles[handle.model_version] = handle
+
+        for model_version, group in pending.items():
+            compiled = self._compiled_model(handles[model_version])
+            if compiled is None:
+                results.update({application.id: None for application in group})
+                continue
+
+            features = application_features(db, group)
+            base_value, contributions = compiled.explain(features)
+            names = compiled.feature_names
+            for i, application in enumerate(group):
+                row = features.iloc[i]
+                explanation = {
+                    "model_version": model_version,
+                    "matches_prediction_model": application.model_version == model_version,
+                    "base_value_mwk": round(base_value, 2),
+                    "predicted_amount_mwk": round(base_value + float(contributions[i].sum()), 2),
+                    "contributions": sorted(
+                        (
+                            {
+                                "feature": name,
+                                "value": row[name],
+                                "contribution_mwk": round(float(contributions[i, j]), 2)
+                            }
+                            for j, name in enumerate(names)
+                        ),
+                        key=lambda c: abs(c["contribution_mwk"]),
+                        reverse=True
+                    )
+                }
+                self._store((application.id, model_version), explanation)
+                results[application.id] = explanation
+        return results
+
+    def explain_application(self, db: Session, application: LoanApplication) -> Optional[Dict[str, Any]]:
+        return self.explain_applications(db, [application])[application.id]
+
+
+# Initialize prediction explainer
+prediction_explainer = PredictionExplainer()
@@ -0,0 +1,310 @@
+"""Archive decided applications older than the retention window.
+
+Approved, rejected and disbursed applications whose decision (or submission,
+if undecided) is older than PREDICTION_HISTORY_RETENTION_DAYS are moved, with
+their reviews and shadow scores, into zstd-compressed Parquet files under
+ARCHIVE_PATH, one file per table per batch. Each batch is one short
+transaction: the rows are locked, written out, folded into the
+archived_application_stats rollup that dashboards read for archived history,
+deleted, and the checkpoint is advanced. A failed run resumes from its
+checkpoint and rewrites the same file names, so files are never duplicated.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, text
+from sqlalchemy.engine import Engine
+
+from app.config.database import engine
+from app.config.ml_deployment import ml_config as config
+from app.models.db_models import Base
+from app.services.batch_scoring import DATE_BOUNDS, date_bounds
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "history_archive_checkpoint"
+FIRST_ID = "00000000-0000-0000-0000-000000000000"
+
+# Tables archived along with their applications, by application_id
+CHILD_TABLES = ["application_reviews", "shadow_predictions"]
+
+# Decided applications only; anything still in progress stays in the hot table
+CLAIM_QUERY = text("""
+    SELECT la.*
+    FROM loan_applications la
+    WHERE la.status IN ('APPROVED', 'REJECTED', 'DISBURSED')
+      AND COALESCE(la.approval_date, la.application_date) < :cutoff
+      AND la.id > CAST(:after_id AS uuid)
+    ORDER BY la.id
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+""")
+
+ROLLUP_QUERY = text("""
+    INSERT INTO archived_application_stats (
+        id, period_start, district_id, crop_type_id, status, application_count, review_count,
+        predicted_count, sum_predicted_mwk, approved_count, sum_approved_mwk, last_updated
+    )
+    SELECT
+        gen_random_uuid(),
+        date_trunc('month', COALESCE(la.application_date, la.approval_date))::date,
+        la.district_id,
+        la.crop_type_id,
+        lower(la.status::text),
+        COUNT(*),
+        COALESCE(SUM(r.reviews), 0),
+        COUNT(la.predicted_amount_mwk),
+        COALESCE(SUM(la.predicted_amount_mwk), 0)::float8,
+        COUNT(la.approved_amount_mwk),
+        COALESCE(SUM(la.approved_amount_mwk), 0)::float8,
+        now()
+    FROM loan_applications la
+    LEFT JOIN (
+        SELECT application_id, COUNT(*) AS reviews
+        FROM application_reviews
+        WHERE application_id = ANY(CAST(:ids AS uuid[]))
+        GROUP BY application_id
+    ) r ON r.application_id = la.id
+    WHERE la.id = ANY(CAST(:ids AS uuid[]))
+    """ + DATE_BOUNDS + """
+    GROUP BY 2, 3, 4, 5
+    ON CONFLICT (period_start, district_id, crop_type_id, status) DO UPDATE SET
+        application_count = archived_application_stats.application_count + EXCLUDED.application_count,
+        review_count = archived_application_stats.review_count + EXCLUDED.review_count,
+        predicted_count = archived_application_stats.predicted_count + EXCLUDED.predicted_count,
+        sum_predicted_mwk = archived_application_stats.sum_predicted_mwk + EXCLUDED.sum_predicted_mwk,
+        approved_count = archived_application_stats.approved_count + EXCLUDED.approved_count,
+        sum_approved_mwk = archived_application_stats.sum_approved_mwk + EXCLUDED.sum_approved_mwk,
+        last_updated = EXCLUDED.last_updated
+""")
+
+DELETE_QUERY = text("DELETE FROM loan_applications la WHERE la.id = ANY(CAST(:ids AS uuid[]))" + DATE_BOUNDS)
+
+# Queued scoring jobs have no foreign key to cascade from the partitioned table
+DELETE_JOBS_QUERY = text("DELETE FROM prediction_jobs WHERE application_id = ANY(CAST(:ids AS uuid[]))")
+
+LOCK_TIMEOUT_QUERY = text("SELECT set_config('lock_timeout', :timeout, true)")
+
+CHECKPOINT_QUERY = text("""
+    INSERT INTO system_settings (id, key, value, description, last_updated)
+    VALUES (gen_random_uuid(), :key, :value, 'Progress of the last history archive run', now())
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, last_updated = now()
+""")
+
+READ_CHECKPOINT_QUERY = text("SELECT value FROM system_settings WHERE key = :key")
+
+ARCHIVED_TOTALS_QUERY = text("""
+    SELECT district_id::text AS district_id, status,
+           SUM(application_count) AS applications,
+           SUM(approved_count) AS approved_count,
+           SUM(sum_approved_mwk) AS sum_approved_mwk
+    FROM archived_application_stats
+    WHERE district_id = ANY(CAST(:district_ids AS uuid[]))
+    GROUP BY 1, 2
+""")
+
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision, column_type.scale)
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    # UUIDs, enums and text
+    return pa.string()
+
+
+def _archive_row(row) -> Dict[str, Any]:
+    return {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in row.items()}
+
+
+def archive_schema(table_name: str) -> pa.Schema:
+    """Parquet schema of an archived table, from its model, so every file of a table matches"""
+    return pa.schema([(column.name, _arrow_type(column)) for column in Base.metadata.tables[table_name].columns])
+
+
+def _write_parquet(path: str, rows: List[Dict[str, Any]], schema: pa.Schema):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp_path, compression="zstd")
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def archived_before(conn) -> Optional[datetime]:
+    """Cutoff below which applications may have been archived, or None if nothing was"""
+    value = conn.execute(READ_CHECKPOINT_QUERY, {"key": CHECKPOINT_KEY}).scalar()
+    archived = json.loads(value).get("archived_before") if value else None
+    return datetime.fromisoformat(archived) if archived else None
+
+
+def archived_totals(conn, district_ids: List[str]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Archived application counts and approved amounts by district ID and status"""
+    totals: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for row in conn.execute(ARCHIVED_TOTALS_QUERY, {"district_ids": district_ids}):
+        totals.setdefault(row.district_id, {})[row.status] = {
+            "applications": int(row.applications),
+            "approved_count": int(row.approved_count),
+            "sum_approved_mwk": float(row.sum_approved_mwk)
+        }
+    return totals
+
+
+class HistoryArchiver:
+    """Move decided applications past the retention window out of the hot tables"""
+
+    def __init__(self, bind: Engine = engine):
+        self.bind = bind
+        self.progress: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        with self.bind.connect() as conn:
+            value = conn.execute(READ_CHECKPOINT_QUERY, {"key": CHECKPOINT_KEY}).scalar()
+        return json.loads(value) if value else None
+
+    def _write_checkpoint(self, conn, progress: Dict[str, Any]):
+        conn.execute(CHECKPOINT_QUERY, {"key": CHECKPOINT_KEY, "value": json.dumps(progress)})
+
+    def start(self, resume: bool = True) -> bool:
+        """Run in a background thread. Returns False if a run is already in progress."""
+        # Taken here and released by the thread, so two callers cannot both start a run
+        if not self._lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._run_locked, kwargs={"resume": resume}, name="history-archive")
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def run(self, resume: bool = True) -> Optional[Dict[str, Any]]:
+        if not self._lock.acquire(blocking=False):
+            logger.info("History archive already in progress, skipping")
+            return None
+        return self._run_locked(resume)
+
+    def _run_locked(self, resume: bool) -> Optional[Dict[str, Any]]:
+        try:
+            return self._archive(resume)
+        except Exception as e:
+            logger.error(f"History archive failed: {str(e)}")
+            if self.progress is not None:
+                self.progress["status"] = "failed"
+                self.progress["error"] = str(e)
+                with self.bind.begin() as conn:
+                    self._write_checkpoint(conn, self.progress)
+            return self.progress
+        finally:
+            self._lock.release()
+
+    def _archive(self, resume: bool) -> Dict[str, Any]:
+        checkpoint = self.read_checkpoint()
+        previous_cutoff = checkpoint.get("archived_before") if checkpoint else None
+        if checkpoint and resume and checkpoint["status"] in ("running", "failed"):
+            # Same run id, cutoff and batch numbers, so files of a failed batch are overwritten
+            progress = {**checkpoint, "status": "running", "resumed_at": datetime.now().isoformat()}
+            progress.pop("error", None)
+        else:
+            cutoff = datetime.now() - timedelta(days=config.PREDICTION_HISTORY_RETENTION_DAYS)
+            progress = {
+                "run_id": datetime.now().strftime("%Y%m%d%H%M%S"),
+                "status": "running",
+                "started_at": datetime.now().isoformat(),
+                "cutoff": cutoff.isoformat(),
+                "archived_before": previous_cutoff,
+                "last_id": FIRST_ID,
+                "batches": 0,
+                "archived": {table: 0 for table in ["loan_applications", *CHILD_TABLES]}
+            }
+        self.progress = progress
+        schemas = {table: archive_schema(table) for table in ["loan_applications", *CHILD_TABLES]}
+        start_time = time.perf_counter()
+        archived_this_run = 0
+
+        while True:
+            with self.bind.begin() as conn:
+                conn.execute(LOCK_TIMEOUT_QUERY, {"timeout": config.ARCHIVE_LOCK_TIMEOUT})
+                applications = conn.execute(CLAIM_QUERY, {
+                    "cutoff": progress["cutoff"],
+                    "after_id": progress["last_id"],
+                    "batch_size": config.ARCHIVE_BATCH_SIZE
+                }).mappings().all()
+                if not applications:
+                    break
+
+                ids = [str(row["id"]) for row in applications]
+                batch = progress["batches"] + 1
+                rows = {"loan_applications": [_archive_row(row) for row in applications]}
+                for table in CHILD_TABLES:
+                    rows[table] = [_archive_row(row) for row in conn.execute(
+                        text(f"SELECT * FROM {table} WHERE application_id = ANY(CAST(:ids AS uuid[]))"), {"ids": ids}
+                    ).mappings()]
+
+                # Files first: if the transaction then fails, the retry overwrites them
+                for table, table_rows in rows.items():
+                    if table_rows:
+                        path = os.path.join(config.ARCHIVE_PATH, table, f"{progress['run_id']}-{batch:06d}.parquet")
+                        _write_parquet(path, table_rows, schemas[table])
+
+                bounds = date_bounds(row["application_date"] for row in applications)
+                conn.execute(ROLLUP_QUERY, {"ids": ids, **bounds})
+                for table in CHILD_TABLES:
+                    conn.execute(text(f"DELETE FROM {table} WHERE application_id = ANY(CAST(:ids AS uuid[]))"), {"ids": ids})
+                conn.execute(DELETE_JOBS_QUERY, {"ids": ids})
+                conn.execute(DELETE_QUERY, {"ids": ids, **bounds})
+
+                progress["batches"] = batch
+                progress["last_id"] = ids[-1]
+                for table, table_rows in rows.items():
+                    progress["archived"][table] += len(table_rows)
+                progress["archived_before"] = max(filter(None, [progress["archived_before"], progress["cutoff"]]))
+                self._write_checkpoint(conn, progress)
+
+            archived_this_run += len(ids)
+            elapsed = time.perf_counter() - start_time
+            progress["rows_per_second"] = round(archived_this_run / elapsed, 1)
+            time.sleep(config.ARCHIVE_BATCH_PAUSE_SECONDS)
+
+        progress["status"] = "completed"
+        progress["finished_at"] = datetime.now().isoformat()
+        progress["seconds"] = round(time.perf_counter() - start_time, 2)
+        with self.bind.begin() as conn:
+            self._write_checkpoint(conn, progress)
+
+        if archived_this_run:
+            # Reclaim the deleted rows' space for reuse and refresh planner statistics
+            with self.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(f"VACUUM (ANALYZE) loan_applications, {', '.join(CHILD_TABLES)}"))
+        logger.info(
+            f"History archive completed: {archived_this_run} applications archived "
+            f"in {progress['seconds']}s ({progress['batches']} batches in total)"
+        )
+        return progress
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "schedule": f"daily at {config.ARCHIVE_TIME}",
+            "retention_days": config.PREDICTION_HISTORY_RETENTION_DAYS,
+            "running": self._lock.locked(),
+            "progress": self.progress or self.read_checkpoint()
+        }
+
+
+# Initialize history archiver
+history_archiver = HistoryArchiver()
@@ -1,16 +1,44 @@
 # app/services/model_service.py
+import hashlib
 import os
+import time
 import joblib
 import pandas as pd
 import numpy as np
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from fastapi import HTTPException
 import logging
 from pydantic import BaseModel
+from app.config.ml_deployment import ml_config as config
+from app.services.artifact_store import artifact_store, file_sha256, short_hash
+from app.services.compact_model import CompactModel, is_compact_model
+from app.services.prediction_intervals import interval_confidence, predict_with_interval
+from app.utils.drift_monitor import drift_monitor, reference_profile_path
+from app.utils.model_monitor import model_monitor
 
 logger = logging.getLogger(__name__)
-model_path = "app/ml_model/loan_predictor1.pkl"
+model_path = config.MODEL_PATH
+
+# The 6 features the model pipeline expects, in training order
+FEATURE_COLUMNS = [
+    'loan_farm_size',
+    'loan_crop',
+    'past_yield_kgs',
+    'past_yield_mk',
+    'expected_yield_kgs',
+    'expected_yield_mk'
+]
+
+def heuristic_confidence(past_yield_kgs, past_yield_mk, prediction) -> np.ndarray:
+    """Confidence from the inputs alone, for models without prediction intervals; vectorized"""
+    past_yield_kgs, past_yield_mk, prediction = np.broadcast_arrays(past_yield_kgs, past_yield_mk, prediction)
+    # Higher confidence if historical data exists
+    confidence = np.where((past_yield_kgs > 0) & (past_yield_mk > 0), 0.9, 0.7)
+    # Lower confidence for very large loans (over 1 million MWK)
+    return np.where(prediction > 1000000, np.maximum(0.5, confidence - 0.1), confidence)
 
 class PredictionInput(BaseModel):
     loan_farm_size: float
@@ -20,22 +48,92 @@ class PredictionInput(BaseModel):
     expected_yield_kgs: float
     expected_yield_mk: float
 
+@dataclass(frozen=True)
+class ModelHandle:
+    """A loaded model version. Handles are never mutated, so a request keeps
+    the handle it started with even if another version is swapped in."""
+    model: Any
+    model_version: str
+    model_path: str
+    loaded_at: datetime
+    artifact_hash: Optional[str] = None
+
+
+def load_model_handle(path: str, model_version: str = None) -> ModelHandle:
+    """Load a model file from disk into a new handle, versioned by its content hash"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found: {path}")
+    return ModelHandle(
+        model=CompactModel(path) if is_compact_model(path) else joblib.load(path),
+        model_version=model_version or short_hash(file_sha256(path)),
+        model_path=path,
+        loaded_at=datetime.now()
+    )
+
+
+def load_artifact_handle(ref: str) -> ModelHandle:
+    """Load a version from the artifact store by hash or hash prefix"""
+    model, metadata = artifact_store.load(ref)
+    return ModelHandle(
+        model=model,
+        model_version=metadata["model_version"],
+        model_path=artifact_store.artifact_path(metadata["hash"]),
+        loaded_at=datetime.now(),
+        artifact_hash=metadata["hash"]
+    )
+
+
+@dataclass(frozen=True)
+class CanaryRoute:
+    """A model version serving a sticky share of farmers"""
+    handle: ModelHandle
+    weight_percent: float
+    started_at: datetime
+
+
+def routing_bucket(routing_key: Any) -> int:
+    """Stable bucket in [0, 10000) so the same farmer always gets the same route"""
+    digest = hashlib.sha256(str(routing_key).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % 10000
+
+
 class ModelService:
     def __init__(self, model_path: str = model_path):
-        self.model_path = model_path
-        self.model = None
-        self.model_version = None
-        self.load_model()
+        self.handle: Optional[ModelHandle] = None
+        # Recently replaced versions, kept in memory for instant rollback
+        self.previous_handles: deque = deque(maxlen=config.MODEL_CACHE_SIZE)
+        self.canary: Optional[CanaryRoute] = None
+        self.canary_events: List[Dict[str, Any]] = []
+        self._canary_checked_at = 0.0
+        self._load_initial_model(model_path)
+    
+    @property
+    def model(self):
+        return self.handle.model if self.handle else None
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.handle.model_version if self.handle else None
     
-    def load_model(self):
-        """Load the trained model from disk"""
+    @property
+    def model_path(self) -> Optional[str]:
+        return self.handle.model_path if self.handle else None
+    
+    def _load_initial_model(self, model_path: str):
+        """Serve the version recorded in the artifact store, or import model_path into it"""
         try:
-            if os.path.exists(self.model_path):
-                self.model = joblib.load(self.model_path)
-                self.model_version = datetime.now().strftime("%Y%m%d_%H%M%S")
-                logger.info(f"Model loaded successfully from {self.model_path}")
-            else:
-                raise FileNotFoundError(f"Model file not found: {self.model_path}")
+            current = artifact_store.get_current()
+            if current is None:
+                current = artifact_store.put_file(model_path)["hash"]
+            self.activate(load_artifact_handle(current))
+        except Exception as e:
+            logger.warning(f"Artifact store unavailable, loading {model_path} directly: {str(e)}")
+            self.load_model(model_path)
+    
+    def load_model(self, model_path: str = None):
+        """Load the trained model from disk and serve it"""
+        try:
+            self.activate(load_model_handle(model_path or self.model_path))
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise HTTPException(
@@ -43,86 +141,201 @@ class ModelService:
                 detail=f"Failed to load prediction model: {str(e)}"
             )
     
+    def activate(self, handle: ModelHandle, keep_previous: bool = True):
+        """Serve handle for new requests. The swap is a single reference assignment;
+        in-flight requests finish on the handle they already hold."""
+        previous = self.handle
+        self.handle = handle
+        if previous is not None and keep_previous:
+            self.previous_handles.append(previous)
+        if handle.artifact_hash:
+            artifact_store.set_current(handle.artifact_hash, rollback=not keep_previous)
+        drift_monitor.load_reference(reference_profile_path(handle.model_path))
+        logger.info(f"Model {handle.model_version} now serving from {handle.model_path}")
+    
+    def rollback(self, model_version: str = None) -> Optional[ModelHandle]:
+        """Swap back to a recently replaced version from the in-memory cache.
+        
+        Without model_version this is the most recently replaced version; a hash
+        prefix selects an older one. Returns None if it is not cached. A running
+        canary is removed so it cannot be promoted over the rolled-back version.
+        """
+        if model_version is None:
+            if not self.previous_handles:
+                return None
+            handle = self.previous_handles.pop()
+        else:
+            handle = next(
+                (h for h in reversed(self.previous_handles)
+                 if (h.artifact_hash or h.model_version).startswith(model_version)),
+                None
+            )
+            if handle is None:
+                return None
+            self.previous_handles.remove(handle)
+        self.activate(handle, keep_previous=False)
+        self.stop_canary("replaced by rollback")
+        return handle
+    
     def reload_model(self, new_model_path: str = None):
         """Reload model with new version"""
-        if new_model_path:
-            self.model_path = new_model_path
-        self.load_model()
+        self.load_model(new_model_path)
         logger.info(f"Model reloaded with version: {self.model_version}")
         return self.get_model_info()
     
-    def predict(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Make prediction using only the 6 required features"""
+    def start_canary(self, model_path: str, weight_percent: float, model_version: str = None) -> Dict[str, Any]:
+        """Route weight_percent of farmers to the model at model_path"""
+        if not 0 < weight_percent <= 100:
+            raise ValueError("weight_percent must be in (0, 100]")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        self.canary = CanaryRoute(
+            handle=load_model_handle(model_path, model_version),
+            weight_percent=weight_percent,
+            started_at=datetime.now()
+        )
+        self._log_canary_event("started", f"{weight_percent}% of farmers")
+        logger.info(f"Canary {self.canary.handle.model_version} serving {weight_percent}% of predictions")
+        return self.get_canary_info()
+
+    def stop_canary(self, reason: str = "stopped") -> Optional[str]:
+        """Send all traffic back to the stable model"""
+        canary = self.canary
+        if canary is None:
+            return None
+        self.canary = None
+        self._log_canary_event(reason, canary.handle.model_version)
+        logger.warning(f"Canary {canary.handle.model_version} removed: {reason}")
+        return canary.handle.model_version
+
+    def _log_canary_event(self, event: str, detail: str):
+        self.canary_events.append({"event": event, "detail": detail, "timestamp": datetime.now()})
+        del self.canary_events[:-50]
+
+    def get_canary_info(self) -> Optional[Dict[str, Any]]:
+        canary = self.canary
+        if canary is None:
+            return None
+        return {
+            "model_version": canary.handle.model_version,
+            "model_path": canary.handle.model_path,
+            "weight_percent": canary.weight_percent,
+            "started_at": canary.started_at
+        }
+
+    def _check_canary_health(self, canary: CanaryRoute):
+        """Demote the canary if its p99 latency or error rate breaches the thresholds"""
+        metrics = model_monitor.get_version_metrics()
+        canary_metrics = metrics.get(canary.handle.model_version)
+        if not canary_metrics or canary_metrics["count"] < config.CANARY_MIN_SAMPLES:
+            return
+
+        reasons = []
+        if canary_metrics["error_rate"] > config.CANARY_MAX_ERROR_RATE:
+            reasons.append(f"error rate {canary_metrics['error_rate']:.2%}")
+        if canary_metrics["p99_ms"] > config.CANARY_MAX_P99_LATENCY_MS:
+            reasons.append(f"p99 latency {canary_metrics['p99_ms']:.1f}ms")
+
+        stable_metrics = metrics.get(self.model_version)
+        if stable_metrics and stable_metrics["count"] >= config.CANARY_MIN_SAMPLES:
+            if canary_metrics["p99_ms"] > stable_metrics["p99_ms"] * config.CANARY_MAX_LATENCY_RATIO:
+                reasons.append(
+                    f"p99 latency {canary_metrics['p99_ms']:.1f}ms vs stable {stable_metrics['p99_ms']:.1f}ms"
+                )
+
+        if reasons and self.canary is canary:
+            self.stop_canary(f"auto-demoted: {', '.join(reasons)}")
+
+    def predict(self, input_data: Dict[str, Any], routing_key: Any = None) -> Dict[str, Any]:
+        """Make prediction using only the 6 required features.
+
+        When a canary is active, farmers whose routing_key hashes into its share are
+        scored by the canary; the result is tagged with the version that produced it.
+        """
+        handle = self.handle
+        canary = self.canary
+        use_canary = (
+            canary is not None
+            and routing_key is not None
+            and routing_bucket(routing_key) < canary.weight_percent * 100
+        )
+        if use_canary:
+            handle = canary.handle
+        model = handle.model if handle else None
+        model_version = handle.model_version if handle else None
+        start_time = time.perf_counter()
+
         try:
-            if not self.model:
+            if not model:
                 raise HTTPException(status_code=503, detail="Model not loaded")
             
             # Validate input contains all required features
-            required_fields = [
-                'loan_farm_size', 'loan_crop', 'past_yield_kgs',
-                'past_yield_mk', 'expected_yield_kgs', 'expected_yield_mk'
-            ]
-            missing_fields = [f for f in required_fields if f not in input_data]
+            missing_fields = [f for f in FEATURE_COLUMNS if f not in input_data]
             if missing_fields:
                 raise ValueError(f"Missing required fields: {missing_fields}")
 
             # Prepare features DataFrame
-            features = pd.DataFrame([{
-                'loan_farm_size': input_data['loan_farm_size'],
-                'loan_crop': input_data['loan_crop'],
-                'past_yield_kgs': input_data['past_yield_kgs'],
-                'past_yield_mk': input_data['past_yield_mk'],
-                'expected_yield_kgs': input_data['expected_yield_kgs'],
-                'expected_yield_mk': input_data['expected_yield_mk']
-            }])
+            features = pd.DataFrame([{f: input_data[f] for f in FEATURE_COLUMNS}])
             
-            # Make prediction
-            prediction = float(self.model.predict(features)[0])
-            prediction = max(0, prediction)  # Ensure non-negative
+            # Make prediction; the interval comes from the same pass
+            point, lower, upper = predict_with_interval(model, features)
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            prediction = max(0, float(point[0]))  # Ensure non-negative
             
             # Calculate confidence score
-            confidence = self._calculate_confidence(input_data, prediction)
+            if lower is not None:
+                lower_bound, upper_bound = max(0, float(lower[0])), max(0, float(upper[0]))
+                confidence = round(float(interval_confidence(prediction, lower_bound, upper_bound)), 2)
+            else:
+                lower_bound = upper_bound = None
+                confidence = self._calculate_confidence(input_data, prediction)
             
-            return {
+            result = {
                 "predicted_amount_mwk": prediction,
-                "prediction_confidence": confidence
+                "prediction_lower_mwk": lower_bound,
+                "prediction_upper_mwk": upper_bound,
+                "prediction_confidence": confidence,
+                "model_version": model_version,
+                "latency_ms": latency_ms
             }
+            # Recorded once the result is complete, so a failure is never counted as both
+            model_monitor.record_prediction(latency_ms / 1000, success=True, model_version=model_version)
+            if not use_canary:
+                drift_monitor.record(input_data, prediction)
+            return result
             
         except Exception as e:
+            model_monitor.record_prediction(
+                time.perf_counter() - start_time, success=False, model_version=model_version
+            )
             logger.error(f"Prediction failed: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Prediction error: {str(e)}"
             )
+        finally:
+            # Throttled: the check copies and sorts every version's latency window
+            if use_canary and time.monotonic() - self._canary_checked_at >= config.CANARY_HEALTH_CHECK_INTERVAL_SECONDS:
+                self._canary_checked_at = time.monotonic()
+                self._check_canary_health(canary)
     
     def _calculate_confidence(self, input_data: Dict[str, Any], prediction: float) -> float:
-        """Calculate confidence score based on input data"""
-        confidence = 0.7  # Base confidence
-        
-        # Higher confidence if historical data exists
-        if input_data.get('past_yield_kgs', 0) > 0 and input_data.get('past_yield_mk', 0) > 0:
-            confidence = min(0.9, confidence + 0.2)
-        
-        # Lower confidence for very large loans
-        if prediction > 1000000:  # 1 million MWK
-            confidence = max(0.5, confidence - 0.1)
-        
-        return round(confidence, 2)
+        """Heuristic confidence for models trained before prediction intervals"""
+        return round(float(heuristic_confidence(
+            input_data.get('past_yield_kgs', 0), input_data.get('past_yield_mk', 0), prediction
+        )), 2)
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the loaded model"""
         return {
             "model_path": self.model_path,
             "model_version": self.model_version,
+            "artifact_hash": self.handle.artifact_hash if self.handle else None,
             "model_loaded": self.model is not None,
-            "features_used": [
-                'loan_farm_size',
-                'loan_crop',
-                'past_yield_kgs',
-                'past_yield_mk',
-                'expected_yield_kgs',
-                'expected_yield_mk'
-            ],
+            "features_used": FEATURE_COLUMNS,
+            "canary": self.get_canary_info(),
+            "rollback_versions": [h.model_version for h in reversed(self.previous_handles)],
             "last_loaded": datetime.now().isoformat()
         }
 
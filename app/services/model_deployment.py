@@ -1,15 +1,22 @@
 import asyncio
+from collections import deque
 from datetime import datetime
+import json
 import logging
-import os
-from pathlib import Path
 import time
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
 from app.config.ml_deployment import ModelDeploymentConfig
 import schedule
 import threading
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.services.ml_model import ModelService
+from app.config.database import SessionLocal
+from app.services.artifact_store import artifact_store
+from app.services.ml_model import FEATURE_COLUMNS, ModelHandle, load_artifact_handle, model_service
+from app.services.prediction_intervals import predict_with_interval
+from app.utils.accuracy_tracker import accuracy_tracker
 from app.utils.model_monitor import model_monitor
 
 # Configure logging
@@ -17,7 +24,6 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 config = ModelDeploymentConfig()
-model_service = ModelService()
 class ModelDeploymentManager:
     """Manage model deployment lifecycle"""
     
@@ -25,6 +31,7 @@ class ModelDeploymentManager:
         self.is_running = False
         self.scheduler_thread = None
         self.config = config
+        self.deployment_history: deque = deque(maxlen=20)
     
     def start_monitoring(self):
         """Start background monitoring tasks"""
@@ -36,11 +43,27 @@ class ModelDeploymentManager:
                 self._scheduled_health_check
             )
             
-            # Schedule model performance cleanup
-            schedule.every().day.at("02:00").do(
-                self._cleanup_old_predictions
+            # Schedule archival of applications past the retention window
+            schedule.every().day.at(config.ARCHIVE_TIME).do(
+                self._scheduled_archive
             )
             
+            # Schedule creation of upcoming monthly partitions
+            schedule.every().day.at("01:00").do(
+                self._scheduled_partition_maintenance
+            )
+            
+            # Schedule scoring of applications missing predictions
+            schedule.every(config.BACKFILL_INTERVAL_MINUTES).minutes.do(
+                self._scheduled_backfill
+            )
+            
+            # Schedule incremental retraining
+            if config.RETRAIN_ENABLED:
+                schedule.every().day.at(config.RETRAIN_TIME).do(
+                    self._scheduled_retrain
+                )
+            
             # Start scheduler thread
             self.scheduler_thread = threading.Thread(target=self._run_scheduler)
             self.scheduler_thread.daemon = True
@@ -70,69 +93,226 @@ class ModelDeploymentManager:
             health_status = model_monitor.check_health()
             if health_status["status"] != "healthy":
                 logger.warning(f"Health check warning: {health_status}")
+            self._check_canary_accuracy()
         except Exception as e:
             logger.error(f"Error in scheduled health check: {str(e)}")
     
-    def _cleanup_old_predictions(self):
-        """Clean up old prediction records"""
+    def _scheduled_retrain(self):
+        """Start a retraining run in its own thread so health checks keep running"""
+        from app.services.retraining import retraining_job
+        
+        if not retraining_job.start():
+            logger.info("Skipping scheduled retraining: a run is already in progress")
+    
+    def _scheduled_backfill(self):
+        """Score queued and newly missing predictions in a background thread"""
+        from app.services.prediction_backfill import prediction_backfill
+        
+        prediction_backfill.start()
+    
+    def _check_canary_accuracy(self):
+        """Demote the canary if its error against approved amounts is worse than stable"""
+        canary = model_service.get_canary_info()
+        if canary is None:
+            return
+        
+        db = SessionLocal()
         try:
-            # This would connect to database and clean up old records
-            # Implementation depends on your data retention policy
-            logger.info("Prediction cleanup task executed")
+            by_version = accuracy_tracker.get_summary(db, window_months=1)["by_model_version"]
+        finally:
+            db.close()
+        
+        canary_accuracy = by_version.get(canary["model_version"])
+        stable_accuracy = by_version.get(model_service.model_version)
+        if not canary_accuracy or not stable_accuracy:
+            return
+        if min(canary_accuracy["samples"], stable_accuracy["samples"]) < config.CANARY_MIN_APPROVED_SAMPLES:
+            return
+        
+        if canary_accuracy["mape"] > stable_accuracy["mape"] + config.CANARY_MAX_MAPE_INCREASE:
+            model_service.stop_canary(
+                f"auto-demoted: MAPE {canary_accuracy['mape']:.2%} vs stable {stable_accuracy['mape']:.2%}"
+            )
+    
+    def _scheduled_partition_maintenance(self):
+        """Create monthly partitions for the coming months"""
+        from app.model_development.partitioning import ensure_partitions
+        
+        try:
+            created = ensure_partitions()
+            if created:
+                logger.info(f"Created partitions: {', '.join(created)}")
         except Exception as e:
-            logger.error(f"Error in prediction cleanup: {str(e)}")
+            logger.error(f"Error in partition maintenance: {str(e)}")
+    
+    def _scheduled_archive(self):
+        """Archive decided applications older than the retention window in a background thread"""
+        from app.services.history_archive import history_archiver
+        
+        if not history_archiver.start():
+            logger.info("Skipping scheduled history archive: a run is already in progress")
     
-    def deploy_new_model(self, model_path: str):
-        """Deploy a new model version"""
+    def _validate_candidate(self, candidate: ModelHandle) -> Dict[str, Any]:
+        """Score the golden input set with the candidate and check outputs and latency"""
+        with open(config.GOLDEN_INPUTS_PATH) as f:
+            features = pd.DataFrame(json.load(f), columns=FEATURE_COLUMNS)
+        
+        predictions = np.asarray(candidate.model.predict(features), dtype=float)
+        # Time the serving path, which includes the prediction interval if the model has one
+        latencies = []
+        for i in range(len(features)):
+            start_time = time.perf_counter()
+            predict_with_interval(candidate.model, features.iloc[[i]])
+            latencies.append((time.perf_counter() - start_time) * 1000)
+        p95_latency_ms = float(np.percentile(latencies, 95))
+        
+        problems = []
+        if not np.all(np.isfinite(predictions)):
+            problems.append("candidate returned non-finite predictions")
+        elif predictions.max() > config.GOLDEN_MAX_PREDICTION_MWK:
+            problems.append(f"candidate predicted {predictions.max():,.0f} MWK, above the sanity ceiling")
+        if p95_latency_ms > config.MODEL_LATENCY_BUDGET_MS:
+            problems.append(
+                f"p95 latency {p95_latency_ms:.1f}ms exceeds budget of {config.MODEL_LATENCY_BUDGET_MS}ms"
+            )
+        
+        median_deviation = None
+        live = model_service.handle
+        if live is not None and np.all(np.isfinite(predictions)):
+            live_predictions = np.asarray(live.model.predict(features), dtype=float)
+            median_deviation = float(np.median(
+                np.abs(predictions - live_predictions) / np.maximum(np.abs(live_predictions), 1.0)
+            ))
+            if median_deviation > config.GOLDEN_MAX_MEDIAN_DEVIATION:
+                problems.append(f"median deviation from live model is {median_deviation:.0%}")
+        
+        return {
+            "passed": not problems,
+            "problems": problems,
+            "golden_inputs": len(features),
+            "p95_latency_ms": p95_latency_ms,
+            "median_deviation": median_deviation
+        }
+    
+    def _store_live_model(self) -> Optional[str]:
+        """Make sure the live version is in the artifact store so it can be restored after a restart"""
+        live = model_service.handle
+        if live is None:
+            return None
+        if live.artifact_hash is None:
+            artifact_hash = artifact_store.put_file(live.model_path)["hash"]
+            artifact_store.set_current(artifact_hash)
+            return artifact_hash
+        return live.artifact_hash
+    
+    def deploy_new_model(self, version: str = None, model_path: str = None) -> Dict[str, Any]:
+        """Deploy a model version in stages: load, validate, then swap.
+        
+        The version is an artifact store hash (or unique prefix); a model_path is
+        imported into the store first. The live model keeps serving until the
+        final swap, and nothing is swapped unless the candidate passes validation.
+        """
+        report = {
+            "version": version,
+            "model_path": model_path,
+            "success": False,
+            "stages": [],
+            "started_at": datetime.now()
+        }
+        
+        def record_stage(stage: str, started: float, **details):
+            report["stages"].append({
+                "stage": stage,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                **details
+            })
+        
         try:
-            # Backup current model
-            backup_path = f"{config.MODEL_BACKUP_PATH}/backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pkl"
+            started = time.perf_counter()
+            if model_path is not None:
+                version = artifact_store.put_file(model_path)["hash"]
+            candidate = load_artifact_handle(version)
+            record_stage(
+                "load",
+                started,
+                model_version=candidate.model_version,
+                artifact_hash=candidate.artifact_hash,
+                **(artifact_store.load_stats.get(candidate.artifact_hash) or {})
+            )
             
-            # Create backup directory if it doesn't exist
-            os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+            started = time.perf_counter()
+            validation = self._validate_candidate(candidate)
+            record_stage("validate", started, **validation)
+            if not validation["passed"]:
+                report["error"] = "Candidate failed validation"
+                report["rejected"] = True
+                logger.warning(f"Model {candidate.model_version} rejected: {validation['problems']}")
+                return report
             
-            # Copy current model to backup
-            if os.path.exists(config.MODEL_PATH):
-                import shutil
-                shutil.copy2(config.MODEL_PATH, backup_path)
-                logger.info(f"Current model backed up to {backup_path}")
-      
-            # Load new model
-            model_service.reload_model(model_path)
+            started = time.perf_counter()
+            previous_hash = self._store_live_model()
+            previous_version = model_service.model_version
+            model_service.activate(candidate)
+            model_service.stop_canary("replaced by deployment")
             
             # Reset metrics for new model
             model_monitor.reset_metrics()
+            record_stage("swap", started, previous_version=previous_version, previous_hash=previous_hash)
             
-            logger.info(f"New model deployed successfully from {model_path}")
-            return True
+            report["success"] = True
+            report["model_version"] = candidate.model_version
+            logger.info(f"Model {candidate.model_version} deployed successfully")
+            self._rescore_portfolio()
+            return report
             
         except Exception as e:
             logger.error(f"Error deploying new model: {str(e)}")
-            return False
+            report["error"] = str(e)
+            return report
+        finally:
+            self.deployment_history.append(report)
+    
+    def _rescore_portfolio(self):
+        """Bring stored predictions of pending applications in line with the new live model"""
+        if not config.RESCORE_AFTER_DEPLOY:
+            return
+        from app.services.portfolio_rescoring import portfolio_rescorer
+        
+        # A run already in progress notices the new model and restarts for it
+        portfolio_rescorer.start(resume=False)
     
-    def rollback_model(self):
-        """Rollback to previous model version"""
+    def rollback_model(self, version: str = None) -> Dict[str, Any]:
+        """Rollback to the previous model version, or to the version with the given hash.
+        
+        Versions still cached in memory swap back instantly; otherwise the
+        artifact is loaded from the store.
+        """
         try:
-            backup_dir = Path(config.MODEL_BACKUP_PATH)
-            if backup_dir.exists():
-                # Get most recent backup
-                backups = sorted(backup_dir.glob("backup_*.pkl"), key=lambda x: x.stat().st_mtime, reverse=True)
-                
-                if backups:
-                    latest_backup = backups[0]
-                    model_service.reload_model(str(latest_backup))
-                    logger.info(f"Model rolled back to {latest_backup}")
-                    return True
-                else:
-                    logger.error("No backup models found for rollback")
-                    return False
+            handle = model_service.rollback(version)
+            if handle is not None:
+                model_monitor.reset_metrics()
+                logger.info(f"Model rolled back to {handle.model_version} from memory")
+                self._rescore_portfolio()
+                return {"success": True, "model_version": handle.model_version, "source": "memory"}
+            
+            # Not cached in this process (e.g. after a restart): load from the artifact store
+            if version is None:
+                version = artifact_store.previous()
+                if version is None:
+                    logger.error("No previous model version in the artifact store")
+                    return {"success": False, "error": "No previous model version available"}
+                model_service.activate(load_artifact_handle(version), keep_previous=False)
             else:
-                logger.error("Backup directory not found")
-                return False
+                model_service.activate(load_artifact_handle(version))
+            model_service.stop_canary("replaced by rollback")
+            model_monitor.reset_metrics()
+            logger.info(f"Model rolled back to {model_service.model_version} from the artifact store")
+            self._rescore_portfolio()
+            return {"success": True, "model_version": model_service.model_version, "source": "store"}
                 
         except Exception as e:
             logger.error(f"Error rolling back model: {str(e)}")
-            return False
+            return {"success": False, "error": str(e)}
 
 # Initialize deployment manager
 deployment_manager = ModelDeploymentManager()
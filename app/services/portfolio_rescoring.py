@@ -0,0 +1,234 @@
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config.database import engine
+from app.config.ml_deployment import ml_config as config
+from app.services.batch_scoring import COMPLETE_INPUTS, load_features, score_features, write_predictions
+from app.services.ml_model import ModelHandle, load_model_handle, model_service
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "portfolio_rescore_checkpoint"
+FIRST_ID = "00000000-0000-0000-0000-000000000000"
+# The status list matches the predicate of ix_loan_applications_pending_id
+PENDING_FILTER = """
+    la.status IN ('SUBMITTED', 'UNDER_REVIEW')
+    AND la.id > CAST(:after_id AS uuid)
+    AND la.model_version IS DISTINCT FROM :model_version
+    AND
+""" + COMPLETE_INPUTS
+
+# Keyset pagination on the id: each chunk starts after the last id of the
+# previous one, so every chunk is a range scan of the partial index however
+# far into the portfolio it is
+CHUNK_QUERY = text(
+    "SELECT la.id::text AS id, la.application_date FROM loan_applications la WHERE" + PENDING_FILTER
+    + "ORDER BY la.id LIMIT :chunk_size"
+)
+
+COUNT_QUERY = text("SELECT count(*) FROM loan_applications la WHERE" + PENDING_FILTER)
+
+CHECKPOINT_QUERY = text("""
+    INSERT INTO system_settings (id, key, value, description, last_updated)
+    VALUES (gen_random_uuid(), :key, :value, 'Progress of the last portfolio re-score', now())
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, last_updated = now()
+""")
+
+READ_CHECKPOINT_QUERY = text("SELECT value FROM system_settings WHERE key = :key")
+
+# Model loaded once per pool process
+_worker_handle: Optional[ModelHandle] = None
+
+
+def _load_worker_model(model_path: str, model_version: str):
+    global _worker_handle
+    _worker_handle = load_model_handle(model_path, model_version)
+
+
+def _score_in_worker(features: pd.DataFrame) -> pd.DataFrame:
+    return score_features(_worker_handle, features)
+
+
+class PortfolioRescorer:
+    """Re-score every pending application with the live model, e.g. after a deployment.
+
+    Applications are streamed in keyset chunks and written back one UPDATE per
+    chunk. The last written id is checkpointed in system_settings in the same
+    transaction as the chunk, so an interrupted run resumes where it stopped.
+    With workers > 1, chunks are scored in a process pool while the next chunk
+    is read and the previous one written.
+    """
+
+    def __init__(self, bind: Engine = engine):
+        self.bind = bind
+        self.progress: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        with self.bind.connect() as conn:
+            value = conn.execute(READ_CHECKPOINT_QUERY, {"key": CHECKPOINT_KEY}).scalar()
+        return json.loads(value) if value else None
+
+    def _write_checkpoint(self, conn, progress: Dict[str, Any]):
+        conn.execute(CHECKPOINT_QUERY, {"key": CHECKPOINT_KEY, "value": json.dumps(progress)})
+
+    def start(self, resume: bool = True, workers: int = None) -> bool:
+        """Run in a background thread. Returns False if a run is already in progress."""
+        # Taken here and released by the thread, so two callers cannot both start a run
+        if not self._lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(
+            target=self._run_locked, kwargs={"resume": resume, "workers": workers}, name="portfolio-rescore"
+        )
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def run(self, resume: bool = True, workers: int = None) -> Optional[Dict[str, Any]]:
+        """Re-score until no pending application is left on an older model version.
+
+        If another model goes live mid-run, the run starts over for the new version.
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.info("Portfolio re-score already in progress, skipping")
+            return None
+        return self._run_locked(resume, workers)
+
+    def _run_locked(self, resume: bool, workers: Optional[int]) -> Optional[Dict[str, Any]]:
+        try:
+            while True:
+                handle = model_service.handle
+                if handle is None:
+                    raise RuntimeError("No model loaded")
+                progress = self._rescore(handle, resume, workers or config.RESCORE_WORKERS)
+                if progress["status"] != "superseded":
+                    return progress
+                resume = False
+        except Exception as e:
+            logger.error(f"Portfolio re-score failed: {str(e)}")
+            if self.progress is not None:
+                self.progress["status"] = "failed"
+                self.progress["error"] = str(e)
+            return self.progress
+        finally:
+            self._lock.release()
+
+    def _rescore(self, handle: ModelHandle, resume: bool, workers: int) -> Dict[str, Any]:
+        checkpoint = self.read_checkpoint() if resume else None
+        if not (
+            checkpoint
+            and checkpoint["status"] in ("running", "failed")
+            and checkpoint["model_version"] == handle.model_version
+        ):
+            checkpoint = None
+
+        after_id = checkpoint["last_id"] if checkpoint else FIRST_ID
+        already_scored = checkpoint["scored"] if checkpoint else 0
+        # Checkpoints written before skipped rows were counted have no "skipped"
+        already_skipped = checkpoint.get("skipped", 0) if checkpoint else 0
+        params = {"model_version": handle.model_version}
+        with self.bind.connect() as conn:
+            remaining = conn.execute(COUNT_QUERY, {**params, "after_id": after_id}).scalar()
+
+        progress = self.progress = {
+            "model_version": handle.model_version,
+            "status": "running",
+            "started_at": checkpoint["started_at"] if checkpoint else datetime.now().isoformat(),
+            "resumed_from": checkpoint["last_id"] if checkpoint else None,
+            "last_id": after_id,
+            "scored": already_scored,
+            "skipped": already_skipped,
+            "total": already_scored + already_skipped + remaining,
+            "workers": workers,
+            "rows_per_second": None,
+            "eta_seconds": None
+        }
+        logger.info(f"Re-scoring {remaining} pending applications with model {handle.model_version}")
+
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_worker_model,
+                initargs=(handle.model_path, handle.model_version)
+            )
+        start_time = time.perf_counter()
+        scored_this_run = 0
+        skipped_this_run = 0
+        in_flight: deque = deque()
+        try:
+            while True:
+                if model_service.handle is not handle:
+                    progress["status"] = "superseded"
+                    break
+
+                with self.bind.connect() as conn:
+                    chunk = conn.execute(CHUNK_QUERY, {
+                        **params, "after_id": after_id, "chunk_size": config.RESCORE_CHUNK_SIZE
+                    }).all()
+                    ids = [row.id for row in chunk]
+                    dates = [row.application_date for row in chunk]
+                    features = load_features(conn, ids, dates) if ids else None
+                if ids:
+                    after_id = ids[-1]
+                    scored = pool.submit(_score_in_worker, features) if pool else score_features(handle, features)
+                    in_flight.append((after_id, dates, scored))
+
+                # Keep up to `workers` chunks scoring; write them back in keyset order
+                while in_flight and (not ids or len(in_flight) >= workers):
+                    last_id, chunk_dates, scored = in_flight.popleft()
+                    scored = scored.result() if pool else scored
+                    with self.bind.begin() as conn:
+                        updated = write_predictions(conn, scored, handle.model_version, chunk_dates)
+                        # Applications decided since their features were read are not written
+                        scored_this_run += updated
+                        skipped_this_run += len(scored) - updated
+                        progress["scored"] = already_scored + scored_this_run
+                        progress["skipped"] = already_skipped + skipped_this_run
+                        progress["last_id"] = last_id
+                        self._write_checkpoint(conn, progress)
+
+                    elapsed = time.perf_counter() - start_time
+                    done_this_run = scored_this_run + skipped_this_run
+                    progress["rows_per_second"] = round(done_this_run / elapsed, 1)
+                    progress["eta_seconds"] = round((remaining - done_this_run) / max(done_this_run / elapsed, 1e-9), 1)
+
+                if not ids:
+                    progress["status"] = "completed"
+                    break
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+            progress["seconds"] = round(time.perf_counter() - start_time, 2)
+            if progress["status"] == "running":
+                progress["status"] = "failed"
+            with self.bind.begin() as conn:
+                self._write_checkpoint(conn, progress)
+
+        logger.info(
+            f"Portfolio re-score {progress['status']}: {scored_this_run} applications in "
+            f"{progress['seconds']}s ({progress['rows_per_second']} rows/s), {skipped_this_run} skipped"
+        )
+        return progress
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "running": self._lock.locked(),
+            "progress": self.progress or self.read_checkpoint()
+        }
+
+
+# Initialize portfolio re-scorer
+portfolio_rescorer = PortfolioRescorer()
@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config.database import engine
+from app.config.ml_deployment import ml_config as config
+from app.models.db_models import ApplicationStatus
+from app.services.batch_scoring import load_features, score_features, write_predictions
+from app.services.ml_model import model_service
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = [ApplicationStatus.SUBMITTED.name, ApplicationStatus.UNDER_REVIEW.name]
+
+ENQUEUE_QUERY = text("""
+    INSERT INTO prediction_jobs (application_id, application_date, reason, enqueued_at, attempts)
+    SELECT la.id, la.application_date, CASE WHEN la.predicted_amount_mwk IS NULL THEN 'missing' ELSE 'stale' END, now(), 0
+    FROM loan_applications la
+    WHERE la.status::text = ANY(:statuses)
+      AND (
+          la.predicted_amount_mwk IS NULL
+          OR (CAST(:include_stale AS BOOLEAN) AND la.model_version IS DISTINCT FROM :live_version)
+      )
+    ON CONFLICT (application_id) DO NOTHING
+""")
+
+# Rows locked by another worker are skipped rather than waited on, so any
+# number of workers can drain the queue without claiming the same job
+CLAIM_QUERY = text("""
+    SELECT application_id::text, application_date
+    FROM prediction_jobs
+    WHERE attempts < :max_attempts
+    ORDER BY enqueued_at
+    LIMIT :chunk_size
+    FOR UPDATE SKIP LOCKED
+""")
+
+COMPLETE_QUERY = text("DELETE FROM prediction_jobs WHERE application_id = ANY(CAST(:ids AS uuid[]))")
+
+FAIL_QUERY = text("""
+    UPDATE prediction_jobs
+    SET attempts = attempts + 1, last_error = :error
+    WHERE application_id = ANY(CAST(:ids AS uuid[]))
+""")
+
+QUEUE_QUERY = text("""
+    SELECT reason, count(*) AS queued, count(*) FILTER (WHERE attempts >= :max_attempts) AS failed
+    FROM prediction_jobs
+    GROUP BY reason
+""")
+
+
+class PredictionBackfillWorker:
+    """Score applications that are missing predictions, or were scored by an older model.
+
+    Work is queued in the prediction_jobs table. Each chunk is claimed, scored
+    in one model call, written back with one UPDATE and removed from the queue
+    in a single transaction, so a crashed worker simply releases its claim.
+    """
+
+    def __init__(self, bind: Engine = engine):
+        self.bind = bind
+        self.current_run: Optional[Dict[str, Any]] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, include_stale: bool = False) -> int:
+        """Queue pending applications without a prediction, and optionally those from other model versions"""
+        live = model_service.handle
+        with self.bind.begin() as conn:
+            result = conn.execute(ENQUEUE_QUERY, {
+                "statuses": PENDING_STATUSES,
+                "include_stale": include_stale,
+                "live_version": live.model_version if live else None
+            })
+        return result.rowcount
+
+    def process_chunk(self) -> Dict[str, int]:
+        """Claim, score and write back one chunk; returns counts, all zero when the queue is empty"""
+        handle = model_service.handle
+        if handle is None:
+            raise RuntimeError("No model loaded")
+
+        ids = []
+        try:
+            with self.bind.begin() as conn:
+                jobs = conn.execute(CLAIM_QUERY, {
+                    "max_attempts": config.BACKFILL_MAX_ATTEMPTS,
+                    "chunk_size": config.BACKFILL_CHUNK_SIZE
+                }).all()
+                ids = [job.application_id for job in jobs]
+                if not ids:
+                    return {"claimed": 0, "scored": 0, "skipped": 0}
+
+                # Jobs queued before application_date was recorded leave the lookup unbounded
+                dates = [job.application_date for job in jobs]
+                features = load_features(conn, ids, dates)
+                scored = score_features(handle, features) if len(features) else features
+                updated = write_predictions(conn, scored, handle.model_version, dates)
+                # Jobs for applications that cannot be scored are dropped with the rest
+                conn.execute(COMPLETE_QUERY, {"ids": ids})
+            # Rows scored but not written belong to applications decided in the meantime
+            return {"claimed": len(ids), "scored": updated, "skipped": len(scored) - updated}
+
+        except Exception as e:
+            if not ids:
+                raise
+            logger.error(f"Backfill chunk of {len(ids)} applications failed: {str(e)}")
+            with self.bind.begin() as conn:
+                conn.execute(FAIL_QUERY, {"ids": ids, "error": str(e)[:1000]})
+            return {"claimed": len(ids), "scored": 0, "skipped": 0, "failed": len(ids)}
+
+    def run(self, include_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """Queue work, then drain the queue chunk by chunk"""
+        if not self._lock.acquire(blocking=False):
+            logger.info("Prediction backfill already in progress, skipping")
+            return None
+        return self._run_locked(include_stale)
+
+    def _run_locked(self, include_stale: bool) -> Dict[str, Any]:
+        run = {
+            "started_at": datetime.now().isoformat(),
+            "include_stale": include_stale,
+            "enqueued": 0,
+            "chunks": 0,
+            "scored": 0,
+            "skipped": 0,
+            "failed": 0
+        }
+        self.current_run = run
+        start_time = time.perf_counter()
+        try:
+            run["enqueued"] = self.enqueue(include_stale)
+            while True:
+                counts = self.process_chunk()
+                if not counts["claimed"]:
+                    break
+                run["chunks"] += 1
+                run["scored"] += counts["scored"]
+                run["skipped"] += counts["skipped"]
+                run["failed"] += counts.get("failed", 0)
+            run["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Prediction backfill failed: {str(e)}")
+            run["status"] = "failed"
+            run["error"] = str(e)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            run["seconds"] = round(elapsed, 2)
+            run["rows_per_second"] = round(run["scored"] / elapsed, 1) if elapsed > 0 else None
+            run["finished_at"] = datetime.now().isoformat()
+            if run["scored"] or run["skipped"] or run["failed"]:
+                logger.info(
+                    f"Prediction backfill scored {run['scored']} applications in {run['seconds']}s, "
+                    f"skipped {run['skipped']} decided while being scored"
+                )
+            self.last_run = run
+            self.current_run = None
+            self._lock.release()
+        return run
+
+    def start(self, include_stale: bool = False) -> bool:
+        """Run in a background thread. Returns False if a run is already in progress."""
+        # Taken here and released by the thread, so two callers cannot both start a run
+        if not self._lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(
+            target=self._run_locked, kwargs={"include_stale": include_stale}, name="prediction-backfill"
+        )
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.bind.connect() as conn:
+            queue = {
+                row.reason: {"queued": row.queued, "failed": row.failed}
+                for row in conn.execute(QUEUE_QUERY, {"max_attempts": config.BACKFILL_MAX_ATTEMPTS})
+            }
+        return {
+            "schedule": f"every {config.BACKFILL_INTERVAL_MINUTES} minutes",
+            "queue": queue,
+            "running": self.current_run is not None,
+            "current_run": self.current_run,
+            "last_run": self.last_run
+        }
+
+
+# Initialize prediction backfill worker
+prediction_backfill = PredictionBackfillWorker()
@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config.ml_deployment import ml_config as config
+from app.model_development.feature_extraction import extract_features
+from app.services.ml_model import model_service
+
+logger = logging.getLogger(__name__)
+
+
+def _lower_priority():
+    os.nice(config.RETRAIN_NICENESS)
+
+
+class RetrainingJob:
+    """Incrementally extract new approvals, retrain off-process and promote if better.
+
+    Promotion goes through ModelDeploymentManager.deploy_new_model, so the
+    candidate still has to pass the golden-set validation gate.
+    """
+
+    def __init__(self, history_path: str = config.RETRAIN_HISTORY_PATH):
+        self.history_path = history_path
+        self.history: deque = deque(self._load_history(), maxlen=config.RETRAIN_HISTORY_SIZE)
+        self.current_run: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _load_history(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.history_path):
+            return []
+        with open(self.history_path) as f:
+            return [json.loads(line) for line in f if line.strip()][-config.RETRAIN_HISTORY_SIZE:]
+
+    def _record(self, run: Dict[str, Any]):
+        self.history.append(run)
+        os.makedirs(os.path.dirname(self.history_path) or ".", exist_ok=True)
+        with open(self.history_path, "a") as f:
+            f.write(json.dumps(run, default=str) + "\n")
+
+    def start(self, force: bool = False) -> bool:
+        """Run in a background thread. Returns False if a run is already in progress."""
+        # Taken here and released by the thread, so two callers cannot both start a run
+        if not self._lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._run_locked, kwargs={"force": force}, name="model-retraining")
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def run(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """One retraining cycle: extract, train and compare, then promote or reject"""
+        if not self._lock.acquire(blocking=False):
+            logger.info("Retraining already in progress, skipping")
+            return None
+        return self._run_locked(force)
+
+    def _run_locked(self, force: bool) -> Dict[str, Any]:
+        run = {"started_at": datetime.now().isoformat(), "status": "running", "forced": force, "timings": {}}
+        self.current_run = run
+        try:
+            started = time.perf_counter()
+            extraction = extract_features()
+            run["timings"]["extract_seconds"] = round(time.perf_counter() - started, 2)
+            run["new_rows"] = extraction["rows_appended"]
+            run["total_rows"] = extraction["total_rows"]
+
+            if not force and extraction["rows_appended"] < config.RETRAIN_MIN_NEW_ROWS:
+                run["status"] = "skipped"
+                run["reason"] = f"{extraction['rows_appended']} new labelled rows, need {config.RETRAIN_MIN_NEW_ROWS}"
+                return run
+            if extraction["total_rows"] < config.RETRAIN_MIN_TOTAL_ROWS:
+                run["status"] = "skipped"
+                run["reason"] = f"{extraction['total_rows']} labelled rows, need {config.RETRAIN_MIN_TOTAL_ROWS}"
+                return run
+
+            started = time.perf_counter()
+            result = self._train(extraction["output_dir"])
+            run["timings"]["train_process_seconds"] = round(time.perf_counter() - started, 2)
+            run["timings"].update(result.pop("timings"))
+            if "skipped" in result:
+                run["status"] = "skipped"
+                run["reason"] = result.pop("skipped")
+                run.update(result)
+                return run
+            run.update(result)
+
+            promote, reason = self._should_promote(result)
+            run["reason"] = reason
+            if not promote:
+                run["status"] = "rejected"
+                return run
+
+            from app.services.model_deployment import deployment_manager
+
+            started = time.perf_counter()
+            report = deployment_manager.deploy_new_model(version=result["artifact_hash"])
+            run["timings"]["deploy_seconds"] = round(time.perf_counter() - started, 2)
+            run["status"] = "promoted" if report["success"] else "rejected"
+            if not report["success"]:
+                problems = [p for stage in report["stages"] for p in stage.get("problems", [])]
+                run["reason"] = f"deployment gate: {'; '.join(problems) or report.get('error')}"
+            return run
+
+        except Exception as e:
+            logger.error(f"Retraining failed: {str(e)}")
+            run["status"] = "failed"
+            run["reason"] = str(e)
+            return run
+        finally:
+            run["finished_at"] = datetime.now().isoformat()
+            logger.info(f"Retraining run {run['status']}: {run.get('reason')}")
+            self._record(run)
+            self.current_run = None
+            self._lock.release()
+
+    def _train(self, data_dir: str) -> Dict[str, Any]:
+        """Train and evaluate in a low-priority subprocess and read back its result"""
+        live = model_service.handle
+        if live is None:
+            raise RuntimeError("No live model to compare against")
+
+        fd, result_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        command = [
+            sys.executable, "-m", "app.model_development.retrain",
+            "--data", data_dir,
+            "--live-model", live.model_path,
+            "--result", result_path,
+            "--n-jobs", str(config.RETRAIN_N_JOBS),
+        ]
+        if live.artifact_hash:
+            command += ["--live-version", live.artifact_hash]
+        if config.RETRAIN_FULL_SEARCH:
+            command.append("--search")
+
+        try:
+            completed = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                timeout=config.RETRAIN_TIMEOUT_SECONDS,
+                preexec_fn=_lower_priority if hasattr(os, "nice") else None
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(f"Training process exited with {completed.returncode}: {completed.stderr[-2000:]}")
+            with open(result_path) as f:
+                return json.load(f)
+        finally:
+            os.remove(result_path)
+
+    def _should_promote(self, result: Dict[str, Any]):
+        candidate, live = result["candidate"], result["live"]
+        if candidate["interval_p95_latency_ms"] > config.MODEL_LATENCY_BUDGET_MS:
+            return False, f"candidate p95 latency {candidate['interval_p95_latency_ms']:.1f}ms is over budget"
+        required_mae = live["mae"] * (1 - config.RETRAIN_MIN_IMPROVEMENT)
+        if candidate["mae"] >= required_mae:
+            return False, f"holdout MAE {candidate['mae']:,.0f} vs live {live['mae']:,.0f}, not enough improvement"
+        return True, f"holdout MAE {candidate['mae']:,.0f} vs live {live['mae']:,.0f}"
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": config.RETRAIN_ENABLED,
+            "schedule": f"daily at {config.RETRAIN_TIME}",
+            "running": self.current_run is not None,
+            "current_run": self.current_run,
+            "history": list(reversed(self.history))
+        }
+
+
+# Initialize retraining job
+retraining_job = RetrainingJob()
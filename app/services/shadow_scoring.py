@@ -0,0 +1,213 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal
+from app.config.ml_deployment import ml_config as config
+from app.models.db_models import ShadowPrediction
+from app.services.ml_model import FEATURE_COLUMNS, ModelHandle, load_artifact_handle, load_model_handle
+from app.services.prediction_intervals import predict_with_interval
+
+logger = logging.getLogger(__name__)
+
+SHADOW_REPORT_QUERY = text("""
+    SELECT
+        sp.candidate_version,
+        COUNT(*) AS scored,
+        AVG(sp.shadow_amount_mwk - sp.live_amount_mwk) AS mean_delta,
+        AVG(ABS(sp.shadow_amount_mwk - sp.live_amount_mwk)) AS mean_abs_delta,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY sp.live_latency_ms) AS live_p50_ms,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY sp.live_latency_ms) AS live_p95_ms,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY sp.shadow_latency_ms) AS shadow_p50_ms,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY sp.shadow_latency_ms) AS shadow_p95_ms,
+        COUNT(la.approved_amount_mwk) AS approved,
+        AVG(ABS(sp.live_amount_mwk - la.approved_amount_mwk)) AS live_mae,
+        AVG(ABS(sp.shadow_amount_mwk - la.approved_amount_mwk)) AS shadow_mae
+    FROM shadow_predictions sp
+    LEFT JOIN loan_applications la ON la.id = sp.application_id
+    WHERE CAST(:candidate_version AS VARCHAR) IS NULL OR sp.candidate_version = :candidate_version
+    GROUP BY sp.candidate_version
+    ORDER BY MAX(sp.created_at) DESC
+""")
+
+
+def _as_float(value: Optional[Any]) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+class ShadowScorer:
+    """Score live inputs with a candidate model off the request path.
+
+    Requests only enqueue work (dropping it when the bounded queue is full); a
+    background thread drains it in batches, scores each input on its own and
+    records deltas and per-request latency.
+    """
+
+    def __init__(self):
+        self.handle: Optional[ModelHandle] = None
+        self.candidate_version: Optional[str] = None
+        self.candidate_path: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=config.SHADOW_QUEUE_SIZE)
+        self.worker_thread: Optional[threading.Thread] = None
+        self.is_running = False
+        self.scored_count = 0
+        self.dropped_count = 0
+        self.error_count = 0
+
+    def start(self, model_path: str = None, candidate_version: Optional[str] = None, version: str = None):
+        """Load a candidate and start shadow scoring.
+
+        The candidate is a model file (pickle or compact tree) or an artifact
+        store hash, loaded the same way the live model is.
+        """
+        if (version is None) == (model_path is None):
+            raise ValueError("Provide exactly one of version or model_path")
+        if version is not None:
+            handle = load_artifact_handle(version)
+        else:
+            handle = load_model_handle(model_path, candidate_version or os.path.basename(model_path))
+
+        self.stop()
+        self.handle = handle
+        self.candidate_path = handle.model_path
+        self.candidate_version = handle.model_version
+        self.started_at = datetime.now()
+        self.scored_count = 0
+        self.dropped_count = 0
+        self.error_count = 0
+
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self._run_worker, name="shadow-scorer")
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+        logger.info(f"Shadow scoring started for candidate {self.candidate_version}")
+
+    def stop(self):
+        """Stop shadow scoring, discarding any queued work"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self.worker_thread:
+            self.worker_thread.join(timeout=5)
+        self.handle = None
+        with self.queue.mutex:
+            self.queue.queue.clear()
+        logger.info(f"Shadow scoring stopped for candidate {self.candidate_version}")
+
+    def submit(self, application_id, input_data: Dict[str, Any], live_result: Dict[str, Any]):
+        """Queue an input the live model has scored. Never blocks the caller."""
+        if not self.is_running:
+            return
+        try:
+            self.queue.put_nowait({
+                "application_id": application_id,
+                "features": {f: input_data[f] for f in FEATURE_COLUMNS},
+                "live_version": live_result.get("model_version"),
+                "live_amount_mwk": live_result["predicted_amount_mwk"],
+                "live_latency_ms": live_result.get("latency_ms")
+            })
+        except queue.Full:
+            self.dropped_count += 1
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        while len(batch) < config.SHADOW_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_worker(self):
+        while self.is_running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._score_batch(batch)
+            except Exception as e:
+                self.error_count += len(batch)
+                logger.error(f"Shadow scoring batch failed: {str(e)}")
+
+    def _score_batch(self, batch: List[Dict[str, Any]]):
+        handle = self.handle
+        if handle is None:
+            return
+
+        rows = []
+        for item in batch:
+            # Scored one row at a time with the live serving call, so the latencies are comparable
+            start_time = time.perf_counter()
+            features = pd.DataFrame([item["features"]])
+            point, _, _ = predict_with_interval(handle.model, features)
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            prediction = point[0]
+            rows.append({
+                "application_id": item["application_id"],
+                "live_version": item["live_version"],
+                "candidate_version": self.candidate_version,
+                "live_amount_mwk": item["live_amount_mwk"],
+                "shadow_amount_mwk": max(0.0, float(prediction)),
+                "live_latency_ms": item["live_latency_ms"],
+                "shadow_latency_ms": latency_ms,
+                "created_at": datetime.now()
+            })
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(ShadowPrediction), rows)
+            db.commit()
+        finally:
+            db.close()
+        self.scored_count += len(rows)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "active": self.is_running,
+            "candidate_version": self.candidate_version,
+            "candidate_path": self.candidate_path,
+            "started_at": self.started_at,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": config.SHADOW_QUEUE_SIZE,
+            "scored": self.scored_count,
+            "dropped": self.dropped_count,
+            "errors": self.error_count
+        }
+
+    def get_report(self, db: Session, candidate_version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Compare candidate and live predictions, error vs approved amounts, and latency"""
+        rows = db.execute(SHADOW_REPORT_QUERY, {"candidate_version": candidate_version}).all()
+        return [
+            {
+                "candidate_version": row.candidate_version,
+                "scored": row.scored,
+                "mean_delta_mwk": _as_float(row.mean_delta),
+                "mean_abs_delta_mwk": _as_float(row.mean_abs_delta),
+                "latency_ms": {
+                    "live_p50": _as_float(row.live_p50_ms),
+                    "live_p95": _as_float(row.live_p95_ms),
+                    "shadow_p50": _as_float(row.shadow_p50_ms),
+                    "shadow_p95": _as_float(row.shadow_p95_ms)
+                },
+                "approved_samples": row.approved,
+                "live_mae_vs_approved": _as_float(row.live_mae),
+                "shadow_mae_vs_approved": _as_float(row.shadow_mae)
+            }
+            for row in rows
+        ]
+
+
+# Initialize shadow scorer
+shadow_scorer = ShadowScorer()
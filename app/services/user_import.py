@@ -0,0 +1,349 @@
+"""Bulk import of users from a CSV or XLSX file, e.g. when onboarding a cooperative.
+
+Rows are validated in one streaming pass over the file. Emails, phone numbers
+and national IDs are then checked against the database with one set-based
+query, passwords are hashed in a process pool, and the accepted rows are
+loaded with COPY into a temporary staging table and merged into users and
+farmer_profiles with a single statement. Problems are reported per row; rows
+with errors are skipped and the rest are imported.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import re
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from pytz import timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.db_models import UserRole
+from app.utils.auth_utils import generate_random_password, hash_password
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+PHONE_PATTERN = re.compile(r"^0\d{6,19}$")
+
+STAGING_COLUMNS = [
+    "row_number", "id", "email", "phone_number", "hashed_password", "first_name", "last_name", "role",
+    "district_id", "national_id", "date_of_birth", "address", "farm_location_gps", "farm_size_hectares"
+]
+
+CREATE_STAGING_QUERY = text("""
+    CREATE TEMP TABLE user_import_staging (
+        row_number integer,
+        id uuid,
+        email varchar(255),
+        phone_number varchar(20),
+        hashed_password varchar(255),
+        first_name varchar(100),
+        last_name varchar(100),
+        role text,
+        district_id uuid,
+        national_id varchar(50),
+        date_of_birth timestamp,
+        address text,
+        farm_location_gps varchar(50),
+        farm_size_hectares numeric(10, 2)
+    ) ON COMMIT DROP
+""")
+
+COPY_STAGING_SQL = f"COPY user_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# Duplicates checked up front can still be created by a concurrent request,
+# so conflicting rows are skipped rather than failing the whole import
+MERGE_QUERY = text("""
+    WITH inserted AS (
+        INSERT INTO users (
+            id, email, phone_number, hashed_password, first_name, last_name, role,
+            district_id, is_active, is_superuser, disability_status, created_at
+        )
+        SELECT id, email, phone_number, hashed_password, first_name, last_name, CAST(role AS userrole),
+               district_id, TRUE, FALSE, FALSE, :created_at
+        FROM user_import_staging
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    ), profiles AS (
+        INSERT INTO farmer_profiles (
+            id, user_id, national_id, date_of_birth, address, farm_location_gps, farm_size_hectares, is_new_applicant
+        )
+        SELECT gen_random_uuid(), s.id, s.national_id, s.date_of_birth, s.address, s.farm_location_gps,
+               s.farm_size_hectares, TRUE
+        FROM user_import_staging s
+        JOIN inserted i ON i.id = s.id
+        WHERE s.role = 'FARMER'
+        ON CONFLICT DO NOTHING
+        RETURNING user_id
+    )
+    SELECT s.row_number,
+           EXISTS (SELECT 1 FROM inserted i WHERE i.id = s.id) AS user_created,
+           EXISTS (SELECT 1 FROM profiles p WHERE p.user_id = s.id) AS profile_created,
+           s.role
+    FROM user_import_staging s
+""")
+
+EXISTING_QUERY = text("""
+    SELECT 'email' AS field, email AS value FROM users WHERE email = ANY(:emails)
+    UNION ALL
+    SELECT 'phone_number', phone_number FROM users WHERE phone_number = ANY(:phone_numbers)
+    UNION ALL
+    SELECT 'national_id', national_id FROM farmer_profiles WHERE national_id = ANY(:national_ids)
+""")
+
+DISTRICTS_QUERY = text("SELECT id::text, lower(name), lower(code) FROM districts")
+
+UNIQUE_FIELDS = {"email": "Email", "phone_number": "Phone number", "national_id": "National ID"}
+
+
+def _cell(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _header(name: Any) -> str:
+    return re.sub(r"\s+", "_", str(name or "").strip().lower())
+
+
+def read_rows(file: IO[bytes], file_format: str) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """(line number, row) for every non-empty data row, read without loading the whole file"""
+    if file_format == "csv":
+        reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    else:
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except zipfile.BadZipFile:
+            raise ValueError("Not a valid XLSX file")
+        reader = workbook.worksheets[0].iter_rows(values_only=True)
+
+    header = None
+    for line_number, values in enumerate(reader, start=1):
+        if header is None:
+            header = [_header(name) for name in values]
+            continue
+        row = {name: _cell(value) for name, value in zip(header, values) if name}
+        if any(row.values()):
+            yield line_number, row
+
+    if file_format != "csv":
+        workbook.close()
+
+
+class UserImporter:
+    """Validate and import users from a spreadsheet in bulk"""
+
+    def import_file(self, db: Session, file: IO[bytes], file_format: str, dry_run: bool = False) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        districts = {}
+        for district_id, name, code in db.execute(DISTRICTS_QUERY):
+            districts[district_id] = districts[name] = districts[code] = district_id
+
+        errors: List[Dict[str, Any]] = []
+        accepted: List[Dict[str, Any]] = []
+        first_seen: Dict[str, Dict[str, int]] = {field: {} for field in UNIQUE_FIELDS}
+        total_rows = 0
+
+        for line_number, row in read_rows(file, file_format):
+            total_rows += 1
+            if total_rows > settings.USER_IMPORT_MAX_ROWS:
+                raise ValueError(f"File has more than {settings.USER_IMPORT_MAX_ROWS} rows")
+
+            record, row_errors = self._validate(row, districts)
+            for field in UNIQUE_FIELDS:
+                value = record.get(field)
+                if value is None:
+                    continue
+                if value in first_seen[field]:
+                    row_errors.append((field, f"Duplicate of row {first_seen[field][value]}"))
+                else:
+                    first_seen[field][value] = line_number
+
+            if row_errors:
+                errors.extend({"row": line_number, "field": f, "message": m} for f, m in row_errors)
+            else:
+                record["row_number"] = line_number
+                accepted.append(record)
+
+        # One round trip for every email, phone number and national ID in the file
+        existing = db.execute(EXISTING_QUERY, {
+            "emails": list(first_seen["email"]),
+            "phone_numbers": list(first_seen["phone_number"]),
+            "national_ids": list(first_seen["national_id"]),
+        }).all()
+        taken = {(field, value) for field, value in existing}
+        if taken:
+            rows = []
+            for record in accepted:
+                conflicts = [f for f in UNIQUE_FIELDS if (f, record.get(f)) in taken]
+                if conflicts:
+                    errors.extend(
+                        {"row": record["row_number"], "field": f, "message": f"{UNIQUE_FIELDS[f]} already in use"}
+                        for f in conflicts
+                    )
+                else:
+                    rows.append(record)
+            accepted = rows
+        validated_at = time.perf_counter()
+
+        imported_rows = set()
+        profiles = 0
+        if accepted and not dry_run:
+            passwords = [record.pop("password") or generate_random_password() for record in accepted]
+            for record, hashed in zip(accepted, hash_passwords(passwords)):
+                record["hashed_password"] = hashed
+                record["id"] = str(uuid.uuid4())
+            hashed_at = time.perf_counter()
+
+            for row_number, user_created, profile_created, role in self._merge(db, accepted):
+                if not user_created:
+                    errors.append({"row": row_number, "field": None, "message": "Email, phone number or national ID already in use"})
+                    continue
+                imported_rows.add(row_number)
+                if profile_created:
+                    profiles += 1
+                elif role == UserRole.FARMER.name:
+                    errors.append({"row": row_number, "field": "national_id", "message": "User created without a farmer profile: national ID already in use"})
+        else:
+            hashed_at = validated_at
+
+        errors.sort(key=lambda e: e["row"])
+        result = {
+            "total_rows": total_rows,
+            "imported": len(imported_rows),
+            "farmer_profiles": profiles,
+            "rejected": len({e["row"] for e in errors} - imported_rows),
+            "dry_run": dry_run,
+            "errors": errors,
+            "timings": {
+                "validate_seconds": round(validated_at - start_time, 3),
+                "hash_seconds": round(hashed_at - validated_at, 3),
+                "merge_seconds": round(time.perf_counter() - hashed_at, 3),
+            }
+        }
+        if dry_run:
+            result["valid_rows"] = len(accepted)
+        logger.info(
+            f"User import: {len(imported_rows)} of {total_rows} rows imported, {len(errors)} errors "
+            f"in {round(time.perf_counter() - start_time, 2)}s"
+        )
+        return result
+
+    def _validate(self, row: Dict[str, Optional[str]], districts: Dict[str, str]) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+        errors = []
+        record: Dict[str, Any] = {"password": row.get("password")}
+
+        for field in ("first_name", "last_name"):
+            value = row.get(field)
+            if not value:
+                errors.append((field, "Required"))
+            elif len(value) > 100:
+                errors.append((field, "Longer than 100 characters"))
+            record[field] = value
+
+        role_value = (row.get("role") or UserRole.FARMER.value).lower().replace(" ", "_")
+        try:
+            role = UserRole(role_value)
+        except ValueError:
+            errors.append(("role", "Invalid user role"))
+            role = None
+        record["role"] = role.name if role else None
+
+        email = row.get("email")
+        if email:
+            email = email.lower()
+            if len(email) > 255 or not EMAIL_PATTERN.match(email):
+                errors.append(("email", "Invalid email address"))
+        record["email"] = email
+
+        phone_number = row.get("phone_number")
+        if phone_number:
+            phone_number = re.sub(r"[\s-]", "", phone_number)
+            if not PHONE_PATTERN.match(phone_number):
+                errors.append(("phone_number", "Phone number must start with 0 and contain only digits"))
+        elif role == UserRole.FARMER:
+            errors.append(("phone_number", "Phone number is required for farmers"))
+        record["phone_number"] = phone_number
+
+        district = row.get("district_id") or row.get("district")
+        district_id = districts.get(district.lower()) if district else None
+        if district and not district_id:
+            errors.append(("district", "Unknown district"))
+        elif not district and role in (UserRole.LOAN_OFFICER, UserRole.SUPERVISOR):
+            errors.append(("district", "District is required for loan officers and supervisors"))
+        record["district_id"] = district_id
+
+        # Profile columns only apply to farmers
+        if role == UserRole.FARMER:
+            national_id = row.get("national_id")
+            if national_id and len(national_id) > 50:
+                errors.append(("national_id", "Longer than 50 characters"))
+            record["national_id"] = national_id
+            record["address"] = row.get("address")
+            record["farm_location_gps"] = row.get("farm_location_gps")
+
+            farm_size = row.get("farm_size_hectares")
+            if farm_size:
+                try:
+                    farm_size = Decimal(farm_size)
+                    if not 0 <= farm_size < 10 ** 8:
+                        raise InvalidOperation
+                except InvalidOperation:
+                    errors.append(("farm_size_hectares", "Must be a non-negative number"))
+            record["farm_size_hectares"] = farm_size
+
+            date_of_birth = row.get("date_of_birth")
+            if date_of_birth:
+                try:
+                    date_of_birth = datetime.fromisoformat(date_of_birth)
+                    if date_of_birth.date() >= date.today():
+                        errors.append(("date_of_birth", "Must be in the past"))
+                except ValueError:
+                    errors.append(("date_of_birth", "Expected a date as YYYY-MM-DD"))
+            record["date_of_birth"] = date_of_birth
+
+        return record, errors
+
+    def _merge(self, db: Session, records: List[Dict[str, Any]]):
+        """COPY the records into a staging table and merge them in the session's transaction"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            writer.writerow([record.get(column) for column in STAGING_COLUMNS])
+        buffer.seek(0)
+
+        try:
+            db.execute(CREATE_STAGING_QUERY)
+            with db.connection().connection.cursor() as cursor:
+                cursor.copy_expert(COPY_STAGING_SQL, buffer)
+            rows = db.execute(MERGE_QUERY, {"created_at": datetime.now(timezone("Africa/Blantyre"))}).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return rows
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """bcrypt hashes, computed across USER_IMPORT_HASH_WORKERS processes"""
+    workers = min(settings.USER_IMPORT_HASH_WORKERS, len(passwords))
+    if workers <= 1:
+        return [hash_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+# Initialize user importer
+user_importer = UserImporter()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from app.config.ml_deployment import ml_config as config
+from app.services.ml_model import FEATURE_COLUMNS, model_service
+from app.services.prediction_intervals import predict_with_interval
+
+NUMERIC_FEATURES = [f for f in FEATURE_COLUMNS if f != 'loan_crop']
+
+
+class WhatIfSimulator:
+    """Score a base application over a grid of one or two numeric features.
+
+    The grid is built as one feature matrix and scored in a single call to the
+    live model. Surfaces are cached by a hash of the model version and request.
+    """
+
+    def __init__(self):
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def simulate(self, base: Dict[str, Any], ranges: List[Dict[str, Any]]) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        handle = model_service.handle
+        if handle is None:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+
+        features = [r["feature"] for r in ranges]
+        if len(set(features)) != len(features):
+            raise ValueError("Each feature can only be varied once")
+        grid_points = int(np.prod([r["steps"] for r in ranges]))
+        if grid_points > config.WHAT_IF_MAX_POINTS:
+            raise ValueError(f"Grid has {grid_points} points, the maximum is {config.WHAT_IF_MAX_POINTS}")
+
+        key = hashlib.sha256(json.dumps(
+            {"model_version": handle.model_version, "base": base, "ranges": ranges}, sort_keys=True
+        ).encode()).hexdigest()
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        if result is None:
+            result = self._score(handle, base, ranges, grid_points)
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > config.WHAT_IF_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            cached = False
+        else:
+            cached = True
+
+        return {**result, "cached": cached, "latency_ms": (time.perf_counter() - start_time) * 1000}
+
+    def _score(self, handle, base: Dict[str, Any], ranges: List[Dict[str, Any]], grid_points: int) -> Dict[str, Any]:
+        axes = [np.linspace(r["start"], r["stop"], r["steps"]) for r in ranges]
+
+        # Every grid point starts as the base application; varied columns are filled from the mesh
+        matrix = np.tile(np.asarray([base[f] for f in NUMERIC_FEATURES], dtype=np.float64), (grid_points, 1))
+        for r, values in zip(ranges, np.meshgrid(*axes, indexing="ij")):
+            matrix[:, NUMERIC_FEATURES.index(r["feature"])] = values.reshape(-1)
+        grid = pd.DataFrame(matrix, columns=NUMERIC_FEATURES)
+        grid['loan_crop'] = base['loan_crop']
+
+        point, lower, upper = predict_with_interval(handle.model, grid[FEATURE_COLUMNS])
+        shape = [len(values) for values in axes]
+
+        def surface(values):
+            return np.round(np.maximum(values, 0), 2).reshape(shape).tolist()
+
+        return {
+            "model_version": handle.model_version,
+            "axes": [{"feature": r["feature"], "values": values.tolist()} for r, values in zip(ranges, axes)],
+            "predicted_amount_mwk": surface(point),
+            "prediction_lower_mwk": surface(lower) if lower is not None else None,
+            "prediction_upper_mwk": surface(upper) if upper is not None else None,
+            "grid_points": grid_points
+        }
+
+
+# Initialize what-if simulator
+what_if_simulator = WhatIfSimulator()
@@ -0,0 +1,218 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.db_models import CropType, District, LoanApplication, ModelAccuracyStat
+from app.services.history_archive import archived_before
+
+logger = logging.getLogger(__name__)
+
+# Label for predictions made before model versions were recorded
+UNVERSIONED = "unversioned"
+
+SUM_COLUMNS = [
+    "sample_count",
+    "override_count",
+    "sum_abs_error",
+    "sum_abs_pct_error",
+    "sum_sq_error",
+    "sum_actual",
+    "sum_actual_sq",
+]
+
+REBUILD_QUERY = text("""
+    INSERT INTO model_accuracy_stats (
+        id, model_version, crop_type_id, district_id, period_start,
+        sample_count, override_count, sum_abs_error, sum_abs_pct_error,
+        sum_sq_error, sum_actual, sum_actual_sq, last_updated
+    )
+    SELECT
+        gen_random_uuid(),
+        COALESCE(model_version, :unversioned),
+        crop_type_id,
+        district_id,
+        date_trunc('month', approval_date)::date,
+        COUNT(*),
+        COUNT(override_reason),
+        SUM(ABS(predicted_amount_mwk - approved_amount_mwk))::float8,
+        SUM(ABS(predicted_amount_mwk - approved_amount_mwk) / approved_amount_mwk)::float8,
+        SUM(POWER(predicted_amount_mwk - approved_amount_mwk, 2))::float8,
+        SUM(approved_amount_mwk)::float8,
+        SUM(POWER(approved_amount_mwk, 2))::float8,
+        now()
+    FROM loan_applications
+    WHERE predicted_amount_mwk IS NOT NULL
+      AND approved_amount_mwk > 0
+      AND approval_date IS NOT NULL
+      AND crop_type_id IS NOT NULL
+      AND district_id IS NOT NULL
+      AND approval_date >= :recompute_from
+    GROUP BY 2, 3, 4, 5
+""")
+
+
+def _period_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def _metrics_from_sums(sums: Dict[str, float]) -> Dict[str, Any]:
+    n = sums["sample_count"]
+    if n == 0:
+        return {"samples": 0, "mae": None, "mape": None, "r2": None, "override_rate": None}
+
+    total_variance = sums["sum_actual_sq"] - sums["sum_actual"] ** 2 / n
+    r2 = 1 - sums["sum_sq_error"] / total_variance if total_variance > 0 else None
+    return {
+        "samples": int(n),
+        "mae": round(sums["sum_abs_error"] / n, 2),
+        "mape": round(sums["sum_abs_pct_error"] / n, 4),
+        "r2": round(r2, 4) if r2 is not None else None,
+        "override_rate": round(sums["override_count"] / n, 4)
+    }
+
+
+class AccuracyTracker:
+    """Incrementally evaluate predictions against supervisor-approved amounts"""
+
+    def record_approval(self, db: Session, application: LoanApplication):
+        """Fold one approved application into the running sums.
+
+        Runs inside the approval transaction, so each application is counted exactly once.
+        """
+        if application.predicted_amount_mwk is None or not application.approved_amount_mwk:
+            return
+        # Stats are keyed by crop and district; rebuild() skips these rows too
+        if application.crop_type_id is None or application.district_id is None:
+            return
+
+        predicted = float(application.predicted_amount_mwk)
+        actual = float(application.approved_amount_mwk)
+        error = predicted - actual
+
+        stmt = insert(ModelAccuracyStat).values(
+            model_version=application.model_version or UNVERSIONED,
+            crop_type_id=application.crop_type_id,
+            district_id=application.district_id,
+            period_start=_period_start(application.approval_date or datetime.now()),
+            sample_count=1,
+            override_count=1 if application.override_reason else 0,
+            sum_abs_error=abs(error),
+            sum_abs_pct_error=abs(error) / actual,
+            sum_sq_error=error * error,
+            sum_actual=actual,
+            sum_actual_sq=actual * actual,
+            last_updated=datetime.now()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["model_version", "crop_type_id", "district_id", "period_start"],
+            set_={
+                **{
+                    column: getattr(ModelAccuracyStat, column) + getattr(stmt.excluded, column)
+                    for column in SUM_COLUMNS
+                },
+                "last_updated": stmt.excluded.last_updated
+            }
+        )
+        db.execute(stmt)
+
+    def rebuild(self, db: Session) -> int:
+        """Recompute the running sums from the applications table.
+
+        Months up to the archive cutoff are kept as they are, since some of
+        their applications are no longer in the table.
+        """
+        cutoff = archived_before(db)
+        if cutoff:
+            months = cutoff.year * 12 + cutoff.month
+            recompute_from = date(months // 12, months % 12 + 1, 1)
+        else:
+            recompute_from = date.min
+        db.query(ModelAccuracyStat).filter(ModelAccuracyStat.period_start >= recompute_from).delete()
+        result = db.execute(REBUILD_QUERY, {"unversioned": UNVERSIONED, "recompute_from": recompute_from})
+        db.commit()
+        logger.info(f"Rebuilt model accuracy stats: {result.rowcount} rows")
+        return result.rowcount
+
+    def get_summary(self, db: Session, window_months: int = 3) -> Dict[str, Any]:
+        """MAE, MAPE, R² and override rate overall and per model version, crop and district"""
+        today = date.today()
+        months_back = today.year * 12 + today.month - 1 - (window_months - 1)
+        since = date(months_back // 12, months_back % 12 + 1, 1)
+
+        rows = db.query(
+            ModelAccuracyStat,
+            CropType.name.label("crop"),
+            District.name.label("district")
+        ).join(
+            CropType, ModelAccuracyStat.crop_type_id == CropType.id
+        ).join(
+            District, ModelAccuracyStat.district_id == District.id
+        ).filter(
+            ModelAccuracyStat.period_start >= since
+        ).all()
+
+        overall = defaultdict(float)
+        by_version = defaultdict(lambda: defaultdict(float))
+        by_crop = defaultdict(lambda: defaultdict(float))
+        by_district = defaultdict(lambda: defaultdict(float))
+
+        for stat, crop, district in rows:
+            for column in SUM_COLUMNS:
+                value = getattr(stat, column)
+                overall[column] += value
+                by_version[stat.model_version][column] += value
+                by_crop[crop][column] += value
+                by_district[district][column] += value
+
+        for column in SUM_COLUMNS:
+            overall.setdefault(column, 0.0)
+
+        return {
+            "window_start": since,
+            "overall": _metrics_from_sums(overall),
+            "by_model_version": {k: _metrics_from_sums(v) for k, v in by_version.items()},
+            "by_crop": {k: _metrics_from_sums(v) for k, v in by_crop.items()},
+            "by_district": {k: _metrics_from_sums(v) for k, v in by_district.items()}
+        }
+
+    def recent_pairs(self, db: Session, limit: int = 10) -> List[Dict[str, Optional[Any]]]:
+        """Most recent predicted vs approved amounts"""
+        rows = db.query(
+            LoanApplication.predicted_amount_mwk,
+            LoanApplication.approved_amount_mwk,
+            LoanApplication.approval_date,
+            LoanApplication.model_version
+        ).filter(
+            LoanApplication.approval_date.isnot(None),
+            LoanApplication.approved_amount_mwk.isnot(None),
+            LoanApplication.predicted_amount_mwk.isnot(None)
+        ).order_by(LoanApplication.approval_date.desc()).limit(limit).all()
+
+        return [
+            {
+                "predicted": float(row.predicted_amount_mwk),
+                "actual": float(row.approved_amount_mwk),
+                "date": row.approval_date.date().isoformat(),
+                "model_version": row.model_version or UNVERSIONED
+            }
+            for row in rows
+        ]
+
+
+# Initialize accuracy tracker
+accuracy_tracker = AccuracyTracker()
+
+
+if __name__ == "__main__":
+    from app.config.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        accuracy_tracker.rebuild(db)
+    finally:
+        db.close()
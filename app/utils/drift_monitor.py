@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config.ml_deployment import ml_config as config
+
+logger = logging.getLogger(__name__)
+
+# Smoothing applied to empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+def reference_profile_path(model_path: str) -> str:
+    """Reference profiles are stored next to the model artifact they describe"""
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.reference.json"
+
+
+def _normalize_category(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+def _bin_index(edges: np.ndarray, value: float) -> int:
+    """Bins are (-inf, e0], (e0, e1], ..., (e_n, inf)"""
+    return int(np.searchsorted(edges, value, side="left"))
+
+
+def _binned_proportions(values: np.ndarray, edges: np.ndarray) -> List[float]:
+    counts = np.bincount(np.searchsorted(edges, values, side="left"), minlength=len(edges) + 1)
+    return (counts / max(counts.sum(), 1)).tolist()
+
+
+def _quantile_edges(values: np.ndarray, n_bins: int) -> np.ndarray:
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    return np.unique(np.quantile(values, quantiles))
+
+
+def build_reference_profile(
+    X,
+    predictions,
+    num_features: List[str],
+    cat_features: List[str],
+    n_bins: int = None
+) -> Dict[str, Any]:
+    """Summarise the training distribution of each feature and of the model output"""
+    n_bins = n_bins or config.DRIFT_REFERENCE_BINS
+    profile = {
+        "created_at": datetime.now().isoformat(),
+        "n_samples": int(len(X)),
+        "numeric": {},
+        "categorical": {},
+        "prediction": {}
+    }
+
+    for feature in num_features:
+        values = X[feature].astype(float).to_numpy()
+        edges = _quantile_edges(values, n_bins)
+        profile["numeric"][feature] = {
+            "edges": edges.tolist(),
+            "proportions": _binned_proportions(values, edges)
+        }
+
+    for feature in cat_features:
+        frequencies = X[feature].map(_normalize_category).value_counts(normalize=True)
+        profile["categorical"][feature] = {
+            "frequencies": {str(k): float(v) for k, v in frequencies.items()}
+        }
+
+    predictions = np.asarray(predictions, dtype=float)
+    edges = _quantile_edges(predictions, n_bins)
+    profile["prediction"] = {
+        "edges": edges.tolist(),
+        "proportions": _binned_proportions(predictions, edges)
+    }
+    return profile
+
+
+def save_reference_profile(profile: Dict[str, Any], path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    expected = np.clip(expected, PSI_EPSILON, None)
+    actual = np.clip(actual, PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks_statistic(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Kolmogorov-Smirnov distance between the binned CDFs"""
+    return float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+
+
+class DriftMonitor:
+    """Streaming feature and prediction histograms compared against a training reference.
+
+    Counts are kept in a fixed ring of time slots, so memory is constant and any
+    window up to DRIFT_MAX_WINDOW_HOURS can be evaluated without touching the database.
+    """
+
+    def __init__(self):
+        self.slot_seconds = config.DRIFT_SLOT_MINUTES * 60
+        self.n_slots = max(1, int(config.DRIFT_MAX_WINDOW_HOURS * 3600 // self.slot_seconds))
+        self.reference: Optional[Dict[str, Any]] = None
+        self.reference_path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self.numeric_features: List[str] = []
+        self.categorical_features: List[str] = []
+        self._numeric_edges: Dict[str, np.ndarray] = {}
+        self._category_index: Dict[str, Dict[str, int]] = {}
+        self._prediction_edges = np.array([])
+        self._slot_ids = np.full(self.n_slots, -1, dtype=np.int64)
+        self._numeric_counts: Dict[str, np.ndarray] = {}
+        self._category_counts: Dict[str, np.ndarray] = {}
+        self._prediction_counts = np.zeros((self.n_slots, 1), dtype=np.int64)
+
+        if not self.reference:
+            return
+
+        for feature, ref in self.reference["numeric"].items():
+            edges = np.asarray(ref["edges"], dtype=float)
+            self.numeric_features.append(feature)
+            self._numeric_edges[feature] = edges
+            self._numeric_counts[feature] = np.zeros((self.n_slots, len(edges) + 1), dtype=np.int64)
+
+        for feature, ref in self.reference["categorical"].items():
+            # The extra trailing bucket collects categories unseen at training time
+            index = {category: i for i, category in enumerate(sorted(ref["frequencies"]))}
+            self.categorical_features.append(feature)
+            self._category_index[feature] = index
+            self._category_counts[feature] = np.zeros((self.n_slots, len(index) + 1), dtype=np.int64)
+
+        self._prediction_edges = np.asarray(self.reference["prediction"]["edges"], dtype=float)
+        self._prediction_counts = np.zeros((self.n_slots, len(self._prediction_edges) + 1), dtype=np.int64)
+
+    def load_reference(self, path: str) -> bool:
+        """Load the training reference profile and clear the live histograms"""
+        with self._lock:
+            try:
+                with open(path) as f:
+                    self.reference = json.load(f)
+                self.reference_path = path
+                logger.info(f"Drift reference profile loaded from {path}")
+            except FileNotFoundError:
+                self.reference = None
+                self.reference_path = None
+                logger.warning(f"No drift reference profile found at {path}")
+            except Exception as e:
+                self.reference = None
+                self.reference_path = None
+                logger.error(f"Error loading drift reference profile: {str(e)}")
+            self._reset_state()
+            return self.reference is not None
+
+    def reset(self):
+        """Clear the live histograms, keeping the reference profile"""
+        with self._lock:
+            self._reset_state()
+
+    def _current_slot(self) -> int:
+        """Return the ring position for now, clearing it if it holds an expired slot"""
+        slot_id = int(time.time() // self.slot_seconds)
+        position = slot_id % self.n_slots
+        if self._slot_ids[position] != slot_id:
+            self._slot_ids[position] = slot_id
+            for counts in self._numeric_counts.values():
+                counts[position] = 0
+            for counts in self._category_counts.values():
+                counts[position] = 0
+            self._prediction_counts[position] = 0
+        return position
+
+    def record(self, input_data: Dict[str, Any], prediction: float):
+        """Add one served prediction to the live histograms"""
+        if self.reference is None:
+            return
+        try:
+            with self._lock:
+                position = self._current_slot()
+                for feature in self.numeric_features:
+                    bin_index = _bin_index(self._numeric_edges[feature], float(input_data[feature]))
+                    self._numeric_counts[feature][position, bin_index] += 1
+                for feature in self.categorical_features:
+                    index = self._category_index[feature]
+                    bin_index = index.get(_normalize_category(input_data[feature]), len(index))
+                    self._category_counts[feature][position, bin_index] += 1
+                self._prediction_counts[position, _bin_index(self._prediction_edges, prediction)] += 1
+        except Exception as e:
+            logger.error(f"Error recording prediction for drift monitoring: {str(e)}")
+
+    def _window_mask(self, window_hours: float) -> np.ndarray:
+        current_slot = int(time.time() // self.slot_seconds)
+        n_window_slots = max(1, int(np.ceil(window_hours * 3600 / self.slot_seconds)))
+        return (self._slot_ids > current_slot - n_window_slots) & (self._slot_ids >= 0)
+
+    def compute_drift(self, window_hours: float = 24) -> Dict[str, Any]:
+        """PSI and binned KS per feature, and for the predictions, over the last window_hours"""
+        if self.reference is None:
+            return {"status": "unavailable", "detail": "No reference profile for the loaded model"}
+
+        window_hours = min(window_hours, config.DRIFT_MAX_WINDOW_HOURS)
+        with self._lock:
+            mask = self._window_mask(window_hours)
+            numeric = {f: self._numeric_counts[f][mask].sum(axis=0) for f in self.numeric_features}
+            categorical = {f: self._category_counts[f][mask].sum(axis=0) for f in self.categorical_features}
+            prediction = self._prediction_counts[mask].sum(axis=0)
+
+        sample_count = int(prediction.sum())
+        result = {
+            "status": "ok",
+            "window_hours": window_hours,
+            "sample_count": sample_count,
+            "psi_threshold": config.DRIFT_PSI_THRESHOLD,
+            "feature_drift": {},
+            "prediction_drift": None
+        }
+        if sample_count < config.DRIFT_MIN_SAMPLES:
+            result["status"] = "insufficient_data"
+            return result
+
+        for feature, counts in numeric.items():
+            expected = np.asarray(self.reference["numeric"][feature]["proportions"])
+            actual = counts / sample_count
+            psi = population_stability_index(expected, actual)
+            result["feature_drift"][feature] = {
+                "psi": round(psi, 4),
+                "ks": round(binned_ks_statistic(expected, actual), 4),
+                "drifted": psi > config.DRIFT_PSI_THRESHOLD
+            }
+
+        for feature, counts in categorical.items():
+            frequencies = self.reference["categorical"][feature]["frequencies"]
+            expected = np.append([frequencies[c] for c in sorted(frequencies)], 0.0)
+            actual = counts / sample_count
+            psi = population_stability_index(expected, actual)
+            result["feature_drift"][feature] = {
+                "psi": round(psi, 4),
+                "unseen_share": round(float(actual[-1]), 4),
+                "drifted": psi > config.DRIFT_PSI_THRESHOLD
+            }
+
+        expected = np.asarray(self.reference["prediction"]["proportions"])
+        actual = prediction / sample_count
+        psi = population_stability_index(expected, actual)
+        result["prediction_drift"] = {
+            "psi": round(psi, 4),
+            "ks": round(binned_ks_statistic(expected, actual), 4),
+            "drifted": psi > config.DRIFT_PSI_THRESHOLD
+        }
+        return result
+
+
+# Initialize drift monitor
+drift_monitor = DriftMonitor()
@@ -7,7 +7,7 @@ from sqlalchemy import and_
 from sqlalchemy.orm import Session
 from app.models.db_models import CropType, FarmerProfile, User, YieldHistory
 from app.schemas.ml_schemas import LoanPredictionInput
-from app.services.ml_model import ModelService
+from app.services.ml_model import model_service
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -36,9 +36,6 @@ def ensure_farmer_profile(db: Session, user: User) -> FarmerProfile:
         return farmer_profile
     return user.farmer_profile
 
-# Initialize the model service
-model_service = ModelService()
-
 def calculate_loan_prediction(
     crop_type: str,
     farm_size: float,
@@ -1,6 +1,7 @@
 # Helper functions
 from typing import List, Optional
-from app.models.db_models import District, User, UserRole
+from fastapi import HTTPException
+from app.models.db_models import ApplicationStatus, District, LoanApplication, User, UserRole
 from sqlalchemy.orm import Session
 
 
@@ -46,3 +47,36 @@ def get_accessible_districts(current_user: User, db: Session) -> List[str]:
         return []
     
     return []
+
+def filter_applications(query, accessible_districts: List[str], district_id: Optional[str] = None, status: Optional[str] = None):
+    """Apply the district and status filters of the application listing to a query or select"""
+    # Apply district filter
+    if district_id:
+        if district_id not in accessible_districts:
+            raise HTTPException(
+                status_code=403,
+                detail="Access denied to specified district"
+            )
+        query = query.filter(LoanApplication.district_id == district_id)
+    else:
+        query = query.filter(LoanApplication.district_id.in_(accessible_districts))
+    
+    # Apply status filter
+    if status:
+        if status.lower() == "pending":
+            # "Pending" means submitted and under review
+            query = query.filter(LoanApplication.status.in_([
+                ApplicationStatus.SUBMITTED, 
+                ApplicationStatus.UNDER_REVIEW
+            ]))
+        else:
+            try:
+                status_enum = ApplicationStatus(status.lower())
+                query = query.filter(LoanApplication.status == status_enum)
+            except ValueError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid status: {status}"
+                )
+    
+    return query
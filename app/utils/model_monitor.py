@@ -1,13 +1,81 @@
+import copy
+import threading
 import time
+import numpy as np
 import psutil
 import logging
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.models.db_models import LoanApplication
+from app.config.ml_deployment import ml_config as config
 
 logger = logging.getLogger(__name__)
 
+# Summary stats, percentiles, histogram and per-crop breakdown of recent
+# predictions, computed by Postgres so no ORM rows are hydrated.
+MODEL_METRICS_QUERY = text("""
+    WITH recent AS (
+        SELECT
+            la.predicted_amount_mwk AS amount,
+            la.prediction_confidence AS confidence,
+            COALESCE(ct.name, 'unknown') AS crop
+        FROM loan_applications la
+        LEFT JOIN crop_types ct ON ct.id = la.crop_type_id
+        WHERE la.prediction_date >= :since
+          AND la.predicted_amount_mwk IS NOT NULL
+    ),
+    bounds AS (
+        SELECT MIN(amount) AS lo, MAX(amount) + 0.01 AS hi FROM recent
+    )
+    SELECT
+        (
+            SELECT json_build_object(
+                'count', COUNT(*),
+                'avg_amount', AVG(amount),
+                'min_amount', MIN(amount),
+                'max_amount', MAX(amount),
+                'p50_amount', percentile_cont(0.5) WITHIN GROUP (ORDER BY amount),
+                'p90_amount', percentile_cont(0.9) WITHIN GROUP (ORDER BY amount),
+                'p99_amount', percentile_cont(0.99) WITHIN GROUP (ORDER BY amount),
+                'avg_confidence', AVG(confidence),
+                'min_confidence', MIN(confidence),
+                'max_confidence', MAX(confidence)
+            )
+            FROM recent
+        ) AS summary,
+        (
+            SELECT json_agg(h ORDER BY h.bucket)
+            FROM (
+                SELECT
+                    width_bucket(r.amount, b.lo, b.hi, :buckets) AS bucket,
+                    b.lo + (width_bucket(r.amount, b.lo, b.hi, :buckets) - 1) * (b.hi - b.lo) / :buckets AS lower,
+                    b.lo + width_bucket(r.amount, b.lo, b.hi, :buckets) * (b.hi - b.lo) / :buckets AS upper,
+                    COUNT(*) AS count
+                FROM recent r CROSS JOIN bounds b
+                GROUP BY 1, 2, 3
+            ) h
+        ) AS histogram,
+        (
+            SELECT json_agg(c ORDER BY c.crop)
+            FROM (
+                SELECT
+                    crop,
+                    COUNT(*) AS count,
+                    AVG(amount) AS avg_amount,
+                    percentile_cont(0.5) WITHIN GROUP (ORDER BY amount) AS p50_amount,
+                    AVG(confidence) AS avg_confidence
+                FROM recent
+                GROUP BY crop
+            ) c
+        ) AS by_crop
+""")
+
+
+def _as_float(value: Optional[Any]) -> float:
+    return float(value) if value is not None else 0.0
+
 class ModelMonitor:
     """Monitor model performance and system health"""
     
@@ -17,8 +85,13 @@ class ModelMonitor:
         self.error_count = 0
         self.total_prediction_time = 0.0
         self.last_health_check = datetime.now()
+        self._model_metrics_cache: Optional[Dict[str, Any]] = None
+        self._model_metrics_cached_at = 0.0
+        self._model_metrics_lock = threading.Lock()
+        self.version_samples: Dict[str, deque] = {}
+        self._version_lock = threading.Lock()
     
-    def record_prediction(self, prediction_time: float, success: bool = True):
+    def record_prediction(self, prediction_time: float, success: bool = True, model_version: Optional[str] = None):
         """Record a prediction attempt"""
         self.prediction_count += 1
         self.total_prediction_time += prediction_time
@@ -26,7 +99,34 @@ class ModelMonitor:
         if not success:
             self.error_count += 1
         
-        logger.info(f"Prediction recorded: time={prediction_time:.2f}s, success={success}")
+        if model_version is not None:
+            with self._version_lock:
+                if model_version not in self.version_samples:
+                    self.version_samples[model_version] = deque(maxlen=config.CANARY_STATS_WINDOW)
+                self.version_samples[model_version].append((prediction_time * 1000, success))
+        
+        logger.debug(f"Prediction recorded: time={prediction_time:.2f}s, success={success}")
+    
+    def get_version_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Latency percentiles and error rate per model version over the recent window"""
+        with self._version_lock:
+            snapshot = {version: list(samples) for version, samples in self.version_samples.items()}
+        
+        metrics = {}
+        for version, samples in snapshot.items():
+            if not samples:
+                continue
+            latencies = np.array([latency for latency, _ in samples])
+            errors = sum(1 for _, success in samples if not success)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            metrics[version] = {
+                "count": len(samples),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "error_rate": errors / len(samples)
+            }
+        return metrics
     
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get current performance metrics"""
@@ -59,47 +159,82 @@ class ModelMonitor:
         }
     
     def get_model_metrics(self, db: Session) -> Dict[str, Any]:
-        """Get model-specific metrics from database"""
-        try:
-            # Get prediction statistics from last 24 hours
-            yesterday = datetime.now() - timedelta(days=1)
-            
-            recent_predictions = db.query(LoanApplication).filter(
-                LoanApplication.prediction_date >= yesterday,
-                LoanApplication.predicted_amount_mwk.isnot(None)
-            ).all()
-            
-            if recent_predictions:
-                predictions = [float(app.predicted_amount_mwk) for app in recent_predictions]
-                confidences = [
-                    float(app.prediction_confidence) 
-                    for app in recent_predictions 
-                    if app.prediction_confidence is not None
-                ]
-                
-                return {
-                    "recent_predictions_count": len(recent_predictions),
-                    "avg_predicted_amount": sum(predictions) / len(predictions),
-                    "min_predicted_amount": min(predictions),
-                    "max_predicted_amount": max(predictions),
-                    "avg_confidence": sum(confidences) / len(confidences) if confidences else 0,
-                    "min_confidence": min(confidences) if confidences else 0,
-                    "max_confidence": max(confidences) if confidences else 0
+        """Get model-specific metrics from database (cached for MODEL_METRICS_CACHE_TTL seconds)"""
+        with self._model_metrics_lock:
+            now = time.monotonic()
+            if (
+                self._model_metrics_cache is not None
+                and now - self._model_metrics_cached_at < config.MODEL_METRICS_CACHE_TTL
+            ):
+                # Callers get their own copy so edits to it cannot leak into the cache
+                return copy.deepcopy(self._model_metrics_cache)
+
+            try:
+                metrics = self._query_model_metrics(db)
+            except Exception as e:
+                logger.error(f"Error getting model metrics: {str(e)}")
+                return {"error": "Failed to retrieve model metrics"}
+
+            self._model_metrics_cache = metrics
+            self._model_metrics_cached_at = now
+            return copy.deepcopy(metrics)
+
+    def _query_model_metrics(self, db: Session) -> Dict[str, Any]:
+        """Aggregate the last 24 hours of predictions in a single round trip"""
+        yesterday = datetime.now() - timedelta(days=1)
+        row = db.execute(
+            MODEL_METRICS_QUERY,
+            {"since": yesterday, "buckets": config.MODEL_METRICS_HISTOGRAM_BUCKETS}
+        ).one()
+
+        summary = row.summary or {}
+        count = summary.get("count") or 0
+        if count == 0:
+            return {
+                "recent_predictions_count": 0,
+                "avg_predicted_amount": 0,
+                "min_predicted_amount": 0,
+                "max_predicted_amount": 0,
+                "avg_confidence": 0,
+                "min_confidence": 0,
+                "max_confidence": 0,
+                "predicted_amount_percentiles": {"p50": 0, "p90": 0, "p99": 0},
+                "predicted_amount_histogram": [],
+                "by_crop": {}
+            }
+
+        return {
+            "recent_predictions_count": count,
+            "avg_predicted_amount": _as_float(summary["avg_amount"]),
+            "min_predicted_amount": _as_float(summary["min_amount"]),
+            "max_predicted_amount": _as_float(summary["max_amount"]),
+            "avg_confidence": _as_float(summary["avg_confidence"]),
+            "min_confidence": _as_float(summary["min_confidence"]),
+            "max_confidence": _as_float(summary["max_confidence"]),
+            "predicted_amount_percentiles": {
+                "p50": _as_float(summary["p50_amount"]),
+                "p90": _as_float(summary["p90_amount"]),
+                "p99": _as_float(summary["p99_amount"])
+            },
+            "predicted_amount_histogram": [
+                {
+                    "bucket": bucket["bucket"],
+                    "lower": _as_float(bucket["lower"]),
+                    "upper": _as_float(bucket["upper"]),
+                    "count": bucket["count"]
                 }
-            else:
-                return {
-                    "recent_predictions_count": 0,
-                    "avg_predicted_amount": 0,
-                    "min_predicted_amount": 0,
-                    "max_predicted_amount": 0,
-                    "avg_confidence": 0,
-                    "min_confidence": 0,
-                    "max_confidence": 0
+                for bucket in (row.histogram or [])
+            ],
+            "by_crop": {
+                crop["crop"]: {
+                    "count": crop["count"],
+                    "avg_predicted_amount": _as_float(crop["avg_amount"]),
+                    "p50_predicted_amount": _as_float(crop["p50_amount"]),
+                    "avg_confidence": _as_float(crop["avg_confidence"])
                 }
-        
-        except Exception as e:
-            logger.error(f"Error getting model metrics: {str(e)}")
-            return {"error": "Failed to retrieve model metrics"}
+                for crop in (row.by_crop or [])
+            }
+        }
     
     def check_health(self) -> Dict[str, Any]:
         """Perform health check"""
@@ -164,6 +299,8 @@ class ModelMonitor:
         self.error_count = 0
         self.total_prediction_time = 0.0
         self.start_time = datetime.now()
+        with self._version_lock:
+            self.version_samples = {}
         logger.info("Performance metrics reset")
 
 # Initialize monitor
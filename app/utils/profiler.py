@@ -0,0 +1,227 @@
+"""Statistical stack sampler for finding where a running worker spends its time.
+
+While a profile is being taken, a timer thread snapshots the Python stack of
+every thread in the process every PROFILER_INTERVAL_MS and counts identical
+stacks. Threads parked in a wait (idle pool workers, the event loop in
+select) are skipped, so the counts are wall-clock time spent working or
+blocked on I/O. Output uses the collapsed format read by flamegraph.pl and
+speedscope: one line per distinct stack, thread name and frames from the
+root separated by ';', then the number of samples.
+
+Nothing runs while no profile is being taken, and only one is taken at a
+time. Profiles cover the worker process that took them.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames of threads that are waiting for work rather than doing it
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+_PATH_PREFIXES = sorted(
+    {os.path.join(path, "") for path in sys.path if path and os.path.isdir(path)}, key=len, reverse=True
+)
+
+
+class Sampling:
+    """A profile being taken; ends at its deadline or on stop()"""
+
+    def __init__(self, sampler: "StackSampler", seconds: float, interval_ms: float):
+        self._sampler = sampler
+        self.seconds = seconds
+        self.interval_ms = interval_ms
+        self.started_at = datetime.now()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        interval = self.interval_ms / 1000
+        started = time.perf_counter()
+        deadline = started + self.seconds
+        try:
+            while not self._stop.wait(interval) and time.perf_counter() < deadline:
+                tick = time.perf_counter()
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    stack = self._sampler.collapse(frame)
+                    if stack:
+                        self.stacks[f"{names.get(ident, ident)};{stack}"] += 1
+                self.samples += 1
+                self.sampling_seconds += time.perf_counter() - tick
+        except Exception as e:
+            logger.error(f"Stack sampling failed: {str(e)}")
+        finally:
+            self.elapsed = time.perf_counter() - started
+            self._sampler._release()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        return self.wait()
+
+    def wait(self) -> Dict[str, Any]:
+        """Wait for the profile to end and return it"""
+        self._thread.join()
+        return {
+            "started_at": self.started_at.isoformat(),
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval_ms,
+            "samples": self.samples,
+            # Share of the wall-clock time the sampler held the interpreter
+            "overhead_percent": round(100 * self.sampling_seconds / self.elapsed, 2) if self.elapsed else 0.0,
+            "stacks": self.stacks,
+        }
+
+
+class StackSampler:
+    """Takes profiles and keeps the recent per-request ones"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[CodeType, str] = {}
+        self.request_profiles: deque = deque(maxlen=settings.PROFILE_REQUESTS_KEPT)
+
+    def start(self, seconds: float, interval_ms: float = None) -> Optional[Sampling]:
+        """Start sampling for up to `seconds`; None if a profile is already being taken"""
+        if not self._lock.acquire(blocking=False):
+            return None
+        sampling = Sampling(self, seconds, interval_ms or settings.PROFILER_INTERVAL_MS)
+        sampling._thread.start()
+        return sampling
+
+    def _release(self):
+        self._lock.release()
+
+    def profile(self, seconds: float, interval_ms: float = None) -> Optional[Dict[str, Any]]:
+        """Sample every thread for `seconds`; None if a profile is already being taken"""
+        sampling = self.start(seconds, interval_ms)
+        return sampling.wait() if sampling else None
+
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def collapse(self, frame: FrameType) -> Optional[str]:
+        """Frames from the root to `frame` joined with ';', or None if the thread is idle"""
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        labels = []
+        while frame is not None:
+            labels.append(self._labels.get(frame.f_code) or self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _label(self, code: CodeType) -> str:
+        path = code.co_filename
+        for prefix in _PATH_PREFIXES:
+            if path.startswith(prefix):
+                path = path[len(prefix):]
+                break
+        label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+        self._labels[code] = label
+        return label
+
+    def keep_request_profile(self, method: str, path: str, profile: Dict[str, Any], profile_id: str = None) -> str:
+        profile_id = profile_id or uuid.uuid4().hex[:12]
+        self.request_profiles.append({"id": profile_id, "method": method, "path": path, **profile})
+        return profile_id
+
+    def get_request_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return next((p for p in self.request_profiles if p["id"] == profile_id), None)
+
+    def list_request_profiles(self) -> List[Dict[str, Any]]:
+        return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(self.request_profiles)]
+
+
+def collapsed(profile: Dict[str, Any]) -> str:
+    """The profile's stacks in collapsed format, most sampled first"""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+class RequestProfilingMiddleware:
+    """Profile requests from admins that carry PROFILE_REQUEST_HEADER.
+
+    The profile id is returned in the X-Profile-Id response header and the
+    profile is kept for GET /api/monitoring/profile/requests/{id}. The
+    sampler sees every thread, so requests served at the same time show up
+    as well. Installed only when PROFILE_REQUESTS is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.PROFILE_REQUEST_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if self.header not in headers:
+            return await self.app(scope, receive, send)
+
+        from starlette.concurrency import run_in_threadpool
+        if not await run_in_threadpool(_is_admin, headers.get(b"authorization", b"").decode()):
+            return await self.app(scope, receive, send)
+        sampling = stack_sampler.start(settings.PROFILER_MAX_SECONDS)
+        if sampling is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            stack_sampler.keep_request_profile(scope["method"], scope["path"], sampling.stop(), profile_id)
+
+
+def _is_admin(authorization: str) -> bool:
+    """Whether the bearer token belongs to an admin"""
+    from jose import JWTError, jwt
+
+    from app.config.database import SessionLocal
+    from app.models.db_models import User, UserRole
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        user_id = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("user_id")
+    except JWTError:
+        return False
+    if not user_id:
+        return False
+    db = SessionLocal()
+    try:
+        role = db.query(User.role).filter(User.id == user_id).scalar()
+    finally:
+        db.close()
+    return role == UserRole.ADMIN
+
+
+# Initialize stack sampler
+stack_sampler = StackSampler()
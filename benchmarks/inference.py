@@ -0,0 +1,188 @@
+"""Micro-benchmarks of the inference hot path, with a JSON history.
+
+Times each step of a prediction on the served model at batch sizes 1, 32
+and 1024, and measures the memory each call allocates with tracemalloc:
+
+    model_service.predict    ModelService.predict end to end, once per row
+    dataframe                the features DataFrame built from input dicts
+    frequency_encoder        FrequencyEncoder.transform of the crop column
+    column_transformer       the fitted ColumnTransformer.transform
+    regressor                GradientBoostingRegressor.predict on transformed features
+    confidence               ModelService._calculate_confidence, once per row
+
+Each run is appended to benchmarks/inference_history.jsonl with the commit
+and the hash of app/services/ml_model.py, and compared with the last
+recorded run, so a change to the inference code shows its latency and
+allocation impact.
+
+    python -m benchmarks.inference [--batch-sizes 1,32,1024] [--no-record]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config.ml_deployment import ml_config as config
+from app.encoders.frequency_encoder import normalize_category
+from app.services.ml_model import FEATURE_COLUMNS, model_service
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+HISTORY_PATH = os.path.join(BENCHMARKS_DIR, "inference_history.jsonl")
+TRACKED_SOURCE = os.path.join("app", "services", "ml_model.py")
+
+BATCH_SIZES = [1, 32, 1024]
+
+# Timing rounds per case, each at least 0.2 s long (timeit's autorange); the median is reported
+ROUNDS = 5
+
+
+def make_inputs(batch_size: int, crops: Iterable[str], seed: int = 0) -> List[Dict[str, Any]]:
+    """batch_size input dicts: golden inputs of known crops with deterministic jitter on the numeric features.
+
+    Golden inputs of unseen crops are left out; they would log a warning on every call.
+    """
+    crops = set(crops)
+    with open(config.GOLDEN_INPUTS_PATH) as f:
+        golden = [row for row in json.load(f) if normalize_category(row["loan_crop"]) in crops]
+    rng = np.random.default_rng(seed)
+    rows = []
+    for index in rng.integers(0, len(golden), batch_size):
+        row = dict(golden[index])
+        for feature in FEATURE_COLUMNS:
+            if feature != "loan_crop":
+                row[feature] = float(row[feature]) * float(rng.uniform(0.8, 1.2))
+        rows.append(row)
+    return rows
+
+
+def build_cases(batch_size: int) -> Dict[str, Callable[[], Any]]:
+    """One callable per benchmarked step, each working on batch_size rows"""
+    pipeline = model_service.model
+    if not hasattr(pipeline, "named_steps"):
+        raise ValueError(f"The served model is a {type(pipeline).__name__}, not a scikit-learn pipeline")
+    preprocessing, regressor = pipeline.named_steps["preprocessing"], pipeline.named_steps["model"]
+    encoder = preprocessing.named_transformers_["freq"]
+
+    rows = make_inputs(batch_size, encoder.categories_)
+    features = pd.DataFrame([{f: row[f] for f in FEATURE_COLUMNS} for row in rows])
+    transformed = preprocessing.transform(features)
+    predictions = [float(p) for p in regressor.predict(transformed)]
+
+    return {
+        "model_service.predict": lambda: [model_service.predict(row) for row in rows],
+        "dataframe": lambda: pd.DataFrame([{f: row[f] for f in FEATURE_COLUMNS} for row in rows]),
+        "frequency_encoder": lambda: encoder.transform(features),
+        "column_transformer": lambda: preprocessing.transform(features),
+        "regressor": lambda: regressor.predict(transformed),
+        "confidence": lambda: [model_service._calculate_confidence(row, p) for row, p in zip(rows, predictions)],
+    }
+
+
+def measure(function: Callable[[], Any], batch_size: int) -> Dict[str, float]:
+    """Median time per call and per row, and the memory one call allocates"""
+    function()
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    per_call = np.median(timer.repeat(repeat=ROUNDS, number=loops)) / loops
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = function()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        "per_call_us": round(per_call * 1e6, 2),
+        "per_row_us": round(per_call * 1e6 / batch_size, 3),
+        "peak_alloc_kib": round((peak - before) / 1024, 1),
+        "retained_kib": round((after - before) / 1024, 1),
+    }
+
+
+def run(batch_sizes: List[int]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """{case: {batch_size: measurements}}"""
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for batch_size in batch_sizes:
+        for name, function in build_cases(batch_size).items():
+            results.setdefault(name, {})[str(batch_size)] = measure(function, batch_size)
+    return results
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def source_hash(path: str = TRACKED_SOURCE) -> str:
+    with open(os.path.join(REPO_DIR, path), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def last_entry(path: str = HISTORY_PATH) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Relative change of per-call time and peak allocation for each case and batch size in both runs"""
+    changes: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, batches in current["results"].items():
+        for batch_size, measured in batches.items():
+            before = previous["results"].get(name, {}).get(batch_size)
+            if not before:
+                continue
+            changes.setdefault(name, {})[batch_size] = {
+                key: round(measured[key] / before[key] - 1, 3) if before[key] else None
+                for key in ("per_call_us", "peak_alloc_kib")
+            }
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the inference hot path")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)))
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-record", action="store_true", help="do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    entry = {
+        "recorded_at": datetime.now().isoformat(),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--", TRACKED_SOURCE)),
+        "ml_model_hash": source_hash(),
+        "model_version": model_service.model_version,
+        "host": {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()},
+        "results": run([int(size) for size in args.batch_sizes.split(",")]),
+    }
+    previous = last_entry(args.history)
+    if previous:
+        entry["change_since"] = {"commit": previous["commit"], "ml_model_hash": previous["ml_model_hash"]}
+        entry["changes"] = compare(entry, previous)
+
+    if not args.no_record:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    print(json.dumps(entry, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+"""End-to-end HTTP load test of the main user journeys, with latency SLO checks.
+
+Runs approve and submit applications, so the synthetic dataset
+(app/model_development/synthetic_data.py) is purged and generated again
+before each one and every run starts from the same state. Before the warmup,
+every synthetic supervisor and officer and one farmer per virtual user log
+in once, and journeys reuse their tokens, so approvals spread over all
+districts and bcrypt does not dominate the run. Login latency is reported
+on its own, measured with all users logging in at once. Then the users run
+these journeys against the real app for a fixed duration:
+
+    farmer:      submit an application, list own applications
+    officer:     list applications, open one
+    supervisor:  dashboard, pending queue, approve one
+
+The app is started with uvicorn on a free local port unless --url points
+at a running server that uses the same database. The report gives request
+count, error rate, p50/p95/p99 latency and throughput per endpoint. It is
+compared with the stored baseline, and the run exits with status 1 if any
+endpoint's p95 or p99 got more than --tolerance slower, its throughput
+dropped by more than --tolerance, or its error rate went up. Percentiles
+are only compared once there are enough samples for them to be stable.
+
+    python -m benchmarks.load_test [--concurrency 10] [--duration 120] [--applications 10000] [--keep-dataset]
+    python -m benchmarks.load_test --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from sqlalchemy import text
+
+from app.config.database import engine
+from app.model_development.synthetic_data import (
+    COLUMNS, CROP_PROFILES, SYNTHETIC_EMAIL_DOMAIN, SYNTHETIC_PASSWORD, generate, purge, synthetic_email
+)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "load_test_baseline.json")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+# Share of journeys started by each role; supervisor journeys are the longest,
+# so they get enough weight for every endpoint to reach MIN_SAMPLES
+JOURNEY_WEIGHTS = {"farmer": 0.35, "officer": 0.3, "supervisor": 0.35}
+
+# Synthetic account role of each journey
+JOURNEY_ACCOUNTS = {"farmer": "FARMER", "officer": "LOAN_OFFICER", "supervisor": "SUPERVISOR"}
+
+LOGIN_LABEL = "POST /api/auth/login"
+
+# Differences below this are noise, whatever the tolerance
+MIN_REGRESSION_MS = 5.0
+
+# Fewest samples a percentile is compared on; fewer and it is mostly the maximum
+MIN_SAMPLES = {"p95_ms": 20, "p99_ms": 100}
+
+ACCOUNTS_QUERY = text("SELECT role, count(*) FROM users WHERE email LIKE :pattern GROUP BY role")
+
+DATASET_QUERY = text("""
+    SELECT la.status::text, count(*)
+    FROM loan_applications la
+    JOIN users u ON u.id = la.farmer_id
+    WHERE u.email LIKE :pattern
+    GROUP BY 1
+""")
+
+
+class LoadTest:
+    """Run the journeys with `concurrency` virtual users and collect per-request latencies"""
+
+    def __init__(
+        self, base_url: str, accounts: Dict[str, int], concurrency: int, duration: float, warmup: float = 10, seed: int = 42
+    ):
+        self.base_url = base_url
+        self.accounts = accounts
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.measure_from = 0.0
+        self.deadline = 0.0
+        self.sessions: Dict[str, Dict[int, Dict[str, str]]] = defaultdict(dict)
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.journeys: Dict[str, List[float]] = defaultdict(list)
+
+    async def _request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Timed request, recorded under label (method and route template) after the warmup; None if it failed"""
+        started = time.perf_counter()
+        error = None
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code >= 400:
+                error = str(response.status_code)
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        if started >= self.measure_from:
+            self.samples[label].append((time.perf_counter() - started) * 1000)
+            if error:
+                self.errors[label][error] += 1
+        return None if error else response
+
+    async def _login(self, client: httpx.AsyncClient, email: str) -> Optional[Dict[str, str]]:
+        response = await self._request(
+            client, LOGIN_LABEL, "POST", "/api/auth/login", json={"email": email, "password": SYNTHETIC_PASSWORD}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"} if response else None
+
+    async def farmer_journey(self, client: httpx.AsyncClient, rng: random.Random, headers: Dict[str, str]) -> bool:
+        farm_size = round(rng.uniform(0.5, 3.0), 2)
+        expected_yield = round(farm_size * rng.uniform(800, 2500), 2)
+        submitted = await self._request(client, "POST /api/farmers/applications", "POST", "/api/farmers/applications", headers=headers, json={
+            "loan_farm_size": farm_size,
+            "loan_crop": rng.choice(list(CROP_PROFILES)).lower(),
+            "past_yield_kgs": round(expected_yield * rng.uniform(0.7, 1.1), 2),
+            "expected_yield_kgs": expected_yield,
+            "expected_yield_mk": round(expected_yield * rng.uniform(400, 900), 2),
+        })
+        listed = await self._request(client, "GET /api/farmers/applications", "GET", "/api/farmers/applications", headers=headers)
+        return bool(submitted and listed)
+
+    async def officer_journey(self, client: httpx.AsyncClient, rng: random.Random, headers: Dict[str, str]) -> bool:
+        listed = await self._request(client, "GET /api/loan-officers/applications", "GET", "/api/loan-officers/applications", headers=headers)
+        if not listed or not listed.json():
+            return False
+        application = rng.choice(listed.json())
+        detail = await self._request(
+            client, "GET /api/loan-officers/applications/{id}", "GET",
+            f"/api/loan-officers/applications/{application['application_id']}", headers=headers
+        )
+        return bool(detail)
+
+    async def supervisor_journey(self, client: httpx.AsyncClient, rng: random.Random, headers: Dict[str, str]) -> bool:
+        dashboard = await self._request(client, "GET /api/supervisors/dashboard", "GET", "/api/supervisors/dashboard", headers=headers)
+        pending = await self._request(
+            client, "GET /api/supervisors/applications/pending", "GET", "/api/supervisors/applications/pending", headers=headers
+        )
+        candidates = [a for a in (pending.json() if pending else []) if a["predicted_amount_mwk"]]
+        if not dashboard or not candidates:
+            return False
+        # A random pick from the page, so concurrent supervisors rarely race for the same application
+        approved = await self._request(
+            client, "PUT /api/supervisors/applications/{id}/approve", "PUT",
+            f"/api/supervisors/applications/{rng.choice(candidates)['application_id']}/approve",
+            headers=headers, json={"action": "approve", "override_prediction": False, "comments": "Load test"}
+        )
+        return bool(approved)
+
+    async def _virtual_user(self, number: int, logged_in: asyncio.Barrier):
+        """Log in this user's share of the accounts, wait for the others, then run journeys until the deadline"""
+        rng = random.Random(self.seed * 1000 + number)
+        journeys = {"farmer": self.farmer_journey, "officer": self.officer_journey, "supervisor": self.supervisor_journey}
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=120) as client:
+            for role, account in JOURNEY_ACCOUNTS.items():
+                count = min(self.accounts[account], self.concurrency) if role == "farmer" else self.accounts[account]
+                for n in range(number, count, self.concurrency):
+                    headers = await self._login(client, synthetic_email(role, n))
+                    if headers:
+                        self.sessions[role][n] = headers
+            await logged_in.wait()
+
+            sessions = {role: [self.sessions[role][n] for n in sorted(self.sessions[role])] for role in JOURNEY_WEIGHTS}
+            roles = [role for role in JOURNEY_WEIGHTS if sessions[role]]
+            if not roles:
+                return
+            weights = [JOURNEY_WEIGHTS[role] for role in roles]
+            while time.perf_counter() < self.deadline:
+                role = rng.choices(roles, weights)[0]
+                started = time.perf_counter()
+                if await journeys[role](client, rng, rng.choice(sessions[role])) and started >= self.measure_from:
+                    self.journeys[role].append((time.perf_counter() - started) * 1000)
+
+    async def run(self) -> float:
+        """Log everyone in, then run for warmup plus duration seconds; returns the measured seconds"""
+        logged_in = asyncio.Barrier(self.concurrency + 1)
+        users = [asyncio.create_task(self._virtual_user(number, logged_in)) for number in range(self.concurrency)]
+        await logged_in.wait()
+        self.measure_from = time.perf_counter() + self.warmup
+        self.deadline = self.measure_from + self.duration
+        await asyncio.gather(*users)
+        return time.perf_counter() - self.measure_from
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for label in sorted(self.samples):
+            latencies = np.array(self.samples[label])
+            errors = sum(self.errors[label].values())
+            endpoints[label] = {
+                "requests": len(latencies),
+                "errors": dict(self.errors[label]),
+                "error_rate": round(errors / len(latencies), 4),
+                **({} if label == LOGIN_LABEL else {"throughput_rps": round(len(latencies) / elapsed, 2)}),
+                **{f"p{q}_ms": round(float(np.percentile(latencies, q)), 1) for q in (50, 95, 99)},
+                "max_ms": round(float(latencies.max()), 1),
+            }
+        measured = [label for label in self.samples if label != LOGIN_LABEL]
+        return {
+            "login": endpoints.pop(LOGIN_LABEL, None),
+            "endpoints": endpoints,
+            "journeys": {
+                role: {
+                    "completed": len(durations),
+                    "per_second": round(len(durations) / elapsed, 2),
+                    "p95_ms": round(float(np.percentile(durations, 95)), 1) if durations else None,
+                }
+                for role, durations in self.journeys.items()
+            },
+            "requests": sum(len(self.samples[label]) for label in measured),
+            "throughput_rps": round(sum(len(self.samples[label]) for label in measured) / elapsed, 2),
+            "elapsed_seconds": round(elapsed, 1),
+        }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Endpoints that regressed against the baseline, as readable lines"""
+    regressions = []
+    measured = {**report["endpoints"], LOGIN_LABEL: report.get("login")}
+    for label, base in {**baseline["endpoints"], LOGIN_LABEL: baseline.get("login")}.items():
+        if base is None:
+            continue
+        current = measured.get(label)
+        if current is None:
+            regressions.append(f"{label}: not exercised")
+            continue
+        for key, min_samples in MIN_SAMPLES.items():
+            if min(current["requests"], base["requests"]) < min_samples:
+                continue
+            limit = max(base[key] * (1 + tolerance), base[key] + MIN_REGRESSION_MS)
+            if current[key] > limit:
+                regressions.append(f"{label}: {key} {current[key]} > {limit:.1f} (baseline {base[key]})")
+        if "throughput_rps" in base and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {current['throughput_rps']} rps < baseline {base['throughput_rps']} rps")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{label}: error rate {current['error_rate']:.2%} > baseline {base['error_rate']:.2%}")
+    return regressions
+
+
+def ensure_dataset(applications: int, seed: int, reseed: bool = True) -> Dict[str, int]:
+    """Synthetic accounts by role. The dataset is purged and generated again, or only generated if it is not loaded."""
+    pattern = f"%@{SYNTHETIC_EMAIL_DOMAIN}"
+    with engine.connect() as conn:
+        accounts = dict(conn.execute(ACCOUNTS_QUERY, {"pattern": pattern}).all())
+    if reseed or not accounts:
+        print(f"Generating a synthetic dataset of {applications} applications", file=sys.stderr)
+        with engine.begin() as conn:
+            purge(conn)
+            generate(conn, applications, seed)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in COLUMNS:
+                conn.execute(text(f"VACUUM ANALYZE {table}"))
+        with engine.connect() as conn:
+            accounts = dict(conn.execute(ACCOUNTS_QUERY, {"pattern": pattern}).all())
+    return {str(role): count for role, count in accounts.items()}
+
+
+def dataset_state() -> Dict[str, int]:
+    """Synthetic applications by status"""
+    with engine.connect() as conn:
+        return dict(conn.execute(DATASET_QUERY, {"pattern": f"%@{SYNTHETIC_EMAIL_DOMAIN}"}).all())
+
+
+def start_server(workers: int) -> tuple:
+    """uvicorn serving main:app on a free port; returns the process and its URL once it answers"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(BENCHMARKS_DIR)
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            httpx.get(f"{url}/openapi.json", timeout=5).raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 120 seconds")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP load test of the main user journeys")
+    parser.add_argument("--url", help="running server to test; by default the app is started with uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when the app is started here")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users")
+    parser.add_argument("--duration", type=float, default=120, help="seconds to measure")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds to run before measuring")
+    parser.add_argument("--applications", type=int, default=10000, help="size of the synthetic dataset")
+    parser.add_argument("--keep-dataset", action="store_true",
+                        help="run on the loaded synthetic dataset instead of generating it again")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--report", help="report path; by default a timestamped file in benchmarks/results")
+    args = parser.parse_args(argv)
+
+    accounts = ensure_dataset(args.applications, args.seed, reseed=not args.keep_dataset)
+    dataset_before = dataset_state()
+    process, url = (None, args.url) if args.url else start_server(args.workers)
+    try:
+        load_test = LoadTest(url, accounts, args.concurrency, args.duration, args.warmup, args.seed)
+        elapsed = asyncio.run(load_test.run())
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "config": {
+            "url": args.url or "uvicorn main:app",
+            "workers": None if args.url else args.workers,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "accounts": accounts,
+        },
+        "dataset": {
+            "reseeded": not args.keep_dataset,
+            "applications": args.applications,
+            "before": dataset_before,
+            "after": dataset_state(),
+        },
+        "host": {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()},
+        **load_test.report(elapsed),
+    }
+
+    if args.update_baseline:
+        report["regressions"] = []
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+    else:
+        report["regressions"] = None
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one", file=sys.stderr)
+
+    path = args.report or os.path.join(RESULTS_DIR, f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Report written to {path}", file=sys.stderr)
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
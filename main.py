@@ -11,11 +11,13 @@ from app.api.ml_monitoring import router as monitoring_router
 from app.api.prediction import router as prediction_router
 from app.api.districts import router as districts_router
 
-from app.middleware import add_cors_middleware
+from app.middleware import add_cors_middleware, add_profiling_middleware
+from app.services.model_deployment import lifespan
 
 
-app = FastAPI(title="Agri Loan API", description="API for the Agri Loan application", version="1.0.0")
+app = FastAPI(title="Agri Loan API", description="API for the Agri Loan application", version="1.0.0", lifespan=lifespan)
 add_cors_middleware(app)
+add_profiling_middleware(app)
 api_router = APIRouter(prefix="/api")
 @app.get("/", include_in_schema=False, response_class=RedirectResponse, status_code=status.HTTP_302_FOUND)
 def redirect_to_docs():